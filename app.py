@@ -1,32 +1,219 @@
-from flask import Flask, render_template, jsonify
+import logging
+import math
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from typing import Optional
+from flask import (
+    Flask, Response, g, render_template, jsonify, request, send_from_directory, stream_with_context, url_for
+)
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
 from controllers.tarot_controller import TarotController
+from exceptions import InvalidRequestError
+from services.admission import RateLimiter
+from services.asset_pipeline import build_assets, build_sprite
+from utils.http_cache import HttpCache
+from utils.logger import request_id, setup_logger
+from utils.metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as METRICS_REGISTRY, SHED, STAGE_SECONDS, RequestMetrics,
+    record_observations
+)
+from utils.profiling import RequestProfiler
+from utils.startup import STARTUP
 
+logger = setup_logger(__name__)
 
-def create_app() -> Flask:
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+# Endpoints that draw a reading, and so may call the model, are rate limited per client
+RATE_LIMITED_ENDPOINTS = frozenset({'draw_cards', 'draw_cards_stream', 'create_reading', 'readings_batch'})
+
+# Built assets carry a content hash in their name, so they never change
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+STARTUP.mark('app_imported')
+
+
+def create_app(tarot_controller: Optional[TarotController] = None) -> Flask:
     """Application factory pattern for creating Flask app."""
     app = Flask(__name__)
     
     # Validate configuration
     Config.validate()
     
+    if Config.ASSET_BUILD_ON_STARTUP:
+        build_assets()
+        build_sprite()
+    
     # Initialize controller
-    tarot_controller = TarotController()
+    with STARTUP.phase('create_controller'):
+        tarot_controller = tarot_controller or TarotController()
+    
+    if Config.HTTP_CACHE_ENABLED:
+        HttpCache(app)
+    
+    @app.before_request
+    def assign_request_id():
+        """Tag the request's log lines with the caller's request ID or a new one."""
+        g.request_id_token = request_id.set(request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex)
+        if Config.LOG_REQUESTS:
+            g.request_log = ExitStack()
+            g.request_stages = g.request_log.enter_context(record_observations())
+            g.request_started = time.perf_counter()
+    
+    @app.after_request
+    def log_request(response):
+        """Echo the request ID and log the request with its stage timings."""
+        response.headers[REQUEST_ID_HEADER] = request_id.get()
+        request_log = g.pop('request_log', None)
+        if request_log is not None:
+            request_log.close()
+            if logger.isEnabledFor(logging.INFO):
+                stages = {}
+                for name, labels, seconds in g.request_stages:
+                    if name == STAGE_SECONDS.name:
+                        stages[labels[0]] = round(stages.get(labels[0], 0.0) + seconds, 6)
+                duration = round(time.perf_counter() - g.request_started, 6)
+                logger.info("%s %s %d in %.1fms", request.method, request.path, response.status_code,
+                            duration * 1000, extra={'duration': duration, 'stages': stages})
+        return response
+    
+    @app.teardown_request
+    def clear_request_id(exc):
+        token = g.pop('request_id_token', None)
+        if token is not None:
+            request_id.reset(token)
+    
+    if Config.METRICS_ENABLED:
+        RequestMetrics(app)
+        
+        @app.route('/metrics', methods=['GET'])
+        def metrics():
+            """Expose the metrics of every worker in the Prometheus text format."""
+            return Response(METRICS_REGISTRY.render(), content_type=METRICS_CONTENT_TYPE,
+                            headers={'Cache-Control': 'no-store'})
+    
+    if Config.RATE_LIMIT_TRUST_PROXY:
+        # remote_addr becomes the address the proxy appended, which clients cannot forge
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
+    
+    if Config.RATE_LIMIT_PER_MINUTE > 0:
+        rate_limiter = app.extensions['rate_limiter'] = RateLimiter()
+        
+        @app.before_request
+        def limit_rate():
+            """Answer 429 when the client has used up its token bucket."""
+            if request.endpoint not in RATE_LIMITED_ENDPOINTS:
+                return None
+            retry_after = rate_limiter.check(request.remote_addr or 'unknown')
+            if retry_after <= 0:
+                return None
+            SHED.inc(reason='rate_limited', outcome='rejected')
+            response = jsonify({'error': 'Too many readings requested; slow down'})
+            response.status_code = 429
+            response.headers['Retry-After'] = str(math.ceil(retry_after))
+            return response
+    
+    if Config.PROFILING_ENABLED:
+        RequestProfiler(app)
+    
+    if Config.STARTUP_REPORT:
+        @app.before_request
+        def mark_first_request():
+            if STARTUP.mark('first_request'):
+                logger.info("Startup report: %s", STARTUP.as_dict())
+        
+        @app.route('/startup', methods=['GET'])
+        def startup():
+            """Startup milestones of this worker, in seconds since the process started."""
+            return jsonify(STARTUP.as_dict())
     
     @app.route('/')
     def index():
         """Render the main page."""
-        return render_template('index.html')
+        sprite = tarot_controller.card_service.sprite if Config.CARD_DELIVERY == 'sprite' else None
+        return render_template('index.html', streaming=Config.STREAMING_ENABLED, sprite=sprite)
+    
+    @app.route(f"{Config.ASSET_URL_PREFIX.rstrip('/')}/<path:filename>", methods=['GET'])
+    def assets(filename):
+        """Serve content-hashed build output with a far-future immutable cache policy."""
+        response = send_from_directory(Config.ASSET_BUILD_FOLDER, filename, max_age=31536000)
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
     
     @app.route('/draw_cards', methods=['GET'])
     def draw_cards():
         """Handle card drawing request."""
-        response_data, status_code = tarot_controller.draw_cards()
-        return jsonify(response_data), status_code
+        body, status_code = tarot_controller.draw_cards_json()
+        # Every request draws a new reading
+        return Response(body, status=status_code, mimetype='application/json',
+                        headers={'Cache-Control': 'no-store'})
+    
+    @app.route('/draw_cards/stream', methods=['GET'])
+    def draw_cards_stream():
+        """Stream the drawn cards and prophecy as Server-Sent Events."""
+        return Response(
+            stream_with_context(tarot_controller.stream_reading()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
     
+    @app.route('/readings/batch', methods=['POST'])
+    def readings_batch():
+        """Stream a batch of readings as newline-delimited JSON."""
+        try:
+            count, spread_size = tarot_controller.parse_batch_request(request.get_json(silent=True))
+        except InvalidRequestError as e:
+            return jsonify({'error': str(e)}), 400
+        return Response(
+            stream_with_context(tarot_controller.stream_batch(count, spread_size)),
+            mimetype='application/x-ndjson',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    
+    @app.route('/readings', methods=['POST'])
+    def create_reading():
+        """Draw cards now and generate their prophecy in the background."""
+        response_data, status_code = tarot_controller.submit_reading()
+        response = jsonify(response_data)
+        response.status_code = status_code
+        if status_code == 202:
+            response.headers['Location'] = url_for('get_reading', reading_id=response_data['id'])
+        elif status_code == 503:
+            response.headers['Retry-After'] = '1'
+        return response
+    
+    @app.route('/readings/<reading_id>', methods=['GET'])
+    def get_reading(reading_id):
+        """Return a queued reading; ?wait=<seconds> long-polls until its prophecy is ready."""
+        wait = request.args.get('wait', 0.0, type=float)
+        response_data, status_code = tarot_controller.get_reading(reading_id, wait=wait)
+        response = jsonify(response_data)
+        response.status_code = status_code
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    
+    STARTUP.mark('app_created')
+    if Config.STARTUP_MODE == 'lazy':
+        # Under gunicorn the listening socket is already bound by the master
+        threading.Thread(target=_warm_up, args=(tarot_controller,), name='warm-up', daemon=True).start()
+    else:
+        STARTUP.mark('warmed_up')
     return app
 
 
+def _warm_up(tarot_controller: TarotController) -> None:
+    """Build the deferred AI clients in the background after startup."""
+    try:
+        with STARTUP.phase('warm_up'):
+            tarot_controller.warm_up()
+    except Exception as e:
+        logger.warning(f"Warm-up failed; clients will be built on first use: {str(e)}")
+    STARTUP.mark('warmed_up')
+
+
 def main():
     """Main application entry point."""
     app = create_app()
@@ -34,4 +221,4 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    main()
\ No newline at end of file
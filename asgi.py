@@ -0,0 +1,118 @@
+import math
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, MutableMapping, Optional, Tuple
+from asgiref.wsgi import WsgiToAsgi
+from app import REQUEST_ID_HEADER, create_app
+from config import Config
+from controllers.tarot_controller import TarotController
+from services.admission import RateLimiter
+from utils import json_codec
+from utils.logger import request_id, setup_logger
+from utils.metrics import REGISTRY, REQUEST_SECONDS, REQUESTS, REQUESTS_IN_FLIGHT, SHED
+
+logger = setup_logger(__name__)
+
+Scope = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class TarotASGIApp:
+    """
+    ASGI application serving readings on the event loop.
+    
+    ``GET /draw_cards`` is handled natively with the async inference client,
+    so one process can keep many readings waiting on the model at once. It
+    applies the same rate limit, request ID, metrics and cache headers as the
+    Flask route. All other routes are delegated to the Flask app through a
+    WSGI adapter.
+    """
+    
+    def __init__(self, tarot_controller: TarotController, wsgi_app: Callable,
+                 rate_limiter: Optional[RateLimiter] = None):
+        self.tarot_controller = tarot_controller
+        self.wsgi_app = WsgiToAsgi(wsgi_app)
+        self.rate_limiter = rate_limiter
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http' and scope['path'] == '/draw_cards' and scope['method'] == 'GET':
+            await self._draw_cards(scope, send)
+        else:
+            await self.wsgi_app(scope, receive, send)
+    
+    async def _draw_cards(self, scope: Scope, send: Send) -> None:
+        """Serve GET /draw_cards on the event loop."""
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        token = request_id.set(headers.get(REQUEST_ID_HEADER.lower()) or uuid.uuid4().hex)
+        started = time.perf_counter()
+        if Config.METRICS_ENABLED:
+            REGISTRY.start_flushing()
+            REQUESTS_IN_FLIGHT.inc()
+        status_code = 500
+        try:
+            retry_after = self._check_rate(scope, headers)
+            if retry_after > 0:
+                SHED.inc(reason='rate_limited', outcome='rejected')
+                status_code = 429
+                await self._send_json(send, {'error': 'Too many readings requested; slow down'}, status_code,
+                                      [(b'retry-after', str(math.ceil(retry_after)).encode('ascii'))])
+            else:
+                response_data, status_code = await self.tarot_controller.adraw_cards()
+                await self._send_json(send, response_data, status_code)
+        finally:
+            if Config.METRICS_ENABLED:
+                REQUESTS_IN_FLIGHT.dec()
+                REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint='/draw_cards')
+                REQUESTS.inc(endpoint='/draw_cards', status=str(status_code))
+            request_id.reset(token)
+    
+    def _check_rate(self, scope: Scope, headers: Dict[str, str]) -> float:
+        """Seconds the client must wait before its next reading, as in app.limit_rate."""
+        if self.rate_limiter is None:
+            return 0.0
+        client = scope['client'][0] if scope.get('client') else None
+        if Config.RATE_LIMIT_TRUST_PROXY and headers.get('x-forwarded-for'):
+            # The hop appended by the trusted proxy, as werkzeug's ProxyFix(x_for=1)
+            client = headers['x-forwarded-for'].split(',')[-1].strip()
+        return self.rate_limiter.check(client or 'unknown')
+    
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        """Handle server startup and shutdown events."""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.tarot_controller.ai_service.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    @staticmethod
+    async def _send_json(send: Send, data: Dict[str, Any], status_code: int,
+                         extra_headers: Optional[List[Tuple[bytes, bytes]]] = None) -> None:
+        """Send a complete, uncacheable JSON response."""
+        body = json_codec.dumps(data)
+        await send({
+            'type': 'http.response.start',
+            'status': status_code,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode('ascii')),
+                # Every request draws a new reading
+                (b'cache-control', b'no-store'),
+                (REQUEST_ID_HEADER.lower().encode('ascii'), request_id.get().encode('latin-1')),
+            ] + (extra_headers or []),
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+
+def create_asgi_app() -> TarotASGIApp:
+    """Application factory for the asyncio serving mode."""
+    Config.validate()
+    tarot_controller = TarotController()
+    flask_app = create_app(tarot_controller)
+    logger.info("ASGI application created")
+    return TarotASGIApp(tarot_controller, flask_app, flask_app.extensions.get('rate_limiter'))
\ No newline at end of file
@@ -0,0 +1,122 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+import requests
+from controllers.tarot_controller import FALLBACK_PROPHECY
+
+
+def percentile(sorted_values: Sequence[float], percent: float) -> Optional[float]:
+    """
+    Nearest-rank percentile of already sorted values.
+    
+    Args:
+        sorted_values: Values in ascending order
+        percent: Percentile between 0 and 100
+    
+    Returns:
+        The percentile, or None for an empty sequence
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[min(len(sorted_values), int(rank)) - 1]
+
+
+class LoadRecorder:
+    """Thread-safe collection of request outcomes."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self.fallbacks = 0
+        self.errors = 0
+    
+    def record(self, latency: float, status: str, fallback: bool = False) -> None:
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if status == '200':
+                self.latencies.append(latency)
+                if fallback:
+                    self.fallbacks += 1
+            else:
+                self.errors += 1
+    
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        """Throughput and latency percentiles of the recorded requests."""
+        with self._lock:
+            latencies = sorted(self.latencies)
+            total = sum(self.statuses.values())
+            
+            def ms(value: Optional[float]) -> Optional[float]:
+                return None if value is None else round(value * 1000, 2)
+            
+            return {
+                'requests': total,
+                'ok': len(latencies),
+                'errors': self.errors,
+                'fallbacks': self.fallbacks,
+                'statuses': dict(sorted(self.statuses.items())),
+                'elapsed_s': round(elapsed, 3),
+                'throughput_rps': round(total / elapsed, 2) if elapsed > 0 else 0.0,
+                'latency_ms': {
+                    'mean': ms(sum(latencies) / len(latencies)) if latencies else None,
+                    'p50': ms(percentile(latencies, 50)),
+                    'p95': ms(percentile(latencies, 95)),
+                    'p99': ms(percentile(latencies, 99)),
+                    'max': ms(latencies[-1]) if latencies else None,
+                },
+            }
+
+
+def run_load(url: str, concurrency: int, duration: Optional[float] = None,
+             total_requests: Optional[int] = None, timeout: float = 60.0) -> Dict[str, Any]:
+    """
+    Drive closed-loop load: each worker sends its next request as soon as the previous one returns.
+    
+    Args:
+        url: Endpoint to request with GET
+        concurrency: Number of concurrent workers
+        duration: Stop starting new requests after this many seconds
+        total_requests: Stop after this many requests in total
+        timeout: Per-request timeout in seconds
+    
+    Returns:
+        Summary of throughput, status counts and latency percentiles
+    """
+    if duration is None and total_requests is None:
+        raise ValueError("Either duration or total_requests must be given")
+    recorder = LoadRecorder()
+    lock = threading.Lock()
+    issued = 0
+    started = time.perf_counter()
+    
+    def next_request() -> bool:
+        nonlocal issued
+        with lock:
+            if total_requests is not None and issued >= total_requests:
+                return False
+            if duration is not None and time.perf_counter() - started >= duration:
+                return False
+            issued += 1
+            return True
+    
+    def worker() -> None:
+        session = requests.Session()
+        while next_request():
+            request_started = time.perf_counter()
+            try:
+                response = session.get(url, timeout=timeout)
+                latency = time.perf_counter() - request_started
+                fallback = response.status_code == 200 and response.json().get('prophecy') == FALLBACK_PROPHECY
+                recorder.record(latency, str(response.status_code), fallback)
+            except (requests.RequestException, ValueError) as e:
+                recorder.record(time.perf_counter() - request_started, type(e).__name__)
+        session.close()
+    
+    threads = [threading.Thread(target=worker, name=f'load-{i}', daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.summary(time.perf_counter() - started)
\ No newline at end of file
@@ -0,0 +1,282 @@
+"""
+Latency and throughput benchmarks for ``/draw_cards``.
+
+Usage:
+    python -m benchmarks.run [--scenario cold_cache] [--duration 30] [--concurrency 16]
+                             [--workers 1] [--threads 8] [--output results.json] [--compare baseline.json]
+
+Each scenario starts the stub model server and the app under gunicorn with
+gunicorn_conf.py, as deployed by the Procfile and render.yaml, in fresh
+subprocesses with an empty prophecy cache, optionally prewarms the
+cache, then drives closed-loop load and records throughput and latency
+percentiles. Results are written as JSON (by default to
+``benchmarks/results/<commit>.json``) so runs can be compared across commits.
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import requests
+from benchmarks.load import run_load
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_FOLDER = os.path.join(REPO_ROOT, 'benchmarks', 'results')
+
+
+class Scenario:
+    """One benchmark configuration of the simulated model server and cache."""
+    
+    def __init__(self, name: str, description: str, latency: float, jitter: float = 0.0,
+                 distribution: str = 'lognormal', error_rate: float = 0.0, prewarm: bool = False):
+        self.name = name
+        self.description = description
+        self.latency = latency
+        self.jitter = jitter
+        self.distribution = distribution
+        self.error_rate = error_rate
+        self.prewarm = prewarm
+    
+    def stub_args(self) -> List[str]:
+        return [
+            '--latency', str(self.latency), '--jitter', str(self.jitter),
+            '--distribution', self.distribution, '--error-rate', str(self.error_rate),
+        ]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'description': self.description,
+            'stub': {
+                'latency': self.latency, 'jitter': self.jitter,
+                'distribution': self.distribution, 'error_rate': self.error_rate,
+            },
+            'prewarm': self.prewarm,
+        }
+
+
+SCENARIOS = {
+    scenario.name: scenario for scenario in (
+        Scenario('cold_cache', "Empty prophecy cache; readings call the model until variants fill up",
+                 latency=1.0, jitter=0.5),
+        Scenario('warm_cache', "Prophecy cache prewarmed for every card combination",
+                 latency=1.0, jitter=0.5, prewarm=True),
+        Scenario('backend_outage', "Model server answers every call with 503; readings fall back",
+                 latency=0.05, distribution='fixed', error_rate=1.0),
+    )
+}
+
+
+def free_port() -> int:
+    """Return a currently unused local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    """Poll url until it answers, failing early if the process exited."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited with code {process.returncode} before {url} was ready")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} was not ready after {timeout:.0f}s")
+
+
+def stop(process: Optional[subprocess.Popen]) -> None:
+    """Terminate a subprocess, killing it if it does not exit promptly."""
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def start_stub(args: List[str], log) -> Tuple[subprocess.Popen, str]:
+    """Start the stub model server and return the process and its base URL."""
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'services.stub_server', '--port', str(port), *args],
+        cwd=REPO_ROOT, stdout=log, stderr=subprocess.STDOUT,
+    )
+    # The stub only answers POST; any HTTP response means it is listening
+    wait_until_ready(f'http://127.0.0.1:{port}/', process)
+    return process, f'http://127.0.0.1:{port}/v1'
+
+
+def gunicorn_command(port: int) -> List[str]:
+    """Command that serves the app on a local port with the deployed gunicorn configuration."""
+    return [
+        sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_conf.py', '--bind', f'127.0.0.1:{port}',
+        'app:create_app()',
+    ]
+
+
+def gunicorn_env(workers: int, threads: Optional[int]) -> Dict[str, str]:
+    """
+    Environment sizing the server through gunicorn_conf.py.
+    
+    The worker count goes through WEB_CONCURRENCY rather than a command line
+    flag, so the config's multi-worker defaults (job store, metrics directory,
+    shared cache) follow it as they do in production.
+    """
+    env = {'WEB_CONCURRENCY': str(workers)}
+    if threads:
+        env['GUNICORN_MAX_THREADS'] = str(threads)
+    return env
+
+
+def run_scenario(scenario: Scenario, duration: float, concurrency: int, workers: int, threads: Optional[int],
+                 workdir: str) -> Dict[str, Any]:
+    """
+    Run one scenario end to end.
+    
+    Returns:
+        The scenario description merged with its load summary
+    """
+    log_path = os.path.join(workdir, f'{scenario.name}.log')
+    env = dict(
+        os.environ,
+        PROPHECY_CACHE_PATH=os.path.join(workdir, f'{scenario.name}.sqlite3'),
+        # Multi-worker runs must not share state with other servers on the host
+        JOBS_DB_PATH=os.path.join(workdir, f'{scenario.name}-jobs.sqlite3'),
+        SHARED_CACHE_PATH=os.path.join(workdir, f'{scenario.name}.mmap'),
+        DECK_CHECK_INTERVAL='0',
+        # The load driver is a single client
+        RATE_LIMIT_PER_MINUTE='0',
+        # Fallbacks are counted by their fixed text
+        PROPHECY_FALLBACK='static',
+    )
+    stub = app = None
+    with open(log_path, 'w') as log:
+        try:
+            if scenario.prewarm:
+                warm_stub, warm_url = start_stub(['--latency', '0', '--jitter', '0'], log)
+                try:
+                    logger.info(f"[{scenario.name}] prewarming the prophecy cache")
+                    subprocess.run(
+                        [sys.executable, '-m', 'services.prewarm', '--concurrency', '16'],
+                        cwd=REPO_ROOT, env=dict(env, AI_BACKENDS=f'stub={warm_url}'),
+                        stdout=log, stderr=subprocess.STDOUT, check=True,
+                    )
+                finally:
+                    stop(warm_stub)
+            
+            stub, stub_url = start_stub(scenario.stub_args(), log)
+            port = free_port()
+            app = subprocess.Popen(
+                gunicorn_command(port),
+                cwd=REPO_ROOT, env=dict(env, AI_BACKENDS=f'stub={stub_url}', **gunicorn_env(workers, threads)),
+                stdout=log, stderr=subprocess.STDOUT,
+            )
+            wait_until_ready(f'http://127.0.0.1:{port}/', app)
+            
+            logger.info(f"[{scenario.name}] {concurrency} clients for {duration:.0f}s")
+            summary = run_load(f'http://127.0.0.1:{port}/draw_cards', concurrency, duration=duration)
+        finally:
+            stop(app)
+            stop(stub)
+    return {**scenario.to_dict(), **summary}
+
+
+def git_commit() -> str:
+    """Short hash of the checked out commit, or 'unknown'."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """
+    Describe how each scenario changed relative to a baseline run.
+    
+    Returns:
+        One line per scenario present in both runs
+    """
+    lines = []
+    for name, result in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        parts = [f"{name}: throughput {_change(before['throughput_rps'], result['throughput_rps'])}"]
+        for key in ('p50', 'p95', 'p99'):
+            parts.append(f"{key} {_change(before['latency_ms'][key], result['latency_ms'][key])}")
+        lines.append(', '.join(parts))
+    return lines
+
+
+def _change(before: Optional[float], after: Optional[float]) -> str:
+    if before is None or after is None:
+        return f"{before} -> {after}"
+    if before == 0:
+        return f"{before} -> {after}"
+    return f"{before} -> {after} ({(after - before) / before * 100:+.1f}%)"
+
+
+def main(argv=None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Benchmark /draw_cards under gunicorn against the stub model server.")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help="scenario to run (repeatable; default all)")
+    parser.add_argument('--duration', type=float, default=30.0, help="seconds of load per scenario")
+    parser.add_argument('--concurrency', type=int, default=16, help="concurrent clients")
+    parser.add_argument('--workers', type=int, default=1, help="gunicorn worker processes (WEB_CONCURRENCY)")
+    parser.add_argument('--threads', type=int, default=None,
+                        help="threads per gunicorn worker (default: sized by gunicorn_conf.py)")
+    parser.add_argument('--output', default=None, help="result file (default benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', default=None, help="earlier result file to compare against")
+    args = parser.parse_args(argv)
+    
+    commit = git_commit()
+    results = {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {
+            'duration': args.duration, 'concurrency': args.concurrency,
+            'workers': args.workers, 'threads': args.threads,
+        },
+        'scenarios': {},
+    }
+    with tempfile.TemporaryDirectory(prefix='tarot-bench-') as workdir:
+        for name in args.scenario or list(SCENARIOS):
+            result = run_scenario(SCENARIOS[name], args.duration, args.concurrency, args.workers, args.threads, workdir)
+            results['scenarios'][name] = result
+            latency = result['latency_ms']
+            print(f"{name}: {result['throughput_rps']} req/s, p50 {latency['p50']} ms, p95 {latency['p95']} ms, "
+                  f"p99 {latency['p99']} ms, {result['errors']} errors, {result['fallbacks']} fallbacks")
+    
+    output = args.output or os.path.join(RESULTS_FOLDER, f'{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            for line in compare(results, json.load(f)):
+                print(line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
@@ -10,14 +10,155 @@ class Config:
     """Configuration class to handle all application settings."""
     
     HF_TOKEN: Optional[str] = os.getenv("HF_TOKEN")
+    HF_MODEL: str = os.getenv("HF_MODEL", "HuggingFaceH4/zephyr-7b-alpha")
     CARDS_FOLDER: str = 'static/cards'
     DEBUG: bool = True
+    # Let the front-end stream prophecies over Server-Sent Events
+    STREAMING_ENABLED: bool = os.getenv("STREAMING_ENABLED", "true").lower() == "true"
+    # Seconds between deck folder mtime checks; 0 disables automatic reloads
+    DECK_CHECK_INTERVAL: float = float(os.getenv("DECK_CHECK_INTERVAL", "60"))
+    
+    # Built image assets (python -m services.asset_pipeline)
+    ASSET_BUILD_FOLDER: str = os.getenv("ASSET_BUILD_FOLDER", "static/build")
+    ASSET_URL_PREFIX: str = os.getenv("ASSET_URL_PREFIX", "/assets")
+    ASSET_WIDTHS: str = os.getenv("ASSET_WIDTHS", "160,320")
+    ASSET_FORMATS: str = os.getenv("ASSET_FORMATS", "avif,webp")
+    ASSET_BUILD_ON_STARTUP: bool = os.getenv("ASSET_BUILD_ON_STARTUP", "false").lower() == "true"
+    ASSET_SPRITE_WIDTH: int = int(os.getenv("ASSET_SPRITE_WIDTH", "200"))
+    ASSET_SPRITE_FORMAT: str = os.getenv("ASSET_SPRITE_FORMAT", "webp")
+    # "images" sends per-card image URLs; "sprite" sends offsets into the preloaded sprite sheet
+    CARD_DELIVERY: str = os.getenv("CARD_DELIVERY", "images").lower()
+    
+    # HTTP caching: ETags, 304 responses and compression (utils.http_cache)
+    HTTP_CACHE_ENABLED: bool = os.getenv("HTTP_CACHE_ENABLED", "true").lower() == "true"
+    HTTP_COMPRESS_MIN_SIZE: int = int(os.getenv("HTTP_COMPRESS_MIN_SIZE", "1024"))
+    HTTP_STATIC_CACHE_CONTROL: str = os.getenv("HTTP_STATIC_CACHE_CONTROL", "no-cache")
+    
+    # Prometheus metrics on /metrics; METRICS_DIR aggregates across gunicorn workers (gunicorn_conf.py
+    # picks a temporary directory when it starts more than one worker and METRICS_DIR is unset)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_DIR: Optional[str] = os.getenv("METRICS_DIR")
+    METRICS_FLUSH_INTERVAL: float = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+    
+    # Logging (utils.logger): "text" or "json" lines, optionally written by a background thread
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text").lower()
+    LOG_ASYNC: bool = os.getenv("LOG_ASYNC", "false").lower() == "true"
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    # Per-logger fraction of INFO records to keep, e.g. "services.card_service=0.01,app=0.1"
+    LOG_SAMPLING: str = os.getenv("LOG_SAMPLING", "")
+    # Log one line per request with its duration and stage timings
+    LOG_REQUESTS: bool = os.getenv("LOG_REQUESTS", "false").lower() == "true"
+    
+    # Opt-in request profiling (utils.profiling); nothing is installed when disabled
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_DIR: str = os.getenv("PROFILING_DIR", "instance/profiles")
+    PROFILING_SAMPLE_RATE: float = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+    PROFILING_TOKEN: Optional[str] = os.getenv("PROFILING_TOKEN")
+    PROFILING_MODE: str = os.getenv("PROFILING_MODE", "sampling").lower()
+    PROFILING_INTERVAL: float = float(os.getenv("PROFILING_INTERVAL", "0.005"))
+    PROFILING_KEEP: int = int(os.getenv("PROFILING_KEEP", "100"))
+    
+    # "lazy" defers heavy imports and AI client construction to a background warm-up after startup
+    STARTUP_MODE: str = os.getenv("STARTUP_MODE", "eager").lower()
+    # Log startup milestones after the first request and serve them on /startup
+    STARTUP_REPORT: bool = os.getenv("STARTUP_REPORT", "false").lower() == "true"
+    
+    # Gunicorn sizing (gunicorn_conf.py); WEB_CONCURRENCY overrides the worker count
+    GUNICORN_WORKER_CLASS: str = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+    GUNICORN_UPSTREAM_LATENCY: float = float(os.getenv("GUNICORN_UPSTREAM_LATENCY", "5"))
+    GUNICORN_CPU_PER_REQUEST: float = float(os.getenv("GUNICORN_CPU_PER_REQUEST", "0.02"))
+    GUNICORN_MAX_WORKERS: int = int(os.getenv("GUNICORN_MAX_WORKERS", "4"))
+    GUNICORN_MAX_THREADS: int = int(os.getenv("GUNICORN_MAX_THREADS", "32"))
+    GUNICORN_MAX_CONNECTIONS: int = int(os.getenv("GUNICORN_MAX_CONNECTIONS", "500"))
+    GUNICORN_TIMEOUT: int = int(os.getenv("GUNICORN_TIMEOUT", "300"))
+    # Load the app in the master before forking so workers share its memory copy-on-write;
+    # best with STARTUP_MODE=eager, since threads started in the master do not survive the fork
+    GUNICORN_PRELOAD: bool = os.getenv("GUNICORN_PRELOAD", "false").lower() == "true"
+    
+    # "ai" asks the model; "local" composes prophecies instantly from the card meanings (services.local_prophecy)
+    PROPHECY_MODE: str = os.getenv("PROPHECY_MODE", "ai").lower()
+    # Prophecy served when the model fails: "local" composed from the cards, or the "static" notice
+    PROPHECY_FALLBACK: str = os.getenv("PROPHECY_FALLBACK", "local").lower()
+    
+    # Persistent prophecy cache shared by all workers
+    PROPHECY_CACHE_ENABLED: bool = os.getenv("PROPHECY_CACHE_ENABLED", "true").lower() == "true"
+    PROPHECY_CACHE_PATH: str = os.getenv("PROPHECY_CACHE_PATH", "instance/prophecy_cache.sqlite3")
+    PROPHECY_CACHE_VARIANTS: int = int(os.getenv("PROPHECY_CACHE_VARIANTS", "5"))
+    PROPHECY_CACHE_TTL: float = float(os.getenv("PROPHECY_CACHE_TTL", str(7 * 24 * 3600)))
+    PROPHECY_CACHE_MAX_ENTRIES: int = int(os.getenv("PROPHECY_CACHE_MAX_ENTRIES", "20000"))
+    # Once a combination has any cached prophecy, answer within this many seconds, serving the
+    # cached one while the model call finishes in the background to refresh the cache; 0 disables
+    PROPHECY_SWR_DEADLINE: float = float(os.getenv("PROPHECY_SWR_DEADLINE", "3"))
+    
+    # Shared-memory cache tier read by every worker on the host (services.shared_cache); gunicorn_conf.py
+    # turns it on when it starts more than one worker, unless SHARED_CACHE_ENABLED is set
+    SHARED_CACHE_ENABLED: bool = os.getenv("SHARED_CACHE_ENABLED", "false").lower() == "true"
+    SHARED_CACHE_PATH: str = os.getenv(
+        "SHARED_CACHE_PATH", "/dev/shm/tarot_shared_cache" if os.path.isdir("/dev/shm") else "instance/shared_cache.mmap"
+    )
+    SHARED_CACHE_SLOTS: int = int(os.getenv("SHARED_CACHE_SLOTS", "2048"))
+    SHARED_CACHE_SLOT_SIZE: int = int(os.getenv("SHARED_CACHE_SLOT_SIZE", "16384"))
+    SHARED_CACHE_TTL: float = float(os.getenv("SHARED_CACHE_TTL", "60"))
+    
+    # Circuit breaker around the AI backend
+    CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_LATENCY_SLO: float = float(os.getenv("CIRCUIT_LATENCY_SLO", "20"))
+    CIRCUIT_RESET_TIMEOUT: float = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+    
+    # Admission control in front of the model: concurrent calls (0 disables), waiting callers, seconds to wait
+    ADMISSION_MAX_CONCURRENCY: int = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "8"))
+    ADMISSION_QUEUE_SIZE: int = int(os.getenv("ADMISSION_QUEUE_SIZE", "16"))
+    ADMISSION_MAX_WAIT: float = float(os.getenv("ADMISSION_MAX_WAIT", "2"))
+    
+    # Per-client token bucket on the reading endpoints; 0 disables
+    RATE_LIMIT_PER_MINUTE: float = float(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
+    RATE_LIMIT_BURST: int = int(os.getenv("RATE_LIMIT_BURST", "20"))
+    # Identify clients by the X-Forwarded-For address appended by the one trusted proxy in front
+    RATE_LIMIT_TRUST_PROXY: bool = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+    
+    # Latency budget, retries and hedging for AI backend calls
+    REQUEST_BUDGET: float = float(os.getenv("REQUEST_BUDGET", "25"))
+    AI_CLIENT_TIMEOUT: float = float(os.getenv("AI_CLIENT_TIMEOUT", "60"))
+    AI_MAX_RETRIES: int = int(os.getenv("AI_MAX_RETRIES", "2"))
+    AI_RETRY_BASE_DELAY: float = float(os.getenv("AI_RETRY_BASE_DELAY", "0.25"))
+    AI_HEDGE_ENABLED: bool = os.getenv("AI_HEDGE_ENABLED", "false").lower() == "true"
+    AI_HEDGE_PERCENTILE: float = float(os.getenv("AI_HEDGE_PERCENTILE", "95"))
+    AI_HEDGE_MIN_SAMPLES: int = int(os.getenv("AI_HEDGE_MIN_SAMPLES", "20"))
+    AI_MAX_WORKERS: int = int(os.getenv("AI_MAX_WORKERS", "16"))
+    
+    # Batch readings API
+    BATCH_MAX_COUNT: int = int(os.getenv("BATCH_MAX_COUNT", "100"))
+    BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", "4"))
+    
+    # Asynchronous readings (POST /readings): "memory" queue per process or "sqlite" shared by all workers;
+    # gunicorn_conf.py switches to "sqlite" when it starts more than one worker, unless JOBS_BACKEND is set
+    JOBS_BACKEND: str = os.getenv("JOBS_BACKEND", "memory").lower()
+    JOBS_DB_PATH: str = os.getenv("JOBS_DB_PATH", "instance/reading_jobs.sqlite3")
+    JOBS_WORKERS: int = int(os.getenv("JOBS_WORKERS", "4"))
+    JOBS_MAX_PENDING: int = int(os.getenv("JOBS_MAX_PENDING", "1000"))
+    # Longest long-poll on GET /readings/<id>?wait=
+    JOBS_MAX_WAIT: float = float(os.getenv("JOBS_MAX_WAIT", "30"))
+    JOBS_TTL: float = float(os.getenv("JOBS_TTL", "3600"))
+    # Seconds before a job claimed by a worker that died is handed out again
+    JOBS_CLAIM_TIMEOUT: float = float(os.getenv("JOBS_CLAIM_TIMEOUT", "120"))
+    
+    # Prophecy backends: "hf[:model]" and/or "name=base_url" OpenAI-compatible entries
+    AI_BACKENDS: str = os.getenv("AI_BACKENDS", "hf")
+    OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "local-model")
+    OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
+    AI_ROUTER_EXPLORE_RATE: float = float(os.getenv("AI_ROUTER_EXPLORE_RATE", "0.05"))
     
     @classmethod
     def validate(cls) -> None:
         """Validate that required configuration is present."""
-        if not cls.HF_TOKEN:
+        if cls.PROPHECY_MODE != 'local' and cls.uses_huggingface() and not cls.HF_TOKEN:
             raise ConfigurationError("HF_TOKEN environment variable is required")
         
         if not os.path.exists(cls.CARDS_FOLDER):
-            raise ConfigurationError(f"Cards folder '{cls.CARDS_FOLDER}' does not exist") 
\ No newline at end of file
+            raise ConfigurationError(f"Cards folder '{cls.CARDS_FOLDER}' does not exist") 
+    
+    @classmethod
+    def uses_huggingface(cls) -> bool:
+        """Whether any configured AI backend is the Hugging Face client."""
+        return any(entry.strip() == 'hf' or entry.strip().startswith('hf:') for entry in cls.AI_BACKENDS.split(','))
\ No newline at end of file
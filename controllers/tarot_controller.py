@@ -1,8 +1,22 @@
-from typing import Dict, Any
+import json
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from models import TarotCard
 from services.card_service import CardService
-from services.ai_service import AIProphecyService
-from exceptions import TarotServiceError, InsufficientCardsError, AIProphecyError
+from services.ai_service import AIProphecyService, format_card_infos
+from services.local_prophecy import LocalProphecyGenerator
+from services.prophecy_cache import combination_key
+from services.reading_jobs import ReadingJobQueue
+from config import Config
+from exceptions import TarotServiceError, AIProphecyError, InvalidRequestError, QueueFullError
+from utils import json_codec
+from utils.deadline import Deadline
+from utils.metrics import FALLBACKS, STAGE_SECONDS
+
+
+# Served on model failures with PROPHECY_FALLBACK=static
+FALLBACK_PROPHECY = "The oracle is silent... (AI error)"
 
 
 class TarotController:
@@ -11,6 +25,13 @@ class TarotController:
     def __init__(self):
         self.card_service = CardService()
         self.ai_service = AIProphecyService()
+        self.local_prophecy = LocalProphecyGenerator()
+        self._jobs: Optional[ReadingJobQueue] = None
+        self._jobs_lock = threading.Lock()
+    
+    def warm_up(self) -> None:
+        """Import and build everything deferred by STARTUP_MODE=lazy."""
+        self.ai_service.warm_up()
     
     def draw_cards(self) -> tuple[Dict[str, Any], int]:
         """
@@ -20,42 +41,306 @@ class TarotController:
             Tuple of (response_data, status_code)
         """
         try:
-            # Draw cards
+            cards, prophecy = self._draw_reading()
+        except TarotServiceError as e:
+            return {'error': str(e)}, 500
+        except Exception as e:
+            return {'error': f'Unexpected error: {str(e)}'}, 500
+        
+        response_data = {
+            'cards': [self._card_to_dict(card) for card in cards],
+            'prophecy': prophecy
+        }
+        return response_data, 200
+    
+    def draw_cards_json(self) -> tuple[bytes, int]:
+        """
+        Handle the draw cards request, returning the serialized response body.
+        
+        The body is assembled from the card JSON fragments precomputed by
+        CardService, so only the prophecy is encoded per request.
+        
+        Returns:
+            Tuple of (JSON body, status_code)
+        """
+        try:
+            cards, prophecy = self._draw_reading()
+        except TarotServiceError as e:
+            return json_codec.dumps({'error': str(e)}), 500
+        except Exception as e:
+            return json_codec.dumps({'error': f'Unexpected error: {str(e)}'}), 500
+        
+        return self._encode_reading(cards, prophecy), 200
+    
+    def _draw_reading(self) -> Tuple[List[TarotCard], str]:
+        """
+        Draw three cards and generate their prophecy within the request budget.
+        
+        Returns:
+            Tuple of (cards, prophecy)
+        
+        Raises:
+            TarotServiceError: When the cards cannot be drawn
+        """
+        deadline = Deadline(Config.REQUEST_BUDGET)
+        cards = self.card_service.draw_cards(3)
+        
+        card_infos = format_card_infos(cards)
+        if Config.PROPHECY_MODE == 'local':
+            return cards, self.local_prophecy.generate(card_infos)
+        try:
+            prophecy = self.ai_service.generate_prophecy(
+                card_infos, cache_key=combination_key(card.key for card in cards), deadline=deadline
+            )
+        except AIProphecyError:
+            # Fall back to a prophecy for the same cards if AI fails
+            prophecy = self._fallback_prophecy(card_infos)
+        return cards, prophecy
+    
+    def _encode_reading(self, cards: List[TarotCard], prophecy: str) -> bytes:
+        """Assemble a reading response body from precomputed card fragments."""
+        with STAGE_SECONDS.time(stage='serialize'):
+            return b''.join((
+                b'{"cards":[',
+                b','.join(self.card_service.card_json(card) for card in cards),
+                b'],"prophecy":',
+                json_codec.dumps(prophecy),
+                b'}',
+            ))
+    
+    async def adraw_cards(self) -> tuple[Dict[str, Any], int]:
+        """
+        Handle the draw cards request on the asyncio serving path.
+        
+        Returns:
+            Tuple of (response_data, status_code)
+        """
+        deadline = Deadline(Config.REQUEST_BUDGET)
+        try:
             cards = self.card_service.draw_cards(3)
-            
-            # Generate prophecy
-            card_infos = [f"{card.name}: {card.meaning}" for card in cards]
-            prophecy = self.ai_service.generate_prophecy(card_infos)
-            
-            # Create response
-            response_data = {
-                'cards': [self._card_to_dict(card) for card in cards],
-                'prophecy': prophecy
-            }
-            
-            return response_data, 200
-            
-        except InsufficientCardsError as e:
+        except TarotServiceError as e:
             return {'error': str(e)}, 500
-        except AIProphecyError as e:
-            # Fallback to a default prophecy if AI fails
-            prophecy = "The oracle is silent... (AI error)"
+        except Exception as e:
+            return {'error': f'Unexpected error: {str(e)}'}, 500
+        
+        card_infos = format_card_infos(cards)
+        try:
+            if Config.PROPHECY_MODE == 'local':
+                prophecy = self.local_prophecy.generate(card_infos)
+            else:
+                prophecy = await self.ai_service.agenerate_prophecy(
+                    card_infos, cache_key=combination_key(card.key for card in cards), deadline=deadline
+                )
+        except AIProphecyError:
+            prophecy = self._fallback_prophecy(card_infos)
+        except Exception as e:
+            return {'error': f'Unexpected error: {str(e)}'}, 500
+        
+        response_data = {
+            'cards': [self._card_to_dict(card) for card in cards],
+            'prophecy': prophecy
+        }
+        return response_data, 200
+    
+    def stream_reading(self) -> Iterator[str]:
+        """
+        Handle the streaming draw request as a sequence of Server-Sent Events.
+        
+        The drawn cards are sent first as a ``cards`` event, followed by one
+        ``token`` event per prophecy chunk and a final ``done`` event carrying
+        the complete prophecy. Failures before the cards are drawn produce a
+        single ``error`` event.
+        
+        Yields:
+            Encoded SSE messages
+        """
+        try:
+            cards = self.card_service.draw_cards(3)
+        except TarotServiceError as e:
+            yield self._sse('error', {'error': str(e)})
+            return
+        except Exception as e:
+            yield self._sse('error', {'error': f'Unexpected error: {str(e)}'})
+            return
+        
+        yield self._sse('cards', {'cards': [self._card_to_dict(card) for card in cards]})
+        
+        card_infos = format_card_infos(cards)
+        chunks = []
+        try:
+            if Config.PROPHECY_MODE == 'local':
+                stream = iter([self.local_prophecy.generate(card_infos)])
+            else:
+                stream = self.ai_service.stream_prophecy(
+                    card_infos, cache_key=combination_key(card.key for card in cards)
+                )
+            for chunk in stream:
+                chunks.append(chunk)
+                yield self._sse('token', chunk)
+            prophecy = "".join(chunks).strip()
+        except AIProphecyError:
+            prophecy = self._fallback_prophecy(card_infos)
+        
+        yield self._sse('done', {'prophecy': prophecy})
+    
+    def parse_batch_request(self, payload: Optional[Dict[str, Any]]) -> Tuple[int, int]:
+        """
+        Validate the body of a batch readings request.
+        
+        Args:
+            payload: Decoded JSON body with ``count`` and optional ``spread_size``
+        
+        Returns:
+            Tuple of (count, spread_size)
+        
+        Raises:
+            InvalidRequestError: When a parameter is missing or out of range
+        """
+        if not isinstance(payload, dict):
+            raise InvalidRequestError("Request body must be a JSON object")
+        count = payload.get('count')
+        spread_size = payload.get('spread_size', 3)
+        for name, value in (('count', count), ('spread_size', spread_size)):
+            if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                raise InvalidRequestError(f"'{name}' must be a positive integer")
+        if count > Config.BATCH_MAX_COUNT:
+            raise InvalidRequestError(f"'count' must not exceed {Config.BATCH_MAX_COUNT}")
+        return count, spread_size
+    
+    def stream_batch(self, count: int, spread_size: int) -> Iterator[str]:
+        """
+        Handle a batch readings request as newline-delimited JSON.
+        
+        All spreads are drawn up front in one pass, then prophecies are
+        generated with at most BATCH_CONCURRENCY requests in flight. Each
+        reading is emitted as soon as it is ready, so results arrive out of
+        order and carry their ``index`` in the batch.
+        
+        Args:
+            count: Number of readings
+            spread_size: Number of cards per reading
+        
+        Yields:
+            One JSON line per reading (an ``error`` line for a reading that
+            failed outright), or a single error line when no cards can be drawn
+        """
+        try:
+            spreads = self.card_service.draw_spreads(count, spread_size)
+        except TarotServiceError as e:
+            yield self._ndjson({'error': str(e)})
+            return
+        except Exception as e:
+            yield self._ndjson({'error': f'Unexpected error: {str(e)}'})
+            return
+        
+        window = max(1, Config.BATCH_CONCURRENCY)
+        executor = ThreadPoolExecutor(max_workers=window, thread_name_prefix='batch')
+        pending: Dict[Future, int] = {}
+        next_index = 0
+        try:
+            while next_index < len(spreads) or pending:
+                # Keep the window full without queueing the whole batch at once
+                while next_index < len(spreads) and len(pending) < window:
+                    future = executor.submit(self._batch_prophecy, spreads[next_index])
+                    pending[future] = next_index
+                    next_index += 1
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    try:
+                        prophecy = future.result()
+                    except Exception as e:
+                        # One broken reading must not end the stream for the rest of the batch
+                        yield self._ndjson({'index': index, 'error': f'Unexpected error: {str(e)}'})
+                        continue
+                    yield self._ndjson({
+                        'index': index,
+                        'cards': [self._card_to_dict(card) for card in spreads[index]],
+                        'prophecy': prophecy,
+                    })
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _batch_prophecy(self, cards: List[TarotCard]) -> str:
+        """Generate the prophecy for one spread of a batch, falling back on AI errors."""
+        return self._prophecy_or_fallback(format_card_infos(cards), combination_key(card.key for card in cards))
+    
+    def _prophecy_or_fallback(self, card_infos: List[str], cache_key: str) -> str:
+        """Generate a prophecy within the request budget, falling back on AI errors."""
+        if Config.PROPHECY_MODE == 'local':
+            return self.local_prophecy.generate(card_infos)
+        try:
+            return self.ai_service.generate_prophecy(
+                card_infos, cache_key=cache_key, deadline=Deadline(Config.REQUEST_BUDGET)
+            )
+        except AIProphecyError:
+            return self._fallback_prophecy(card_infos)
+    
+    def _fallback_prophecy(self, card_infos: List[str]) -> str:
+        """Prophecy served when the model fails, per PROPHECY_FALLBACK."""
+        FALLBACKS.inc()
+        if Config.PROPHECY_FALLBACK == 'static':
+            return FALLBACK_PROPHECY
+        return self.local_prophecy.generate(card_infos)
+    
+    @property
+    def jobs(self) -> ReadingJobQueue:
+        """The background reading job queue, created on first use."""
+        if self._jobs is None:
+            with self._jobs_lock:
+                if self._jobs is None:
+                    self._jobs = ReadingJobQueue(self._prophecy_or_fallback, fallback=self._fallback_prophecy)
+        return self._jobs
+    
+    def submit_reading(self) -> tuple[Dict[str, Any], int]:
+        """
+        Draw three cards and queue their prophecy for background generation.
+        
+        Returns:
+            Tuple of (response_data, status_code); 202 with the reading ID
+            and cards when queued, 503 when the queue is full
+        """
+        try:
             cards = self.card_service.draw_cards(3)
-            
-            response_data = {
-                'cards': [self._card_to_dict(card) for card in cards],
-                'prophecy': prophecy
-            }
-            return response_data, 200
+            job = self.jobs.submit(
+                [self._card_to_dict(card) for card in cards],
+                format_card_infos(cards),
+                combination_key(card.key for card in cards),
+            )
+        except QueueFullError as e:
+            return {'error': str(e)}, 503
         except TarotServiceError as e:
             return {'error': str(e)}, 500
         except Exception as e:
             return {'error': f'Unexpected error: {str(e)}'}, 500
+        return job.to_dict(), 202
+    
+    def get_reading(self, reading_id: str, wait: float = 0.0) -> tuple[Dict[str, Any], int]:
+        """
+        Look up a queued reading, optionally long-polling until it is done.
+        
+        Args:
+            reading_id: ID returned by submit_reading
+            wait: Seconds to wait for the prophecy, capped at JOBS_MAX_WAIT
+        
+        Returns:
+            Tuple of (response_data, status_code)
+        """
+        job = self.jobs.get(reading_id, wait=min(max(wait, 0.0), Config.JOBS_MAX_WAIT))
+        if job is None:
+            return {'error': 'Reading not found'}, 404
+        return job.to_dict(), 200
+    
+    @staticmethod
+    def _ndjson(data: Dict[str, Any]) -> str:
+        """Encode a single NDJSON line."""
+        return json.dumps(data) + "\n"
+    
+    @staticmethod
+    def _sse(event: str, data: Any) -> str:
+        """Encode a single Server-Sent Event."""
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
     
-    def _card_to_dict(self, card: TarotCard) -> Dict[str, str]:
+    def _card_to_dict(self, card: TarotCard) -> Dict[str, Any]:
         """Convert TarotCard to dictionary for JSON response."""
-        return {
-            'image': card.image_path,
-            'name': card.name,
-            'meaning': card.meaning
-        } 
\ No newline at end of file
+        return card.to_dict()
\ No newline at end of file
@@ -13,6 +13,31 @@ class AIProphecyError(TarotServiceError):
     pass
 
 
+class CircuitOpenError(AIProphecyError):
+    """Raised when the AI backend circuit breaker rejects a call."""
+    pass
+
+
+class DeadlineExceededError(AIProphecyError):
+    """Raised when a prophecy request runs out of its latency budget."""
+    pass
+
+
+class OverloadedError(AIProphecyError):
+    """Raised when admission control sheds a prophecy request."""
+    pass
+
+
+class InvalidRequestError(TarotServiceError):
+    """Raised when a client request has invalid parameters."""
+    pass
+
+
+class QueueFullError(TarotServiceError):
+    """Raised when the reading job queue cannot accept more work."""
+    pass
+
+
 class ConfigurationError(TarotServiceError):
     """Raised when configuration is invalid or missing."""
     pass 
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""
+Gunicorn settings sized for an I/O-bound app.
+
+A reading spends almost all of its time waiting on the model, so each worker
+runs many threads (``gthread``) or greenlets (``gevent``). Workers follow the
+CPU count; the per-worker concurrency follows Little's law: to keep one core
+busy, a worker needs ``(upstream latency + CPU time) / CPU time`` requests in
+flight. Usage::
+
+    gunicorn -c gunicorn_conf.py "app:create_app()"
+
+With GUNICORN_PRELOAD the app is imported and built once in the master.
+Workers then share the card index, meanings and imported modules with it
+copy-on-write; the ``pre_fork`` hook moves those objects out of the garbage
+collector's reach so collections in a worker do not touch (and copy) their
+pages. Data that changes at runtime is shared through the memory-mapped
+cache in services.shared_cache instead, which is enabled automatically when
+more than one worker runs.
+
+Every value can be overridden with the GUNICORN_* settings in config.py.
+"""
+import gc
+import math
+import os
+import tempfile
+from typing import Any, Dict, Optional
+from config import Config
+
+
+def size_workers(cpu_count: int, worker_class: str, upstream_latency: float, cpu_per_request: float,
+                 max_workers: int, max_threads: int, max_connections: int,
+                 workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Choose the worker, thread and connection counts.
+    
+    Args:
+        cpu_count: CPUs available to the server
+        worker_class: ``gthread``, ``gevent`` or ``sync``
+        upstream_latency: Expected seconds a request waits on the model
+        cpu_per_request: Expected CPU seconds a request needs
+        max_workers: Upper bound on worker processes (memory)
+        max_threads: Upper bound on threads per gthread worker
+        max_connections: Upper bound on concurrent requests per gevent worker
+        workers: Explicit worker count, e.g. from WEB_CONCURRENCY
+    
+    Returns:
+        Gunicorn settings: workers, worker_class, threads, worker_connections
+    """
+    concurrency = math.ceil((upstream_latency + cpu_per_request) / max(cpu_per_request, 1e-3))
+    settings: Dict[str, Any] = {
+        'workers': workers or max(1, min(cpu_count, max_workers)),
+        'worker_class': worker_class,
+        'threads': 1,
+    }
+    if worker_class == 'gthread':
+        settings['threads'] = max(2, min(concurrency, max_threads))
+    elif worker_class == 'gevent':
+        settings['worker_connections'] = max(2, min(concurrency, max_connections))
+    return settings
+
+
+_settings = size_workers(
+    cpu_count=len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1),
+    worker_class=Config.GUNICORN_WORKER_CLASS,
+    upstream_latency=Config.GUNICORN_UPSTREAM_LATENCY,
+    cpu_per_request=Config.GUNICORN_CPU_PER_REQUEST,
+    max_workers=Config.GUNICORN_MAX_WORKERS,
+    max_threads=Config.GUNICORN_MAX_THREADS,
+    max_connections=Config.GUNICORN_MAX_CONNECTIONS,
+    workers=int(os.environ['WEB_CONCURRENCY']) if os.environ.get('WEB_CONCURRENCY') else None,
+)
+
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
+workers = _settings['workers']
+worker_class = _settings['worker_class']
+threads = _settings['threads']
+worker_connections = _settings.get('worker_connections', 1000)
+timeout = Config.GUNICORN_TIMEOUT
+keepalive = 2
+preload_app = Config.GUNICORN_PRELOAD
+
+# Each reading with a deadline (and a possible hedge) runs its model call in the
+# prophecy pool, so the pool must not be smaller than the request concurrency
+if 'AI_MAX_WORKERS' not in os.environ:
+    Config.AI_MAX_WORKERS = max(Config.AI_MAX_WORKERS, 2 * max(threads, _settings.get('worker_connections', 1)))
+
+# An in-memory job only exists in the worker that queued it, so GET /readings/<id> must see a shared store
+if 'JOBS_BACKEND' not in os.environ and workers > 1:
+    Config.JOBS_BACKEND = 'sqlite'
+
+# /metrics must merge every worker's numbers, whichever worker answers the scrape
+if not Config.METRICS_DIR and workers > 1:
+    Config.METRICS_DIR = os.path.join(tempfile.gettempdir(), f'tarot-metrics-{os.getpid()}')
+
+# Workers on one host share cached prophecies through shared memory
+if 'SHARED_CACHE_ENABLED' not in os.environ:
+    Config.SHARED_CACHE_ENABLED = workers > 1
+
+
+def on_starting(server) -> None:
+    """Drop metrics snapshots written by the workers of an earlier server."""
+    if Config.METRICS_DIR:
+        from utils.metrics import clear_snapshots
+        clear_snapshots(Config.METRICS_DIR)
+
+
+def pre_fork(server, worker) -> None:
+    """Freeze the preloaded heap so the GC in workers does not write to shared pages."""
+    if preload_app:
+        # Collect first, or garbage from startup is frozen too and never freed in any worker
+        gc.collect()
+        gc.freeze()
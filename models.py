@@ -1,14 +1,30 @@
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 
-@dataclass
+@dataclass(frozen=True)
 class TarotCard:
     """Represents a tarot card with its properties."""
     image_path: str
     name: str
     meaning: str
     key: str
+    # (mime type, srcset) pairs of the built image variants, best format first
+    sources: Tuple[Tuple[str, str], ...] = ()
+    # (x, y) pixel offset of the card in the sprite sheet, in sprite delivery mode
+    sprite: Optional[Tuple[int, int]] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Public representation of the card in API responses."""
+        card_dict = {
+            'image': self.image_path,
+            'name': self.name,
+            'meaning': self.meaning,
+            'sources': [{'type': mime_type, 'srcset': srcset} for mime_type, srcset in self.sources]
+        }
+        if self.sprite is not None:
+            card_dict['sprite'] = {'x': self.sprite[0], 'y': self.sprite[1]}
+        return card_dict
 
 
 @dataclass
@@ -16,3 +32,24 @@ class CardReading:
     """Represents a complete tarot card reading."""
     cards: List[TarotCard]
     prophecy: str
+
+
+@dataclass
+class ReadingJob:
+    """A reading whose prophecy is generated in the background."""
+    id: str
+    # Cards as rendered in API responses
+    cards: List[Dict[str, Any]]
+    card_infos: List[str]
+    cache_key: str
+    status: str = 'pending'
+    prophecy: Optional[str] = None
+    created_at: float = 0.0
+    finished_at: Optional[float] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Public representation of the job in API responses."""
+        job_dict = {'id': self.id, 'status': self.status, 'cards': self.cards}
+        if self.prophecy is not None:
+            job_dict['prophecy'] = self.prophecy
+        return job_dict
@@ -0,0 +1,166 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+from config import Config
+from exceptions import OverloadedError
+
+
+class AdmissionGate:
+    """
+    Bounded concurrency with a short wait queue in front of the model.
+    
+    At most ``limit`` calls run at once. Up to ``queue_size`` further callers
+    may wait, each for at most ``max_wait`` seconds; anyone beyond that is
+    rejected at once with OverloadedError, so a traffic spike is shed
+    instead of slowing every request down together.
+    """
+    
+    def __init__(self, limit: Optional[int] = None, queue_size: Optional[int] = None,
+                 max_wait: Optional[float] = None):
+        self.limit = limit if limit is not None else Config.ADMISSION_MAX_CONCURRENCY
+        self.queue_size = max(0, queue_size if queue_size is not None else Config.ADMISSION_QUEUE_SIZE)
+        self.max_wait = max_wait if max_wait is not None else Config.ADMISSION_MAX_WAIT
+        self._condition = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether the gate limits anything (ADMISSION_MAX_CONCURRENCY > 0)."""
+        return self.limit > 0
+    
+    @property
+    def active(self) -> int:
+        """Calls currently holding a slot."""
+        return self._active
+    
+    @property
+    def waiting(self) -> int:
+        """Callers currently queued for a slot."""
+        return self._waiting
+    
+    def acquire(self, timeout: Optional[float] = None) -> None:
+        """
+        Take a slot, waiting at most max_wait (or timeout, if shorter) seconds.
+        
+        Raises:
+            OverloadedError: When the wait queue is full or the wait times out
+        """
+        if not self.enabled:
+            return
+        with self._condition:
+            # Do not overtake callers that are already queued
+            if self._active < self.limit and self._waiting == 0:
+                self._active += 1
+                return
+            if self._waiting >= self.queue_size:
+                raise OverloadedError("Prophecy queue is full")
+            wait = self.max_wait if timeout is None else min(self.max_wait, timeout)
+            self._waiting += 1
+            try:
+                admitted = self._condition.wait_for(lambda: self._active < self.limit, timeout=wait)
+            finally:
+                self._waiting -= 1
+            if not admitted:
+                raise OverloadedError(f"No prophecy slot became free within {wait:.2f}s")
+            self._active += 1
+    
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free now and nobody is queued for it."""
+        if not self.enabled:
+            return True
+        with self._condition:
+            if self._active < self.limit and self._waiting == 0:
+                self._active += 1
+                return True
+            return False
+    
+    async def aacquire(self, timeout: Optional[float] = None) -> None:
+        """
+        Take a slot without blocking the event loop.
+        
+        The wait runs in a worker thread, which cannot be interrupted; if the
+        awaiting task is cancelled meanwhile, the slot the thread still takes
+        is handed straight back.
+        
+        Raises:
+            OverloadedError: When the wait queue is full or the wait times out
+        """
+        if not self.enabled:
+            return
+        waiter = asyncio.ensure_future(asyncio.to_thread(self.acquire, timeout))
+        try:
+            await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            waiter.add_done_callback(self._release_abandoned)
+            raise
+    
+    def _release_abandoned(self, waiter: 'asyncio.Future[None]') -> None:
+        """Give back a slot acquired for a task that was cancelled while waiting."""
+        if not waiter.cancelled() and waiter.exception() is None:
+            self.release()
+    
+    def release(self) -> None:
+        """Give back a slot taken with acquire."""
+        if not self.enabled:
+            return
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+    
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None) -> Iterator[None]:
+        """Hold a slot for the enclosed block."""
+        self.acquire(timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class RateLimiter:
+    """
+    Per-client token buckets.
+    
+    Each client may make ``burst`` requests at once and then ``rate``
+    requests per second. Buckets of the least recently seen clients are
+    dropped once ``max_clients`` are tracked; a dropped client simply starts
+    again with a full bucket.
+    """
+    
+    def __init__(self, rate: Optional[float] = None, burst: Optional[int] = None, max_clients: int = 10000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate if rate is not None else Config.RATE_LIMIT_PER_MINUTE / 60.0
+        self.burst = max(1, burst if burst is not None else Config.RATE_LIMIT_BURST)
+        self.max_clients = max_clients
+        self._clock = clock
+        self._lock = threading.Lock()
+        # client -> (tokens, last refill time)
+        self._buckets: 'OrderedDict[str, tuple[float, float]]' = OrderedDict()
+    
+    def check(self, client: str) -> float:
+        """
+        Take a token for a request from the client.
+        
+        Args:
+            client: Client identifier, e.g. its IP address
+        
+        Returns:
+            0 when the request is allowed, otherwise seconds until the next token
+        """
+        now = self._clock()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1.0
+            if allowed:
+                tokens -= 1.0
+            self._buckets[client] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        if allowed:
+            return 0.0
+        return (1.0 - tokens) / self.rate if self.rate > 0 else float('inf')
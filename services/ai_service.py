@@ -1,53 +1,621 @@
-import traceback
-from typing import List
-from huggingface_hub import InferenceClient
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional
 from config import Config
-from exceptions import AIProphecyError
+from exceptions import AIProphecyError, CircuitOpenError, DeadlineExceededError, OverloadedError
+from models import TarotCard
+from services.admission import AdmissionGate
+from services.circuit_breaker import CircuitBreaker
+from services.prophecy_backends import BackendRouter, Messages, build_backends
+from services.prophecy_cache import ProphecyCache
+from services.shared_cache import shared_cache
+from services.single_flight import SingleFlight
+from utils.deadline import Deadline
+from utils.latency import LatencyTracker
 from utils.logger import setup_logger
+from utils.metrics import (
+    ADMISSION_QUEUE_DEPTH, CACHE_LOOKUPS, COALESCED_IN_FLIGHT, MODEL_CALLS_IN_FLIGHT, SHED, STAGE_SECONDS,
+    STALE_SERVED, UPSTREAM_ERRORS
+)
 
 logger = setup_logger(__name__)
 
 
+def format_card_infos(cards: Iterable[TarotCard]) -> List[str]:
+    """Describe cards as the "Name: meaning" lines used in the prompt."""
+    return [f"{card.name}: {card.meaning}" for card in cards]
+
+
 class AIProphecyService:
     """Service responsible for generating AI prophecies based on tarot cards."""
     
-    def __init__(self):
-        self.client = InferenceClient("HuggingFaceH4/zephyr-7b-alpha", token=Config.HF_TOKEN)
+    def __init__(self, router: Optional[BackendRouter] = None):
+        self.router = router or BackendRouter(build_backends())
+        self.cache = ProphecyCache(shared=shared_cache()) if Config.PROPHECY_CACHE_ENABLED else None
+        self.single_flight = SingleFlight()
+        self.circuit_breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+        self.admission = AdmissionGate()
+        self._executor = ThreadPoolExecutor(max_workers=Config.AI_MAX_WORKERS, thread_name_prefix='prophecy')
+        # Model calls that outlive a stale-while-revalidate deadline finish here
+        self._revalidate_executor = ThreadPoolExecutor(
+            max_workers=Config.AI_MAX_WORKERS, thread_name_prefix='revalidate'
+        )
+        self._revalidations: Dict[str, Future] = {}
+        self._revalidations_lock = threading.Lock()
+        self._arevalidations: Dict[str, asyncio.Future] = {}
+        single_flight = self.single_flight
+        COALESCED_IN_FLIGHT.set_function(lambda: single_flight.in_flight)
+        admission = self.admission
+        ADMISSION_QUEUE_DEPTH.set_function(lambda: admission.waiting)
     
-    def generate_prophecy(self, card_infos: List[str]) -> str:
+    def generate_prophecy(self, card_infos: List[str], cache_key: Optional[str] = None,
+                          deadline: Optional[Deadline] = None) -> str:
         """
         Generate a political prophecy based on tarot card information.
         
+        Once anything is cached for the combination, the answer arrives within
+        PROPHECY_SWR_DEADLINE: a late model call is left to refresh the cache
+        in the background and the cached prophecy is served meanwhile.
+        
         Args:
             card_infos: List of card descriptions with meanings
+            cache_key: Canonical card combination key; enables the prophecy cache
+            deadline: Latency budget for the whole request; unbounded if omitted
             
         Returns:
             Generated prophecy text
+        
+        Raises:
+            AIProphecyError: When no prophecy can be generated; OverloadedError
+                when the request was shed and nothing is cached to serve instead
         """
-        prompt = self._build_prompt(card_infos)
+        cached = self._lookup_cache(cache_key)
+        if cached is not None:
+            return cached
+        
+        stale = self._lookup_stale(cache_key)
+        if stale is not None:
+            return self._revalidate(card_infos, cache_key, stale, deadline)
         
         try:
-            logger.info("Generating AI prophecy...")
-            response = self.client.chat_completion(
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7
+            if cache_key is None:
+                return self.refresh_prophecy(card_infos, deadline=deadline)
+            # Concurrent requests for the same combination share one upstream call
+            return self.single_flight.do(cache_key, lambda: self.refresh_prophecy(card_infos, cache_key, deadline),
+                                         timeout=Deadline.remaining_of(deadline))
+        except TimeoutError:
+            raise DeadlineExceededError("Prophecy request exceeded its latency budget while coalesced")
+        except OverloadedError:
+            return self._shed(cache_key)
+    
+    def refresh_prophecy(self, card_infos: List[str], cache_key: Optional[str] = None,
+                         deadline: Optional[Deadline] = None, admit: bool = True) -> str:
+        """
+        Generate a new prophecy, bypassing cached variants, and store it.
+        
+        Args:
+            card_infos: List of card descriptions with meanings
+            cache_key: Canonical card combination key to store the result under
+            deadline: Latency budget for the request; unbounded if omitted
+            admit: Pass through admission control and the circuit breaker; off for
+                offline batch jobs that bound their own concurrency
+            
+        Returns:
+            Generated prophecy text
+        """
+        if not admit:
+            prophecy = self._complete_with_retries(card_infos, deadline)
+        else:
+            prophecy = self._request_prophecy(card_infos, deadline)
+        if self.cache is not None and cache_key is not None:
+            self.cache.put(cache_key, prophecy)
+        return prophecy
+    
+    def _lookup_cache(self, cache_key: Optional[str]) -> Optional[str]:
+        """Return a cached prophecy for the combination, counting the hit or miss."""
+        if self.cache is None or cache_key is None:
+            return None
+        with STAGE_SECONDS.time(stage='cache_lookup'):
+            cached = self.cache.get(cache_key)
+        CACHE_LOOKUPS.inc(result='hit' if cached is not None else 'miss')
+        if cached is not None:
+            logger.debug("Prophecy cache hit for %s", cache_key)
+        return cached
+    
+    def _lookup_stale(self, cache_key: Optional[str]) -> Optional[str]:
+        """Return any cached prophecy for the combination when stale-while-revalidate is enabled."""
+        if Config.PROPHECY_SWR_DEADLINE <= 0 or self.cache is None or cache_key is None:
+            return None
+        with STAGE_SECONDS.time(stage='cache_lookup'):
+            return self.cache.get_stale(cache_key)
+    
+    def _revalidate(self, card_infos: List[str], cache_key: str, stale: str,
+                    deadline: Optional[Deadline] = None) -> str:
+        """
+        Generate a fresh prophecy, but answer with the stale one if it takes too long.
+        
+        The model call runs in the background, shared by every request for the
+        same combination, and stores its result in the cache when it finishes,
+        whether or not anyone is still waiting for it.
+        
+        Args:
+            card_infos: List of card descriptions with meanings
+            cache_key: Canonical card combination key
+            stale: Cached prophecy to serve when the call is late or fails
+            deadline: Latency budget for the model call
+        
+        Returns:
+            The fresh prophecy if it arrives within PROPHECY_SWR_DEADLINE, else the stale one
+        """
+        try:
+            return self._start_revalidation(card_infos, cache_key, deadline).result(
+                timeout=Config.PROPHECY_SWR_DEADLINE
             )
-            prophecy = response.choices[0].message["content"].strip()
+        except TimeoutError:
+            STALE_SERVED.inc(reason='deadline')
+        except OverloadedError:
+            SHED.inc(reason='queue_full', outcome='cached')
+        except AIProphecyError:
+            STALE_SERVED.inc(reason='error')
+        logger.debug("Serving a cached prophecy for %s while it is refreshed", cache_key)
+        return stale
+    
+    def _start_revalidation(self, card_infos: List[str], cache_key: str, deadline: Optional[Deadline]) -> Future:
+        """Return the background refresh for the combination, starting one if none is running."""
+        with self._revalidations_lock:
+            future = self._revalidations.get(cache_key)
+            if future is not None:
+                return future
+            future = self._revalidate_executor.submit(
+                contextvars.copy_context().run,
+                self.single_flight.do, cache_key, lambda: self.refresh_prophecy(card_infos, cache_key, deadline)
+            )
+            self._revalidations[cache_key] = future
+        future.add_done_callback(lambda done: self._finish_revalidation(cache_key, done))
+        return future
+    
+    def _finish_revalidation(self, cache_key: str, future: Future) -> None:
+        """Forget a finished background refresh, logging its failure."""
+        with self._revalidations_lock:
+            if self._revalidations.get(cache_key) is future:
+                del self._revalidations[cache_key]
+        error = future.exception()
+        if error is not None:
+            logger.warning("Background prophecy refresh for %s failed: %s", cache_key, error)
+    
+    async def agenerate_prophecy(self, card_infos: List[str], cache_key: Optional[str] = None,
+                                 deadline: Optional[Deadline] = None) -> str:
+        """
+        Generate a political prophecy without blocking the event loop.
+        
+        Async counterpart of generate_prophecy used by the ASGI entry point.
+        Cache lookups run in the default executor; the model call awaits the
+        backend's async client, so many readings can wait concurrently.
+        
+        Args:
+            card_infos: List of card descriptions with meanings
+            cache_key: Canonical card combination key; enables the prophecy cache
+            deadline: Latency budget for the whole request; unbounded if omitted
+            
+        Returns:
+            Generated prophecy text
+        """
+        cached = await asyncio.to_thread(self._lookup_cache, cache_key)
+        if cached is not None:
+            return cached
+        
+        stale = await asyncio.to_thread(self._lookup_stale, cache_key)
+        if stale is not None:
+            return await self._arevalidate(card_infos, cache_key, stale, deadline)
+        
+        try:
+            if cache_key is None:
+                return await self._arequest_prophecy(card_infos, deadline)
+            return await self.single_flight.ado(
+                cache_key, lambda: self._arefresh_prophecy(card_infos, cache_key, deadline)
+            )
+        except OverloadedError:
+            return await asyncio.to_thread(self._shed, cache_key)
+    
+    async def _arevalidate(self, card_infos: List[str], cache_key: str, stale: str,
+                           deadline: Optional[Deadline] = None) -> str:
+        """
+        Async counterpart of _revalidate.
+        
+        The refresh awaits the backend's async client in its own task, shared
+        through single_flight with every request for the combination, and is
+        shielded so it still stores its result after the waiters gave up.
+        """
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(self._astart_revalidation(card_infos, cache_key, deadline)),
+                Config.PROPHECY_SWR_DEADLINE
+            )
+        except asyncio.TimeoutError:
+            STALE_SERVED.inc(reason='deadline')
+        except OverloadedError:
+            SHED.inc(reason='queue_full', outcome='cached')
+        except AIProphecyError:
+            STALE_SERVED.inc(reason='error')
+        logger.debug("Serving a cached prophecy for %s while it is refreshed", cache_key)
+        return stale
+    
+    def _astart_revalidation(self, card_infos: List[str], cache_key: str,
+                             deadline: Optional[Deadline]) -> asyncio.Future:
+        """Return the background async refresh for the combination, starting one if none is running."""
+        task = self._arevalidations.get(cache_key)
+        if task is not None and not task.done():
+            return task
+        task = asyncio.ensure_future(
+            self.single_flight.ado(cache_key, lambda: self._arefresh_prophecy(card_infos, cache_key, deadline))
+        )
+        self._arevalidations[cache_key] = task
+        task.add_done_callback(lambda done: self._finish_arevalidation(cache_key, done))
+        return task
+    
+    def _finish_arevalidation(self, cache_key: str, task: asyncio.Future) -> None:
+        """Forget a finished background async refresh, logging its failure."""
+        if self._arevalidations.get(cache_key) is task:
+            del self._arevalidations[cache_key]
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Background prophecy refresh for %s failed: %s", cache_key, task.exception())
+    
+    async def _arefresh_prophecy(self, card_infos: List[str], cache_key: str,
+                                 deadline: Optional[Deadline] = None) -> str:
+        """Generate a new prophecy asynchronously and store it in the cache."""
+        prophecy = await self._arequest_prophecy(card_infos, deadline)
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.put, cache_key, prophecy)
+        return prophecy
+    
+    async def _arequest_prophecy(self, card_infos: List[str], deadline: Optional[Deadline] = None) -> str:
+        """Request a new prophecy asynchronously through the circuit breaker and admission control."""
+        self._admit_backend_call()
+        try:
+            await self.admission.aacquire(Deadline.remaining_of(deadline))
+        except BaseException:
+            self.circuit_breaker.record_abandoned()
+            raise
+        try:
+            started = time.monotonic()
+            try:
+                prophecy = await self._acomplete_with_retries(card_infos, deadline)
+            except AIProphecyError:
+                self.circuit_breaker.record_failure()
+                raise
+            except BaseException:
+                # Cancelled while waiting on the model
+                self.circuit_breaker.record_abandoned()
+                raise
+            self.circuit_breaker.record_success(time.monotonic() - started)
+            return prophecy
+        finally:
+            self.admission.release()
+    
+    async def _acomplete_with_retries(self, card_infos: List[str], deadline: Optional[Deadline]) -> str:
+        """Async counterpart of _complete_with_retries."""
+        attempt = 0
+        while True:
+            try:
+                return await self._ahedged_complete(card_infos, deadline)
+            except DeadlineExceededError:
+                raise
+            except AIProphecyError:
+                delay = self._retry_delay(attempt, deadline)
+                if delay is None:
+                    raise
+                attempt += 1
+                logger.info("Retrying prophecy request (attempt %d) in %.2fs", attempt + 1, delay)
+                await asyncio.sleep(delay)
+    
+    async def _ahedged_complete(self, card_infos: List[str], deadline: Optional[Deadline]) -> str:
+        """Async counterpart of _hedged_complete; losing requests are cancelled and the hedge's slot returned."""
+        tasks = [asyncio.ensure_future(self._atimed_complete(card_infos))]
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        try:
+            hedge_after = self._hedge_delay(deadline)
+            if hedge_after is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+                if not done and self.admission.try_acquire():
+                    logger.info("Hedging prophecy request after %.2fs", hedge_after)
+                    hedge = asyncio.ensure_future(self._atimed_complete(card_infos))
+                    hedge.add_done_callback(lambda _: self.admission.release())
+                    tasks.append(hedge)
+                    pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=Deadline.remaining_of(deadline), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise DeadlineExceededError("Prophecy request exceeded its latency budget")
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _atimed_complete(self, card_infos: List[str]) -> str:
+        """Run a single async chat completion on the routed backend and record its latency."""
+        backend = self.router.choose()
+        started = time.monotonic()
+        try:
+            logger.info("Generating AI prophecy (async) with %s...", backend.name)
+            messages = self._build_messages(card_infos)
+            with MODEL_CALLS_IN_FLIGHT.track_inprogress(), STAGE_SECONDS.time(stage='chat_completion'):
+                prophecy = (await backend.acomplete(messages, temperature=0.7)).strip()
             logger.info("AI prophecy generated successfully")
+        except Exception as e:
+            self.router.record(backend, time.monotonic() - started, ok=False)
+            UPSTREAM_ERRORS.inc(backend=backend.name)
+            logger.error("Error generating prophecy: %s", e)
+            logger.debug("Prophecy request failed", exc_info=True)
+            raise AIProphecyError(f"Failed to generate prophecy: {str(e)}")
+        latency = time.monotonic() - started
+        self.router.record(backend, latency, ok=True)
+        self.latency.record(latency)
+        return prophecy
+    
+    def _shed(self, cache_key: Optional[str]) -> str:
+        """
+        Answer a request shed by admission control with any cached prophecy.
+        
+        Raises:
+            OverloadedError: When nothing is cached for the combination
+        """
+        stale = self.cache.get_stale(cache_key) if self.cache is not None and cache_key is not None else None
+        SHED.inc(reason='queue_full', outcome='cached' if stale is not None else 'degraded')
+        if stale is None:
+            raise OverloadedError("AI backend is overloaded and no cached prophecy is available")
+        logger.info("AI backend overloaded; serving a cached prophecy for %s", cache_key)
+        return stale
+    
+    def _admit_backend_call(self) -> None:
+        """Fail fast when the circuit breaker is open."""
+        if not self.circuit_breaker.allow_request():
+            logger.warning("AI backend circuit is open; skipping prophecy request")
+            raise CircuitOpenError("AI backend is unavailable; circuit breaker is open")
+    
+    def warm_up(self) -> None:
+        """Build the backend clients now instead of on the first request."""
+        self.router.warm_up()
+    
+    async def aclose(self) -> None:
+        """Close the async clients of every backend."""
+        await self.router.aclose()
+    
+    def stream_prophecy(self, card_infos: List[str], cache_key: Optional[str] = None) -> Iterator[str]:
+        """
+        Stream a political prophecy chunk by chunk as the model produces it.
+        
+        A cached prophecy is yielded as a single chunk. A freshly generated one
+        is stored in the cache once the stream completes.
+        
+        Args:
+            card_infos: List of card descriptions with meanings
+            cache_key: Canonical card combination key; enables the prophecy cache
+            
+        Yields:
+            Prophecy text chunks
+            
+        Raises:
+            AIProphecyError: When the stream cannot be started or breaks off
+        """
+        cached = self._lookup_cache(cache_key)
+        if cached is not None:
+            yield cached
+            return
+        
+        self._admit_backend_call()
+        try:
+            self.admission.acquire()
+        except OverloadedError:
+            self.circuit_breaker.record_abandoned()
+            yield self._shed(cache_key)
+            return
+        try:
+            backend = self.router.choose()
+            chunks = []
+            started = time.monotonic()
+            try:
+                logger.info("Streaming AI prophecy with %s...", backend.name)
+                with MODEL_CALLS_IN_FLIGHT.track_inprogress():
+                    for delta in backend.stream(self._build_messages(card_infos), temperature=0.7):
+                        chunks.append(delta)
+                        yield delta
+            except Exception as e:
+                self.router.record(backend, time.monotonic() - started, ok=False)
+                UPSTREAM_ERRORS.inc(backend=backend.name)
+                self.circuit_breaker.record_failure()
+                logger.error("Error streaming prophecy: %s", e)
+                logger.debug("Prophecy request failed", exc_info=True)
+                raise AIProphecyError(f"Failed to generate prophecy: {str(e)}")
+            except BaseException:
+                # The client went away and the generator was closed mid-stream
+                self.circuit_breaker.record_abandoned()
+                raise
+            self.router.record(backend, time.monotonic() - started, ok=True)
+            self.circuit_breaker.record_success(time.monotonic() - started)
+            STAGE_SECONDS.observe(time.monotonic() - started, stage='chat_completion')
+            
+            prophecy = "".join(chunks).strip()
+            logger.info("AI prophecy streamed successfully")
+            if self.cache is not None and cache_key is not None and prophecy:
+                self.cache.put(cache_key, prophecy)
+        finally:
+            self.admission.release()
+    
+    def _request_prophecy(self, card_infos: List[str], deadline: Optional[Deadline] = None) -> str:
+        """Request a new prophecy through the circuit breaker and admission control."""
+        self._admit_backend_call()
+        try:
+            self.admission.acquire(Deadline.remaining_of(deadline))
+        except OverloadedError:
+            self.circuit_breaker.record_abandoned()
+            raise
+        calls: List[Future] = []
+        try:
+            started = time.monotonic()
+            try:
+                prophecy = self._complete_with_retries(card_infos, deadline, calls)
+            except AIProphecyError:
+                self.circuit_breaker.record_failure()
+                raise
+            except BaseException:
+                self.circuit_breaker.record_abandoned()
+                raise
+            self.circuit_breaker.record_success(time.monotonic() - started)
             return prophecy
+        finally:
+            self._release_when_done(calls)
+    
+    def _release_when_done(self, calls: List[Future]) -> None:
+        """
+        Give back the request's admission slot once none of its model calls is still running.
+        
+        A caller that stops waiting at its deadline leaves its calls running in
+        the pool; they keep the slot, so the gate still bounds upstream concurrency.
+        """
+        running = [call for call in calls if not call.done()]
+        if not running:
+            self.admission.release()
+            return
+        remaining = [len(running)]
+        lock = threading.Lock()
+        
+        def finished(_: Future) -> None:
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self.admission.release()
+        
+        for call in running:
+            call.add_done_callback(finished)
+    
+    def _complete_with_retries(self, card_infos: List[str], deadline: Optional[Deadline],
+                               calls: Optional[List[Future]] = None) -> str:
+        """Run hedged attempts with jittered exponential backoff until one succeeds or the budget ends."""
+        attempt = 0
+        while True:
+            try:
+                return self._hedged_complete(card_infos, deadline, calls)
+            except DeadlineExceededError:
+                raise
+            except AIProphecyError:
+                delay = self._retry_delay(attempt, deadline)
+                if delay is None:
+                    raise
+                attempt += 1
+                logger.info("Retrying prophecy request (attempt %d) in %.2fs", attempt + 1, delay)
+                time.sleep(delay)
+    
+    def _hedged_complete(self, card_infos: List[str], deadline: Optional[Deadline],
+                         calls: Optional[List[Future]] = None) -> str:
+        """
+        Run one attempt, optionally hedged with a second identical request.
+        
+        Without a deadline or hedging the call runs inline. Otherwise it runs in
+        the worker pool so the caller can stop waiting when the budget runs out;
+        once the hedge threshold passes a second request is started and the
+        first successful response wins. The hedge needs an admission slot of
+        its own, held until it finishes, and is skipped when none is free.
+        Calls submitted to the pool on the caller's slot are added to calls,
+        since they may outlive the caller.
+        """
+        hedge_after = self._hedge_delay(deadline)
+        if deadline is None and hedge_after is None:
+            return self._timed_complete(card_infos)
+        if deadline is not None and deadline.expired:
+            raise DeadlineExceededError("Prophecy request exceeded its latency budget")
+        
+        futures: List[Future] = [self._submit(card_infos)]
+        if calls is not None:
+            calls.append(futures[0])
+        if hedge_after is not None:
+            done, _ = wait(futures, timeout=hedge_after)
+            if not done and self.admission.try_acquire():
+                logger.info("Hedging prophecy request after %.2fs", hedge_after)
+                hedge = self._submit(card_infos)
+                hedge.add_done_callback(lambda _: self.admission.release())
+                futures.append(hedge)
+        
+        pending = set(futures)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, timeout=Deadline.remaining_of(deadline), return_when=FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceededError("Prophecy request exceeded its latency budget")
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+    
+    def _submit(self, card_infos: List[str]) -> Future:
+        """Run one attempt in the worker pool with the caller's context (metrics recording)."""
+        return self._executor.submit(contextvars.copy_context().run, self._timed_complete, card_infos)
+    
+    def _hedge_delay(self, deadline: Optional[Deadline]) -> Optional[float]:
+        """Seconds to wait before hedging, or None when hedging does not apply."""
+        if not Config.AI_HEDGE_ENABLED:
+            return None
+        threshold = self.latency.percentile(Config.AI_HEDGE_PERCENTILE, Config.AI_HEDGE_MIN_SAMPLES)
+        if threshold is None or (deadline is not None and threshold >= deadline.remaining()):
+            return None
+        return threshold
+    
+    def _retry_delay(self, attempt: int, deadline: Optional[Deadline]) -> Optional[float]:
+        """Full-jitter backoff before the next retry, or None when no retry fits."""
+        if attempt >= Config.AI_MAX_RETRIES:
+            return None
+        delay = random.uniform(0, Config.AI_RETRY_BASE_DELAY * (2 ** attempt))
+        if deadline is not None and delay >= deadline.remaining():
+            return None
+        return delay
+    
+    def _timed_complete(self, card_infos: List[str]) -> str:
+        """Run a single chat completion on the routed backend and record its latency."""
+        backend = self.router.choose()
+        started = time.monotonic()
+        try:
+            logger.info("Generating AI prophecy with %s...", backend.name)
+            messages = self._build_messages(card_infos)
+            with MODEL_CALLS_IN_FLIGHT.track_inprogress(), STAGE_SECONDS.time(stage='chat_completion'):
+                prophecy = backend.complete(messages, temperature=0.7).strip()
+            logger.info("AI prophecy generated successfully")
         except Exception as e:
-            logger.error(f"Error generating prophecy: {e}")
-            logger.debug(f"Traceback: {traceback.format_exc()}")
+            self.router.record(backend, time.monotonic() - started, ok=False)
+            UPSTREAM_ERRORS.inc(backend=backend.name)
+            logger.error("Error generating prophecy: %s", e)
+            logger.debug("Prophecy request failed", exc_info=True)
             raise AIProphecyError(f"Failed to generate prophecy: {str(e)}")
+        latency = time.monotonic() - started
+        self.router.record(backend, latency, ok=True)
+        self.latency.record(latency)
+        return prophecy
+    
+    def _build_messages(self, card_infos: List[str]) -> Messages:
+        """Build the chat messages for AI prophecy generation."""
+        return [{"role": "user", "content": self._build_prompt(card_infos)}]
     
     def _build_prompt(self, card_infos: List[str]) -> str:
         """Build the prompt for AI prophecy generation."""
-        return (
-            "You are a mystical political oracle. Based on the following three tarot cards and their meanings, "
-            "generate a short political prophecy (3-5 sentences) that describes possible future global or geopolitical events. "
-            "Do not mention the cards directly in the text. "
-            "Use simple english speech with easy-reading constructions. "
-            "Here are the cards:\n\n" +
-            "\n".join(card_infos) +
-            "\n\nProphecy:"
-        )
\ No newline at end of file
+        with STAGE_SECONDS.time(stage='build_prompt'):
+            return (
+                "You are a mystical political oracle. Based on the following three tarot cards and their meanings, "
+                "generate a short political prophecy (3-5 sentences) that describes possible future global or geopolitical events. "
+                "Do not mention the cards directly in the text. "
+                "Use simple english speech with easy-reading constructions. "
+                "Here are the cards:\n\n" +
+                "\n".join(card_infos) +
+                "\n\nProphecy:"
+            )
\ No newline at end of file
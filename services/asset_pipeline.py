@@ -0,0 +1,282 @@
+"""
+Build content-hashed, multi-format and multi-width variants of the card images.
+
+Usage:
+    python -m services.asset_pipeline [--force]
+
+Every source image gets a copy of the original under a hashed name, plus
+resized variants in each configured format (AVIF, WebP) when Pillow is
+installed. A manifest maps source file names to the built URLs so the app
+can hand out cache-busted paths and ``srcset`` data. A sprite sheet packing
+all cards into one image is built alongside for the ``sprite`` delivery mode.
+Without Pillow only the hashed originals are produced.
+"""
+import argparse
+import hashlib
+import io
+import json
+import math
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from config import Config
+from utils.logger import setup_logger
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow is optional; fall back to hashed originals only
+    Image = None
+    features = None
+
+logger = setup_logger(__name__)
+
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+QUALITY = {'avif': 50, 'webp': 75}
+
+Manifest = Dict[str, Dict[str, Any]]
+SpriteSheet = Dict[str, Any]
+
+
+def content_hash(path: str, length: int = 10) -> str:
+    """Return a short hex digest of the file contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest()[:length]
+
+
+def parse_list(value: str) -> List[str]:
+    """Split a comma separated setting into its non-empty entries."""
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+def supported_formats(formats: Sequence[str]) -> List[str]:
+    """Keep the formats the installed Pillow can encode."""
+    if Image is None:
+        return []
+    available = []
+    for fmt in formats:
+        if fmt in MIME_TYPES and fmt != 'jpeg' and features.check(fmt):
+            available.append(fmt)
+        else:
+            logger.warning(f"Image format '{fmt}' is not supported by this Pillow build, skipping")
+    return available
+
+
+def build_assets(source_dir: Optional[str] = None, output_dir: Optional[str] = None,
+                 widths: Optional[Sequence[int]] = None, formats: Optional[Sequence[str]] = None,
+                 force: bool = False) -> Manifest:
+    """
+    Build image variants and write the manifest.
+    
+    Output names embed the hash of the source image, so files that already
+    exist are up to date and are skipped unless force is set. Files are
+    written under a temporary name and renamed into place, so an interrupted
+    build never leaves a truncated file under its final name.
+    
+    Args:
+        source_dir: Folder with the source JPEGs (default CARDS_FOLDER)
+        output_dir: Folder receiving the built files and manifest (default ASSET_BUILD_FOLDER)
+        widths: Target widths in pixels; never larger than the source
+        formats: Modern formats to encode, e.g. ``['avif', 'webp']``
+        force: Re-encode files that already exist
+    
+    Returns:
+        The manifest that was written
+    """
+    source_dir = source_dir or Config.CARDS_FOLDER
+    output_dir = output_dir or Config.ASSET_BUILD_FOLDER
+    widths = sorted(widths or [int(w) for w in parse_list(Config.ASSET_WIDTHS)])
+    formats = supported_formats(formats if formats is not None else parse_list(Config.ASSET_FORMATS))
+    cards_dir = os.path.join(output_dir, 'cards')
+    os.makedirs(cards_dir, exist_ok=True)
+    
+    manifest: Manifest = {}
+    built = 0
+    for source_file in sorted(f for f in os.listdir(source_dir) if f.endswith('.jpg')):
+        source_path = os.path.join(source_dir, source_file)
+        stem = source_file[:-len('.jpg')]
+        digest = content_hash(source_path)
+        
+        original = f'{stem}.{digest}.jpg'
+        if force or not os.path.exists(os.path.join(cards_dir, original)):
+            with _replacing(os.path.join(cards_dir, original)) as tmp_path:
+                shutil.copyfile(source_path, tmp_path)
+            built += 1
+        entry: Dict[str, Any] = {'src': asset_url(f'cards/{original}'), 'sources': []}
+        
+        if formats:
+            with Image.open(source_path) as image:
+                image = image.convert('RGB')
+                entry['width'], entry['height'] = image.size
+                target_widths = sorted({min(width, image.width) for width in widths})
+                for fmt in formats:
+                    candidates = []
+                    for width in target_widths:
+                        name = f'{stem}.{digest}.{width}w.{fmt}'
+                        path = os.path.join(cards_dir, name)
+                        if force or not os.path.exists(path):
+                            height = round(image.height * width / image.width)
+                            with _replacing(path) as tmp_path:
+                                image.resize((width, height), Image.LANCZOS).save(
+                                    tmp_path, fmt.upper(), quality=QUALITY[fmt]
+                                )
+                            built += 1
+                        candidates.append(f"{asset_url(f'cards/{name}')} {width}w")
+                    entry['sources'].append({'type': MIME_TYPES[fmt], 'srcset': ', '.join(candidates)})
+        manifest[source_file] = entry
+    
+    _write_json(os.path.join(output_dir, 'manifest.json'), manifest)
+    logger.info(f"Built {built} asset files for {len(manifest)} cards into {output_dir}")
+    return manifest
+
+
+def build_sprite(source_dir: Optional[str] = None, output_dir: Optional[str] = None,
+                 tile_width: Optional[int] = None, fmt: Optional[str] = None) -> Optional[SpriteSheet]:
+    """
+    Pack every card into one sprite sheet and write its offsets to ``sprite.json``.
+    
+    Cards are scaled to a common tile size and laid out on a near-square
+    grid. The sheet is named after the hash of its encoded bytes.
+    
+    Args:
+        source_dir: Folder with the source JPEGs (default CARDS_FOLDER)
+        output_dir: Folder receiving the sheet and its description (default ASSET_BUILD_FOLDER)
+        tile_width: Width of one card in the sheet (default ASSET_SPRITE_WIDTH)
+        fmt: Encoding of the sheet, ``webp``, ``avif`` or ``jpeg`` (default ASSET_SPRITE_FORMAT)
+    
+    Returns:
+        The sprite description, or None when Pillow is not installed
+    """
+    if Image is None:
+        logger.warning("Pillow is not installed; skipping the card sprite sheet")
+        return None
+    source_dir = source_dir or Config.CARDS_FOLDER
+    output_dir = output_dir or Config.ASSET_BUILD_FOLDER
+    tile_width = tile_width or Config.ASSET_SPRITE_WIDTH
+    fmt = fmt or Config.ASSET_SPRITE_FORMAT
+    if fmt not in MIME_TYPES or (fmt != 'jpeg' and not features.check(fmt)):
+        logger.warning(f"Sprite format '{fmt}' is not supported by this Pillow build, using jpeg")
+        fmt = 'jpeg'
+    
+    source_files = sorted(f for f in os.listdir(source_dir) if f.endswith('.jpg'))
+    if not source_files:
+        logger.warning(f"No card images in {source_dir}; skipping the card sprite sheet")
+        return None
+    
+    tiles = []
+    for source_file in source_files:
+        with Image.open(os.path.join(source_dir, source_file)) as image:
+            tiles.append(image.convert('RGB'))
+    tile_height = round(tiles[0].height * tile_width / tiles[0].width)
+    columns = math.ceil(math.sqrt(len(tiles)))
+    rows = math.ceil(len(tiles) / columns)
+    sheet = Image.new('RGB', (columns * tile_width, rows * tile_height))
+    offsets = {}
+    for index, (source_file, tile) in enumerate(zip(source_files, tiles)):
+        x, y = (index % columns) * tile_width, (index // columns) * tile_height
+        sheet.paste(tile.resize((tile_width, tile_height), Image.LANCZOS), (x, y))
+        offsets[source_file] = {'x': x, 'y': y}
+    
+    buffer = io.BytesIO()
+    sheet.save(buffer, fmt.upper(), quality=QUALITY.get(fmt, 85))
+    data = buffer.getvalue()
+    extension = 'jpg' if fmt == 'jpeg' else fmt
+    name = f'sprite.{hashlib.sha256(data).hexdigest()[:10]}.{extension}'
+    os.makedirs(output_dir, exist_ok=True)
+    with _replacing(os.path.join(output_dir, name)) as tmp_path, open(tmp_path, 'wb') as f:
+        f.write(data)
+    
+    sprite: SpriteSheet = {
+        'url': asset_url(name),
+        'type': MIME_TYPES[fmt],
+        'width': sheet.width,
+        'height': sheet.height,
+        'tile_width': tile_width,
+        'tile_height': tile_height,
+        'cards': offsets,
+    }
+    _write_json(os.path.join(output_dir, 'sprite.json'), sprite)
+    logger.info(f"Built {len(offsets)}-card sprite sheet {name} ({len(data)} bytes)")
+    return sprite
+
+
+def asset_url(relative_path: str) -> str:
+    """Public URL of a built asset."""
+    return f"{Config.ASSET_URL_PREFIX.rstrip('/')}/{relative_path}"
+
+
+def load_manifest(output_dir: Optional[str] = None) -> Manifest:
+    """
+    Load the asset manifest.
+    
+    Returns:
+        The manifest, or an empty dict when no assets have been built
+    """
+    return _read_json(os.path.join(output_dir or Config.ASSET_BUILD_FOLDER, 'manifest.json')) or {}
+
+
+def load_sprite(output_dir: Optional[str] = None) -> Optional[SpriteSheet]:
+    """
+    Load the sprite sheet description.
+    
+    Returns:
+        The description, or None when no sprite sheet has been built
+    """
+    return _read_json(os.path.join(output_dir or Config.ASSET_BUILD_FOLDER, 'sprite.json'))
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    """Atomically replace a JSON build file."""
+    with _replacing(path) as tmp_path, open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+@contextmanager
+def _replacing(path: str) -> Iterator[str]:
+    """Yield a temporary path next to path and rename it over path once the block has written it."""
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    """Read a JSON build file, returning None when it is missing or unreadable."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable asset file {path}: {str(e)}")
+        return None
+
+
+def main(argv=None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Build hashed, resized AVIF/WebP variants and a sprite sheet of the card images."
+    )
+    parser.add_argument('--source', default=None, help="source folder (default CARDS_FOLDER)")
+    parser.add_argument('--output', default=None, help="output folder (default ASSET_BUILD_FOLDER)")
+    parser.add_argument('--force', action='store_true', help="re-encode files that already exist")
+    args = parser.parse_args(argv)
+    
+    if Image is None:
+        logger.warning("Pillow is not installed; only hashed copies of the originals will be built")
+    build_assets(args.source, args.output, force=args.force)
+    build_sprite(args.source, args.output)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -1,11 +1,17 @@
+import logging
 import os
 import random
-from typing import List, Optional
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 from models import TarotCard
 from meanings import CARD_MEANINGS
 from config import Config
 from exceptions import InsufficientCardsError
+from services.asset_pipeline import Manifest, SpriteSheet, load_manifest, load_sprite
+from utils import json_codec
 from utils.logger import setup_logger
+from utils.metrics import STAGE_SECONDS
 
 logger = setup_logger(__name__)
 
@@ -15,39 +21,139 @@ class CardService:
     
     def __init__(self):
         self.cards_folder = Config.CARDS_FOLDER
+        self.check_interval = Config.DECK_CHECK_INTERVAL
+        self._deck: Tuple[TarotCard, ...] = ()
+        self._card_files: Tuple[str, ...] = ()
+        self._fragments: Dict[str, bytes] = {}
+        self._deck_mtime: Optional[float] = None
+        self._manifest: Manifest = {}
+        self.sprite: Optional[SpriteSheet] = None
+        self._last_check = 0.0
+        self._reload_lock = threading.Lock()
+        self.reload()
         logger.info(f"CardService initialized with cards folder: {self.cards_folder}")
     
+    def reload(self) -> None:
+        """Rebuild the in-memory deck index from the cards folder."""
+        with self._reload_lock:
+            if not os.path.exists(self.cards_folder):
+                logger.warning(f"Cards folder does not exist: {self.cards_folder}")
+                self._deck, self._card_files, self._deck_mtime = (), (), None
+                self._fragments = {}
+            else:
+                card_files = tuple(f for f in os.listdir(self.cards_folder) if f.endswith('.jpg'))
+                self._manifest = load_manifest()
+                self.sprite = self._load_sprite()
+                self._deck = tuple(self._create_tarot_card(card_file) for card_file in card_files)
+                self._fragments = {card.key: json_codec.dumps(card.to_dict()) for card in self._deck}
+                self._card_files = card_files
+                self._deck_mtime = self._folder_mtime()
+                logger.debug(f"Indexed {len(card_files)} card files")
+            self._last_check = time.monotonic()
+    
     def get_available_cards(self) -> List[str]:
         """Get list of available card image files."""
-        if not os.path.exists(self.cards_folder):
-            logger.warning(f"Cards folder does not exist: {self.cards_folder}")
-            return []
+        self._reload_if_stale()
+        return list(self._card_files)
+    
+    def get_deck(self) -> Tuple[TarotCard, ...]:
+        """Get the indexed deck of prebuilt cards."""
+        self._reload_if_stale()
+        return self._deck
+    
+    def card_json(self, card: TarotCard) -> bytes:
+        """
+        Serialized JSON of a card, precomputed when the deck is indexed.
         
-        card_files = [f for f in os.listdir(self.cards_folder) if f.endswith('.jpg')]
-        logger.debug(f"Found {len(card_files)} card files")
-        return card_files
+        Args:
+            card: A card drawn from this service
+        
+        Returns:
+            UTF-8 JSON object bytes
+        """
+        fragment = self._fragments.get(card.key)
+        if fragment is None:
+            fragment = json_codec.dumps(card.to_dict())
+        return fragment
     
-    def draw_cards(self, count: int = 3) -> List[TarotCard]:
+    def draw_cards(self, count: int = 3, rng: Optional[random.Random] = None) -> List[TarotCard]:
         """
         Draw a specified number of random tarot cards.
         
         Args:
             count: Number of cards to draw
-            
+            rng: Random generator for this request; a fresh one by default
+        
         Returns:
             List of TarotCard objects
-            
+        
         Raises:
             InsufficientCardsError: When there are not enough cards available
         """
-        card_files = self.get_available_cards()
-        if len(card_files) < count:
-            logger.error(f"Insufficient cards: need {count}, have {len(card_files)}")
-            raise InsufficientCardsError(f"Not enough cards available. Need {count}, have {len(card_files)}")
+        with STAGE_SECONDS.time(stage='draw_cards'):
+            deck = self.get_deck()
+            if len(deck) < count:
+                logger.error("Insufficient cards: need %d, have %d", count, len(deck))
+                raise InsufficientCardsError(f"Not enough cards available. Need {count}, have {len(deck)}")
+            
+            selected_cards = (rng or random.Random()).sample(deck, count)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Drew %d cards: %s", count, [card.key for card in selected_cards])
+        return selected_cards
+    
+    def draw_spreads(self, count: int, spread_size: int = 3,
+                     rng: Optional[random.Random] = None) -> List[List[TarotCard]]:
+        """
+        Draw several independent spreads in one pass over the deck index.
         
-        selected_cards = random.sample(card_files, count)
-        logger.info(f"Drew {count} cards: {[card.replace('.jpg', '') for card in selected_cards]}")
-        return [self._create_tarot_card(card_file) for card_file in selected_cards]
+        Args:
+            count: Number of spreads to draw
+            spread_size: Number of cards in each spread
+            rng: Random generator for this request; a fresh one by default
+            
+        Returns:
+            List of spreads, each a list of distinct TarotCard objects
+            
+        Raises:
+            InsufficientCardsError: When a spread needs more cards than the deck holds
+        """
+        deck = self.get_deck()
+        if len(deck) < spread_size:
+            logger.error("Insufficient cards: need %d, have %d", spread_size, len(deck))
+            raise InsufficientCardsError(f"Not enough cards available. Need {spread_size}, have {len(deck)}")
+        
+        rng = rng or random.Random()
+        spreads = [rng.sample(deck, spread_size) for _ in range(count)]
+        logger.info("Drew %d spreads of %d cards", count, spread_size)
+        return spreads
+    
+    def _reload_if_stale(self) -> None:
+        """Reload the deck if the folder mtime changed since the last check."""
+        if self.check_interval <= 0:
+            return
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        if self._folder_mtime() != self._deck_mtime:
+            logger.info(f"Cards folder changed, reloading deck: {self.cards_folder}")
+            self.reload()
+    
+    def _folder_mtime(self) -> Optional[float]:
+        """Return the cards folder modification time, or None if it is missing."""
+        try:
+            return os.stat(self.cards_folder).st_mtime
+        except OSError:
+            return None
+    
+    def _load_sprite(self) -> Optional[SpriteSheet]:
+        """Load the sprite sheet description when sprite delivery is enabled."""
+        if Config.CARD_DELIVERY != 'sprite':
+            return None
+        sprite = load_sprite()
+        if sprite is None:
+            logger.warning("CARD_DELIVERY is 'sprite' but no sprite sheet is built; serving card images")
+        return sprite
     
     def _create_tarot_card(self, card_file: str) -> TarotCard:
         """Create a TarotCard object from a file name."""
@@ -55,9 +161,23 @@ class CardService:
         card_name = card_key.replace('_', ' ').title()
         meaning = CARD_MEANINGS.get(card_key, "Unknown meaning")
         
+        offset = self.sprite['cards'].get(card_file) if self.sprite else None
+        sprite = (offset['x'], offset['y']) if offset else None
+        assets = self._manifest.get(card_file)
+        if assets is None:
+            return TarotCard(
+                image_path=f'/{self.cards_folder}/{card_file}',
+                name=card_name,
+                meaning=meaning,
+                key=card_key,
+                sprite=sprite
+            )
+        
         return TarotCard(
-            image_path=f'/{self.cards_folder}/{card_file}',
+            image_path=assets['src'],
             name=card_name,
             meaning=meaning,
-            key=card_key
-        ) 
\ No newline at end of file
+            key=card_key,
+            sources=tuple((source['type'], source['srcset']) for source in assets.get('sources', ())),
+            sprite=sprite
+        )
\ No newline at end of file
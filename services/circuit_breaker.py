@@ -0,0 +1,133 @@
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+from config import Config
+from exceptions import CircuitOpenError
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+T = TypeVar('T')
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker that fails fast while a backend is unhealthy.
+    
+    The breaker opens after a run of consecutive failures, where a call that
+    exceeds the latency SLO counts as a failure even if it returned. While
+    open, calls are rejected immediately with CircuitOpenError. After the
+    reset timeout a limited number of half-open trial calls are let through;
+    a successful trial closes the circuit and a failed or abandoned one
+    reopens it. Trials that never report back expire after another reset
+    timeout, so a lost trial cannot keep the circuit half-open forever.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, name: str = 'ai_backend', failure_threshold: Optional[int] = None,
+                 latency_slo: Optional[float] = None, reset_timeout: Optional[float] = None,
+                 half_open_max_calls: int = 1, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold or Config.CIRCUIT_FAILURE_THRESHOLD)
+        self.latency_slo = latency_slo if latency_slo is not None else Config.CIRCUIT_LATENCY_SLO
+        self.reset_timeout = reset_timeout if reset_timeout is not None else Config.CIRCUIT_RESET_TIMEOUT
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_calls = 0
+        self._trial_started = 0.0
+    
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the timeout passed."""
+        with self._lock:
+            self._refresh_state()
+            return self._state
+    
+    def allow_request(self) -> bool:
+        """Return True when a call may go to the backend, reserving a trial slot if half-open."""
+        with self._lock:
+            self._refresh_state()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._trial_calls < self.half_open_max_calls:
+                self._trial_calls += 1
+                self._trial_started = self._clock()
+                return True
+            return False
+    
+    def record_success(self, latency: float = 0.0) -> None:
+        """Record a completed call; calls slower than the SLO count as failures."""
+        if self.latency_slo > 0 and latency > self.latency_slo:
+            logger.warning(f"Circuit '{self.name}': call took {latency:.2f}s, over the {self.latency_slo:.2f}s SLO")
+            self.record_failure()
+            return
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit '{self.name}' closed after a successful trial call")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_calls = 0
+    
+    def record_failure(self) -> None:
+        """Record a failed call and open the circuit when the threshold is reached."""
+        with self._lock:
+            self._record_failure_locked()
+    
+    def record_abandoned(self) -> None:
+        """
+        Record a call that ended without an outcome, e.g. a closed stream or a cancelled task.
+        
+        A half-open trial counts as failed so the next trial can run later;
+        abandoned calls do not count against a closed circuit.
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._record_failure_locked()
+    
+    def call(self, fn: Callable[[], T]) -> T:
+        """
+        Run fn through the breaker.
+        
+        Raises:
+            CircuitOpenError: When the circuit is open
+        """
+        if not self.allow_request():
+            raise CircuitOpenError(f"Circuit '{self.name}' is open; skipping backend call")
+        started = self._clock()
+        try:
+            result = fn()
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            self.record_abandoned()
+            raise
+        self.record_success(self._clock() - started)
+        return result
+    
+    def _record_failure_locked(self) -> None:
+        """Count a failure and open the circuit when the threshold is reached (lock held)."""
+        self._failures += 1
+        if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                logger.warning(f"Circuit '{self.name}' opened after {self._failures} consecutive failures")
+            self._state = self.OPEN
+            self._opened_at = self._clock()
+            self._trial_calls = 0
+    
+    def _refresh_state(self) -> None:
+        """Move an open circuit to half-open once the reset timeout elapsed (lock held)."""
+        now = self._clock()
+        if self._state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_calls = 0
+        elif (self._state == self.HALF_OPEN and self._trial_calls >= self.half_open_max_calls
+              and now - self._trial_started >= self.reset_timeout):
+            self._trial_calls = 0
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+Instant prophecies composed locally from the card meanings.
+
+Each meaning in ``meanings.CARD_MEANINGS`` is a list of themes ("Fate,
+transformation, luck, life lessons."). A prophecy is an opening sentence,
+one sentence per card and a closing sentence, each drawn from a small set of
+templates and filled with the cards' themes. No model and no network are
+involved, so it takes microseconds; it serves PROPHECY_MODE=local and stands
+in for the model when it fails or sheds load.
+"""
+import random
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+# Themes that name a person rather than a quality
+FIGURES = frozenset({
+    'creator', 'leader', 'mother', 'protector', 'father', 'saint', 'queen of heaven', 'fortune teller',
+})
+
+# Used for cards without a known meaning
+DEFAULT_THEMES = ('change', 'uncertainty', 'new beginnings')
+
+OPENINGS = (
+    "The coming months will be marked by {theme}.",
+    "Across the continents, the first signs of {theme} are already visible.",
+    "A new chapter of world affairs will open under the sign of {theme}.",
+    "The great powers will soon feel a growing current of {theme}.",
+)
+
+THEME_SENTENCES = (
+    "A season of {theme} will sweep through the capitals of the world.",
+    "Leaders will be forced to reckon with {theme}.",
+    "Quiet talks behind closed doors will turn on {theme}.",
+    "Markets and borders alike will feel the pull of {theme}.",
+    "Old alliances will be tested by {theme}.",
+    "Ordinary people will demand {theme} from those who govern them.",
+)
+
+FIGURE_SENTENCES = (
+    "A new {theme} will step onto the world stage.",
+    "Nations in doubt will look to a {theme} for direction.",
+    "The voice of a {theme} will be heard far beyond one country.",
+)
+
+CLOSINGS = (
+    "In the end, {theme} will decide which nations lead and which follow.",
+    "By the end of the year, {theme} will have reshaped old alliances.",
+    "Those who understand {theme} will shape the new order.",
+)
+
+
+@lru_cache(maxsize=256)
+def card_themes(card_info: str) -> Tuple[str, ...]:
+    """
+    Split a "Name: meaning" line into lower-case themes.
+    
+    Args:
+        card_info: Card description as built by format_card_infos
+    
+    Returns:
+        Themes of the card, never empty
+    """
+    meaning = card_info.partition(': ')[2]
+    themes = tuple(theme.strip().lower() for theme in meaning.rstrip('.').split(',') if theme.strip())
+    if not themes or themes == ('unknown meaning',):
+        return DEFAULT_THEMES
+    return themes
+
+
+class LocalProphecyGenerator:
+    """Compose prophecies from card meanings with sentence templates."""
+    
+    def generate(self, card_infos: List[str], rng: Optional[random.Random] = None) -> str:
+        """
+        Compose a prophecy of one sentence per card between an opening and a closing.
+        
+        Args:
+            card_infos: List of card descriptions with meanings
+            rng: Random generator; a fresh one by default
+        
+        Returns:
+            Prophecy text
+        """
+        rng = rng or random.Random()
+        cards = [card_themes(card_info) for card_info in card_infos] or [DEFAULT_THEMES]
+        
+        sentences = [rng.choice(OPENINGS).format(theme=self._quality(rng, cards[0]))]
+        theme_templates = rng.sample(THEME_SENTENCES, len(THEME_SENTENCES))
+        figure_templates = rng.sample(FIGURE_SENTENCES, len(FIGURE_SENTENCES))
+        for index, themes in enumerate(cards):
+            theme = rng.choice(themes)
+            if theme in FIGURES:
+                template = figure_templates[index % len(figure_templates)]
+            else:
+                template = theme_templates[index % len(theme_templates)]
+            sentences.append(template.format(theme=theme))
+        sentences.append(rng.choice(CLOSINGS).format(theme=self._quality(rng, cards[-1])))
+        return " ".join(sentence[0].upper() + sentence[1:] for sentence in sentences)
+    
+    @staticmethod
+    def _quality(rng: random.Random, themes: Tuple[str, ...]) -> str:
+        """Pick a theme that is not a figure, for templates that need a quality."""
+        candidates = [theme for theme in themes if theme not in FIGURES]
+        return rng.choice(candidates or list(DEFAULT_THEMES))
@@ -0,0 +1,113 @@
+"""
+Offline prewarming of the prophecy cache.
+
+Usage:
+    python -m services.prewarm [--variants N] [--concurrency N] [--spread-size N] [--refresh]
+"""
+import argparse
+import itertools
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Sequence, Tuple
+from config import Config
+from exceptions import AIProphecyError, ConfigurationError
+from models import TarotCard
+from services.ai_service import AIProphecyService, format_card_infos
+from services.card_service import CardService
+from services.prophecy_cache import combination_key
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def plan_prewarm(deck: Sequence[TarotCard], ai_service: AIProphecyService, spread_size: int,
+                 variants: int, refresh: bool = False) -> List[Tuple[str, List[str]]]:
+    """
+    Build the list of generation jobs still needed for every combination.
+    
+    Combinations that already hold enough fresh variants are skipped, which is
+    what makes an interrupted run resumable.
+    
+    Returns:
+        List of (cache_key, card_infos) pairs, one per prophecy to generate
+    """
+    jobs = []
+    ordered_deck = sorted(deck, key=lambda card: card.key)
+    for combination in itertools.combinations(ordered_deck, spread_size):
+        key = combination_key(card.key for card in combination)
+        missing = variants if refresh else variants - ai_service.cache.count(key)
+        jobs.extend((key, format_card_infos(combination)) for _ in range(max(0, missing)))
+    return jobs
+
+
+def prewarm(ai_service: Optional[AIProphecyService] = None, card_service: Optional[CardService] = None,
+            spread_size: int = 3, variants: Optional[int] = None, concurrency: int = 4,
+            refresh: bool = False) -> Dict[str, int]:
+    """
+    Generate prophecies for every card combination and store them in the cache.
+    
+    Args:
+        ai_service: Prophecy service whose cache is filled
+        card_service: Card service providing the deck
+        spread_size: Number of cards per reading
+        variants: Prophecies per combination (capped by the cache's variant count)
+        concurrency: Maximum number of concurrent generation calls
+        refresh: Generate new variants even for fully cached combinations
+    
+    Returns:
+        Counts of planned, generated and failed prophecies
+    """
+    ai_service = ai_service or AIProphecyService()
+    card_service = card_service or CardService()
+    if ai_service.cache is None:
+        raise ConfigurationError("Prophecy cache is disabled; set PROPHECY_CACHE_ENABLED=true to prewarm")
+    
+    variants = min(variants or ai_service.cache.variants, ai_service.cache.variants)
+    jobs = plan_prewarm(card_service.get_deck(), ai_service, spread_size, variants, refresh)
+    stats = {'planned': len(jobs), 'generated': 0, 'failed': 0}
+    logger.info(f"Prewarming {len(jobs)} prophecies with concurrency {concurrency}")
+    
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    try:
+        # The pool already bounds concurrency; the request-path admission gate would shed the batch
+        futures = [executor.submit(ai_service.refresh_prophecy, card_infos, key, admit=False)
+                   for key, card_infos in jobs]
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                future.result()
+                stats['generated'] += 1
+            except AIProphecyError:
+                stats['failed'] += 1
+            if done % 50 == 0:
+                logger.info(f"Prewarm progress: {done}/{len(jobs)}")
+    except KeyboardInterrupt:
+        logger.warning("Prewarm interrupted; rerun to resume from the cached state")
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+    executor.shutdown(wait=True)
+    
+    logger.info(f"Prewarm finished: {stats}")
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Prewarm the prophecy cache for every card combination.")
+    parser.add_argument('--variants', type=int, default=Config.PROPHECY_CACHE_VARIANTS,
+                        help="prophecies to generate per combination")
+    parser.add_argument('--concurrency', type=int, default=4, help="maximum concurrent model calls")
+    parser.add_argument('--spread-size', type=int, default=3, help="number of cards per reading")
+    parser.add_argument('--refresh', action='store_true', help="regenerate fully cached combinations too")
+    args = parser.parse_args(argv)
+    
+    Config.validate()
+    try:
+        stats = prewarm(spread_size=args.spread_size, variants=args.variants,
+                        concurrency=args.concurrency, refresh=args.refresh)
+    except KeyboardInterrupt:
+        return 130
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,318 @@
+import json
+import random
+import sys
+import threading
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence
+from config import Config
+from exceptions import ConfigurationError
+from utils.logger import setup_logger
+
+if TYPE_CHECKING:
+    import requests
+    from huggingface_hub import AsyncInferenceClient, InferenceClient
+
+logger = setup_logger(__name__)
+
+Messages = List[Dict[str, str]]
+
+# huggingface_hub is slow to import, so its clients are imported on first use
+_LAZY_HUGGINGFACE = ('InferenceClient', 'AsyncInferenceClient')
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_HUGGINGFACE:
+        import huggingface_hub
+        value = globals()[name] = getattr(huggingface_hub, name)
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _huggingface(name: str) -> Any:
+    """A Hugging Face client class, imported on first use."""
+    return getattr(sys.modules[__name__], name)
+
+
+class ProphecyBackend(ABC):
+    """Interface of a chat completion backend that can write prophecies."""
+    
+    name: str = 'backend'
+    
+    @abstractmethod
+    def complete(self, messages: Messages, temperature: float) -> str:
+        """Return the full completion text for the messages."""
+    
+    @abstractmethod
+    def stream(self, messages: Messages, temperature: float) -> Iterator[str]:
+        """Yield completion text chunks as they are produced."""
+    
+    @abstractmethod
+    async def acomplete(self, messages: Messages, temperature: float) -> str:
+        """Async counterpart of complete."""
+    
+    def warm_up(self) -> None:
+        """Import dependencies and build clients ahead of the first request."""
+    
+    async def aclose(self) -> None:
+        """Release async resources held by the backend."""
+
+
+class HuggingFaceBackend(ProphecyBackend):
+    """
+    Backend using the Hugging Face inference clients.
+    
+    Each thread gets its own sync client, so gthread and gevent workers never
+    share one. With ``lazy`` (STARTUP_MODE=lazy) the first client is built on
+    first use or by warm_up(), so huggingface_hub is not imported at startup.
+    """
+    
+    def __init__(self, model: str, token: Optional[str] = None, timeout: Optional[float] = None,
+                 lazy: Optional[bool] = None):
+        self.name = f'hf:{model}'
+        self.model = model
+        self.token = token
+        self.timeout = timeout
+        self._local = threading.local()
+        self._async_client: Optional['AsyncInferenceClient'] = None
+        if not (lazy if lazy is not None else Config.STARTUP_MODE == 'lazy'):
+            self.warm_up()
+    
+    @property
+    def client(self) -> 'InferenceClient':
+        """Per-thread inference client (per-greenlet under gevent), created on first use."""
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = _huggingface('InferenceClient')(self.model, token=self.token, timeout=self.timeout)
+            self._local.client = client
+        return client
+    
+    @property
+    def async_client(self) -> 'AsyncInferenceClient':
+        """Async inference client, created on first use."""
+        if self._async_client is None:
+            self._async_client = _huggingface('AsyncInferenceClient')(
+                self.model, token=self.token, timeout=self.timeout
+            )
+        return self._async_client
+    
+    def warm_up(self) -> None:
+        self.client
+    
+    def complete(self, messages: Messages, temperature: float) -> str:
+        response = self.client.chat_completion(messages=messages, temperature=temperature)
+        return response.choices[0].message["content"]
+    
+    def stream(self, messages: Messages, temperature: float) -> Iterator[str]:
+        for chunk in self.client.chat_completion(messages=messages, temperature=temperature, stream=True):
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+    
+    async def acomplete(self, messages: Messages, temperature: float) -> str:
+        response = await self.async_client.chat_completion(messages=messages, temperature=temperature)
+        return response.choices[0].message["content"]
+    
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+
+class OpenAICompatibleBackend(ProphecyBackend):
+    """Backend for any server exposing the OpenAI ``/chat/completions`` API (llama.cpp, vLLM, the stub server)."""
+    
+    def __init__(self, name: str, base_url: str, model: str, api_key: Optional[str] = None,
+                 timeout: Optional[float] = None):
+        self.name = name
+        self.url = base_url.rstrip('/') + '/chat/completions'
+        self.model = model
+        self.timeout = timeout
+        self.headers = {'Content-Type': 'application/json'}
+        if api_key:
+            self.headers['Authorization'] = f'Bearer {api_key}'
+        self._local = threading.local()
+        self._async_session = None
+    
+    @property
+    def session(self) -> 'requests.Session':
+        """Per-thread HTTP session so connections are reused safely."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+            
+            session = requests.Session()
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
+    
+    def _payload(self, messages: Messages, temperature: float, stream: bool = False) -> Dict[str, Any]:
+        return {'model': self.model, 'messages': messages, 'temperature': temperature, 'stream': stream}
+    
+    def complete(self, messages: Messages, temperature: float) -> str:
+        response = self.session.post(self.url, json=self._payload(messages, temperature), timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()['choices'][0]['message']['content']
+    
+    def stream(self, messages: Messages, temperature: float) -> Iterator[str]:
+        with self.session.post(self.url, json=self._payload(messages, temperature, stream=True),
+                               timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    return
+                choices = json.loads(data).get('choices') or [{}]
+                delta = choices[0].get('delta', {}).get('content')
+                if delta:
+                    yield delta
+    
+    async def acomplete(self, messages: Messages, temperature: float) -> str:
+        import aiohttp
+        
+        if self._async_session is None or self._async_session.closed:
+            self._async_session = aiohttp.ClientSession(
+                headers=self.headers, timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        async with self._async_session.post(self.url, json=self._payload(messages, temperature)) as response:
+            response.raise_for_status()
+            data = await response.json()
+        return data['choices'][0]['message']['content']
+    
+    def warm_up(self) -> None:
+        self.session
+    
+    async def aclose(self) -> None:
+        if self._async_session is not None:
+            await self._async_session.close()
+            self._async_session = None
+
+
+def build_backends(spec: Optional[str] = None) -> List[ProphecyBackend]:
+    """
+    Build backends from a comma separated specification.
+    
+    Each entry is either ``hf`` / ``hf:<model>`` for the Hugging Face client,
+    or ``<name>=<base_url>`` for an OpenAI-compatible endpoint using
+    OPENAI_MODEL and OPENAI_API_KEY.
+    
+    Raises:
+        ConfigurationError: When the specification is empty, malformed or names a backend twice
+    """
+    spec = spec if spec is not None else Config.AI_BACKENDS
+    backends: List[ProphecyBackend] = []
+    for entry in (part.strip() for part in spec.split(',')):
+        if not entry:
+            continue
+        if entry == 'hf' or entry.startswith('hf:'):
+            model = entry[3:] or Config.HF_MODEL
+            backends.append(HuggingFaceBackend(model, token=Config.HF_TOKEN, timeout=Config.AI_CLIENT_TIMEOUT))
+        elif '=' in entry:
+            name, base_url = (part.strip() for part in entry.split('=', 1))
+            backends.append(OpenAICompatibleBackend(
+                name, base_url, Config.OPENAI_MODEL, api_key=Config.OPENAI_API_KEY, timeout=Config.AI_CLIENT_TIMEOUT
+            ))
+        else:
+            raise ConfigurationError(f"Invalid AI backend entry '{entry}'; expected 'hf[:model]' or 'name=url'")
+    if not backends:
+        raise ConfigurationError("At least one AI backend must be configured in AI_BACKENDS")
+    _check_unique_names(backends)
+    return backends
+
+
+def _check_unique_names(backends: Sequence[ProphecyBackend]) -> None:
+    """Reject backends sharing a name; routing statistics and metrics are kept per name."""
+    seen = set()
+    for backend in backends:
+        if backend.name in seen:
+            raise ConfigurationError(f"AI backend '{backend.name}' is configured more than once")
+        seen.add(backend.name)
+
+
+class BackendStats:
+    """
+    Exponentially weighted latency and error rate of one backend.
+    
+    A failed call counts as taking ``failure_latency`` seconds (at least its
+    real duration), so a backend that fails quickly never looks fast.
+    """
+    
+    def __init__(self, alpha: float, failure_latency: float):
+        self.alpha = alpha
+        self.failure_latency = failure_latency
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+    
+    def record(self, latency: float, ok: bool) -> None:
+        self.requests += 1
+        if not ok:
+            self.errors += 1
+            latency = max(latency, self.failure_latency)
+        self.latency = latency if self.latency is None else self.alpha * latency + (1 - self.alpha) * self.latency
+        self.error_rate = self.alpha * (0.0 if ok else 1.0) + (1 - self.alpha) * self.error_rate
+    
+    def score(self, error_penalty: float) -> float:
+        """Lower is better; untried backends score zero so they get sampled first."""
+        return (self.latency or 0.0) * (1 + error_penalty * self.error_rate) + self.error_rate
+
+
+class BackendRouter:
+    """
+    Route each request to the backend with the best recent latency and error rate.
+    
+    A small share of requests explores another backend at random so the
+    statistics of backends that are not currently preferred stay fresh.
+    """
+    
+    def __init__(self, backends: Sequence[ProphecyBackend], alpha: float = 0.2,
+                 error_penalty: float = 10.0, explore_rate: Optional[float] = None,
+                 failure_latency: Optional[float] = None):
+        if not backends:
+            raise ConfigurationError("BackendRouter needs at least one backend")
+        _check_unique_names(backends)
+        self.backends = list(backends)
+        self.error_penalty = error_penalty
+        self.explore_rate = explore_rate if explore_rate is not None else Config.AI_ROUTER_EXPLORE_RATE
+        failure_latency = failure_latency if failure_latency is not None else Config.AI_CLIENT_TIMEOUT
+        self._stats = {backend.name: BackendStats(alpha, failure_latency) for backend in self.backends}
+        self._lock = threading.Lock()
+    
+    def choose(self) -> ProphecyBackend:
+        """Pick the backend for the next request."""
+        if len(self.backends) == 1:
+            return self.backends[0]
+        if random.random() < self.explore_rate:
+            return random.choice(self.backends)
+        with self._lock:
+            return min(self.backends, key=lambda backend: self._stats[backend.name].score(self.error_penalty))
+    
+    def record(self, backend: ProphecyBackend, latency: float, ok: bool) -> None:
+        """Record the outcome of a call made to the backend."""
+        with self._lock:
+            self._stats[backend.name].record(latency, ok)
+    
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Current per-backend statistics."""
+        with self._lock:
+            return {
+                name: {
+                    'latency': stats.latency,
+                    'error_rate': stats.error_rate,
+                    'requests': stats.requests,
+                    'errors': stats.errors,
+                }
+                for name, stats in self._stats.items()
+            }
+    
+    def warm_up(self) -> None:
+        """Build the clients of every backend."""
+        for backend in self.backends:
+            backend.warm_up()
+    
+    async def aclose(self) -> None:
+        """Close async resources of every backend."""
+        for backend in self.backends:
+            await backend.aclose()
\ No newline at end of file
@@ -0,0 +1,186 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional
+from config import Config
+from services.shared_cache import SharedMemoryCache
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def combination_key(card_keys: Iterable[str]) -> str:
+    """Build the canonical cache key for an unordered set of card keys."""
+    return "|".join(sorted(card_keys))
+
+
+class ProphecyCache:
+    """
+    SQLite-backed prophecy cache shared by every worker process.
+    
+    With a shared-memory tier, the variants of a combination that hit in
+    SQLite are also published there for SHARED_CACHE_TTL seconds, so repeat
+    lookups from any worker skip the database.
+    """
+    
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS prophecies ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " combo_key TEXT NOT NULL,"
+        " prophecy TEXT NOT NULL,"
+        " created_at REAL NOT NULL,"
+        " last_used REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS idx_prophecies_combo ON prophecies (combo_key, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_prophecies_last_used ON prophecies (last_used)",
+    )
+    
+    # Hits refresh last_used at most this often per row, so most hits never take the write lock
+    LAST_USED_RESOLUTION = 300.0
+    
+    def __init__(self, path: Optional[str] = None, variants: Optional[int] = None,
+                 ttl: Optional[float] = None, max_entries: Optional[int] = None,
+                 shared: Optional[SharedMemoryCache] = None):
+        self.path = path or Config.PROPHECY_CACHE_PATH
+        self.variants = max(1, variants if variants is not None else Config.PROPHECY_CACHE_VARIANTS)
+        self.ttl = ttl if ttl is not None else Config.PROPHECY_CACHE_TTL
+        self.max_entries = max_entries if max_entries is not None else Config.PROPHECY_CACHE_MAX_ENTRIES
+        self.shared = shared
+        self._local = threading.local()
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return a random cached prophecy for the key.
+        
+        A key only counts as a hit once it holds the configured number of
+        fresh variants, so the first requests for a combination keep
+        filling it with new prophecies.
+        
+        Args:
+            key: Canonical card combination key
+        
+        Returns:
+            Cached prophecy text, or None on a miss
+        """
+        if self.shared is not None:
+            variants = self.shared.get_json(self._shared_key(key))
+            if variants:
+                return random.choice(variants)
+        try:
+            conn = self._connection()
+            rows = conn.execute(
+                "SELECT id, prophecy, last_used FROM prophecies WHERE combo_key = ? AND created_at >= ?",
+                (key, self._fresh_since())
+            ).fetchall()
+            if len(rows) < self.variants:
+                return None
+            row_id, prophecy, last_used = random.choice(rows)
+            now = time.time()
+            if now - last_used >= self.LAST_USED_RESOLUTION:
+                with conn:
+                    conn.execute("UPDATE prophecies SET last_used = ? WHERE id = ?", (now, row_id))
+            if self.shared is not None:
+                self.shared.set_json(self._shared_key(key), [row[1] for row in rows], Config.SHARED_CACHE_TTL)
+            return prophecy
+        except sqlite3.Error as e:
+            logger.warning(f"Prophecy cache read failed: {e}")
+            return None
+    
+    def get_stale(self, key: str) -> Optional[str]:
+        """
+        Return any cached prophecy for the key, however old or few its variants.
+        
+        Used when a fresh prophecy cannot be generated, e.g. under load.
+        
+        Args:
+            key: Canonical card combination key
+        
+        Returns:
+            Cached prophecy text, or None when nothing is cached
+        """
+        try:
+            row = self._connection().execute(
+                "SELECT prophecy FROM prophecies WHERE combo_key = ? ORDER BY RANDOM() LIMIT 1", (key,)
+            ).fetchone()
+            return row[0] if row is not None else None
+        except sqlite3.Error as e:
+            logger.warning(f"Prophecy cache read failed: {e}")
+            return None
+    
+    def put(self, key: str, prophecy: str) -> None:
+        """
+        Store a prophecy variant for the key and evict old entries.
+        
+        Args:
+            key: Canonical card combination key
+            prophecy: Generated prophecy text
+        """
+        now = time.time()
+        if self.shared is not None:
+            self.shared.delete(self._shared_key(key))
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT INTO prophecies (combo_key, prophecy, created_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, prophecy, now, now)
+                )
+                # Keep only the newest variants for this key
+                conn.execute(
+                    "DELETE FROM prophecies WHERE combo_key = ? AND id NOT IN ("
+                    " SELECT id FROM prophecies WHERE combo_key = ? ORDER BY created_at DESC, id DESC LIMIT ?)",
+                    (key, key, self.variants)
+                )
+                conn.execute("DELETE FROM prophecies WHERE created_at < ?", (self._fresh_since(),))
+                # Least recently used entries go first once the store is full
+                conn.execute(
+                    "DELETE FROM prophecies WHERE id IN ("
+                    " SELECT id FROM prophecies ORDER BY last_used ASC, id ASC"
+                    " LIMIT MAX(0, (SELECT COUNT(*) FROM prophecies) - ?))",
+                    (self.max_entries,)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Prophecy cache write failed: {e}")
+    
+    def count(self, key: str) -> int:
+        """Return the number of fresh variants cached for the key."""
+        try:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM prophecies WHERE combo_key = ? AND created_at >= ?",
+                (key, self._fresh_since())
+            ).fetchone()[0]
+        except sqlite3.Error as e:
+            logger.warning(f"Prophecy cache read failed: {e}")
+            return 0
+    
+    def clear(self) -> None:
+        """Remove every cached prophecy."""
+        with self._connection() as conn:
+            conn.execute("DELETE FROM prophecies")
+    
+    def _shared_key(self, key: str) -> str:
+        return f"prophecy:{os.path.abspath(self.path)}:{key}"
+    
+    def _fresh_since(self) -> float:
+        """Return the oldest creation time that is still within the TTL."""
+        return time.time() - self.ttl if self.ttl > 0 else 0.0
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it after a fork if needed."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            for statement in self._SCHEMA:
+                conn.execute(statement)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
\ No newline at end of file
@@ -0,0 +1,287 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+from config import Config
+from exceptions import QueueFullError
+from models import ReadingJob
+from utils.logger import setup_logger
+from utils.metrics import JOBS_PENDING
+
+logger = setup_logger(__name__)
+
+# Generates the prophecy for (card_infos, cache_key)
+ProphecyGenerator = Callable[[List[str], str], str]
+# Prophecy served for card_infos when the generator raised
+FallbackGenerator = Callable[[List[str]], str]
+
+# Statuses of jobs that will not change any more
+FINISHED = ('done', 'failed')
+
+
+class MemoryJobStore:
+    """Reading jobs held in this process; only suitable for a single worker process."""
+    
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl if ttl is not None else Config.JOBS_TTL
+        self._jobs: Dict[str, ReadingJob] = {}
+        self._pending: queue.Queue = queue.Queue()
+        self._changed = threading.Condition()
+    
+    def add(self, job: ReadingJob) -> None:
+        with self._changed:
+            self._expire()
+            self._jobs[job.id] = job
+        self._pending.put(job.id)
+    
+    def get(self, job_id: str) -> Optional[ReadingJob]:
+        return self._jobs.get(job_id)
+    
+    def claim(self, timeout: float) -> Optional[ReadingJob]:
+        """Take the oldest pending job, waiting up to timeout seconds for one."""
+        try:
+            job = self._jobs.get(self._pending.get(timeout=timeout))
+        except queue.Empty:
+            return None
+        if job is not None:
+            job.status = 'running'
+        return job
+    
+    def finish(self, job: ReadingJob, prophecy: Optional[str], status: str = 'done') -> None:
+        with self._changed:
+            job.prophecy = prophecy
+            job.finished_at = time.time()
+            job.status = status
+            self._changed.notify_all()
+    
+    def wait(self, job_id: str, timeout: float) -> Optional[ReadingJob]:
+        """Return the job once it is finished or the timeout passes."""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            job = self._jobs.get(job_id)
+            while job is not None and job.status not in FINISHED and time.monotonic() < deadline:
+                self._changed.wait(deadline - time.monotonic())
+            return job
+    
+    def pending(self) -> int:
+        return self._pending.qsize()
+    
+    def _expire(self) -> None:
+        if self.ttl <= 0:
+            return
+        cutoff = time.time() - self.ttl
+        for job_id in [job.id for job in self._jobs.values() if job.finished_at and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    """
+    Reading jobs in an SQLite file shared by every worker process.
+    
+    Any process can answer for any job, and jobs claimed by a process that
+    died are handed out again once JOBS_CLAIM_TIMEOUT has passed.
+    """
+    
+    _SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS reading_jobs ("
+        " id TEXT PRIMARY KEY,"
+        " cards TEXT NOT NULL,"
+        " card_infos TEXT NOT NULL,"
+        " cache_key TEXT NOT NULL,"
+        " status TEXT NOT NULL,"
+        " prophecy TEXT,"
+        " created_at REAL NOT NULL,"
+        " claimed_at REAL,"
+        " finished_at REAL)",
+        "CREATE INDEX IF NOT EXISTS idx_reading_jobs_status ON reading_jobs (status, created_at)",
+    )
+    
+    def __init__(self, path: Optional[str] = None, ttl: Optional[float] = None,
+                 claim_timeout: Optional[float] = None, poll_interval: float = 0.1):
+        self.path = path or Config.JOBS_DB_PATH
+        self.ttl = ttl if ttl is not None else Config.JOBS_TTL
+        self.claim_timeout = claim_timeout if claim_timeout is not None else Config.JOBS_CLAIM_TIMEOUT
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        # Wakes local workers and waiters without waiting for the next poll
+        self._changed = threading.Condition()
+    
+    def add(self, job: ReadingJob) -> None:
+        with self._connection() as conn:
+            if self.ttl > 0:
+                conn.execute("DELETE FROM reading_jobs WHERE finished_at < ?", (time.time() - self.ttl,))
+            conn.execute(
+                "INSERT INTO reading_jobs (id, cards, card_infos, cache_key, status, created_at)"
+                " VALUES (?, ?, ?, ?, 'pending', ?)",
+                (job.id, json.dumps(job.cards), json.dumps(job.card_infos), job.cache_key, job.created_at)
+            )
+        with self._changed:
+            self._changed.notify_all()
+    
+    def get(self, job_id: str) -> Optional[ReadingJob]:
+        row = self._connection().execute(
+            "SELECT id, cards, card_infos, cache_key, status, prophecy, created_at, finished_at"
+            " FROM reading_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return self._job(row) if row is not None else None
+    
+    def claim(self, timeout: float) -> Optional[ReadingJob]:
+        """Take the oldest pending (or abandoned) job, waiting up to timeout seconds for one."""
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.time()
+            with self._connection() as conn:
+                row = conn.execute(
+                    "UPDATE reading_jobs SET status = 'running', claimed_at = ? WHERE id = ("
+                    " SELECT id FROM reading_jobs WHERE status = 'pending'"
+                    " OR (status = 'running' AND claimed_at < ?) ORDER BY created_at LIMIT 1)"
+                    " RETURNING id, cards, card_infos, cache_key, status, prophecy, created_at, finished_at",
+                    (now, now - self.claim_timeout)
+                ).fetchone()
+            if row is not None:
+                return self._job(row)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            with self._changed:
+                self._changed.wait(min(self.poll_interval, remaining))
+    
+    def finish(self, job: ReadingJob, prophecy: Optional[str], status: str = 'done') -> None:
+        job.prophecy, job.finished_at, job.status = prophecy, time.time(), status
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE reading_jobs SET status = ?, prophecy = ?, finished_at = ? WHERE id = ?",
+                (status, prophecy, job.finished_at, job.id)
+            )
+        with self._changed:
+            self._changed.notify_all()
+    
+    def wait(self, job_id: str, timeout: float) -> Optional[ReadingJob]:
+        """Return the job once it is finished or the timeout passes."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job.status in FINISHED or remaining <= 0:
+                return job
+            with self._changed:
+                self._changed.wait(min(self.poll_interval, remaining))
+    
+    def pending(self) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM reading_jobs WHERE status = 'pending'"
+        ).fetchone()[0]
+    
+    @staticmethod
+    def _job(row: tuple) -> ReadingJob:
+        job_id, cards, card_infos, cache_key, status, prophecy, created_at, finished_at = row
+        return ReadingJob(job_id, json.loads(cards), json.loads(card_infos), cache_key,
+                          status, prophecy, created_at, finished_at)
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it after a fork if needed."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            for statement in self._SCHEMA:
+                conn.execute(statement)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+
+def build_job_store(backend: Optional[str] = None):
+    """Build the job store selected by JOBS_BACKEND ("memory" or "sqlite")."""
+    backend = backend or Config.JOBS_BACKEND
+    if backend == 'sqlite':
+        return SQLiteJobStore()
+    return MemoryJobStore()
+
+
+class ReadingJobQueue:
+    """
+    Generate reading prophecies on a pool of background workers.
+    
+    Request threads only enqueue a job and return, so upstream concurrency is
+    capped by JOBS_WORKERS independently of how many HTTP requests are open.
+    Workers start in each process on first use, including after a fork.
+    A job whose generation raises is finished with the fallback prophecy,
+    or as 'failed' without one, so pollers never wait on it forever.
+    """
+    
+    def __init__(self, generate: ProphecyGenerator, store=None, workers: Optional[int] = None,
+                 max_pending: Optional[int] = None, fallback: Optional[FallbackGenerator] = None):
+        self.generate = generate
+        self.fallback = fallback
+        self.store = store or build_job_store()
+        self.workers = max(1, workers if workers is not None else Config.JOBS_WORKERS)
+        self.max_pending = max_pending if max_pending is not None else Config.JOBS_MAX_PENDING
+        self._started_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        JOBS_PENDING.set_function(self.store.pending)
+    
+    def submit(self, cards: List[Dict], card_infos: List[str], cache_key: str) -> ReadingJob:
+        """
+        Enqueue prophecy generation for drawn cards.
+        
+        Raises:
+            QueueFullError: When JOBS_MAX_PENDING jobs are already waiting
+        """
+        self.start()
+        if self.max_pending > 0 and self.store.pending() >= self.max_pending:
+            raise QueueFullError("Too many readings are waiting; try again shortly")
+        job = ReadingJob(uuid.uuid4().hex, cards, card_infos, cache_key, created_at=time.time())
+        self.store.add(job)
+        return job
+    
+    def get(self, job_id: str, wait: float = 0.0) -> Optional[ReadingJob]:
+        """Return a job, long-polling up to wait seconds for it to finish."""
+        self.start()
+        if wait > 0:
+            return self.store.wait(job_id, wait)
+        return self.store.get(job_id)
+    
+    def start(self) -> None:
+        """Start this process's workers (cheap to call repeatedly)."""
+        if self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            for index in range(self.workers):
+                threading.Thread(target=self._work, name=f'reading-job-{index}', daemon=True).start()
+            self._started_pid = os.getpid()
+    
+    def _work(self) -> None:
+        while True:
+            try:
+                job = self.store.claim(timeout=1.0)
+                if job is not None:
+                    self._run(job)
+            except Exception as e:
+                logger.error("Reading job worker error: %s", e)
+                time.sleep(1.0)
+    
+    def _run(self, job: ReadingJob) -> None:
+        """Generate a claimed job's prophecy and finish the job, whether or not generation succeeds."""
+        try:
+            prophecy = self.generate(job.card_infos, job.cache_key)
+        except Exception as e:
+            logger.error("Reading job %s failed: %s", job.id, e)
+            if self.fallback is None:
+                self.store.finish(job, None, status='failed')
+                return
+            prophecy = self.fallback(job.card_infos)
+        self.store.finish(job, prophecy)
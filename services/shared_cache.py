@@ -0,0 +1,257 @@
+"""
+Cache tier shared by every worker process on a host.
+
+The cache is a fixed-size hash table in a memory-mapped file, by default on
+``/dev/shm``, so entries written by one gunicorn worker are read by all the
+others without a round trip to SQLite or the model.
+
+Layout: a small header followed by SHARED_CACHE_SLOTS slots of
+SHARED_CACHE_SLOT_SIZE bytes, grouped into buckets of BUCKET_SLOTS. A key
+hashes to one bucket and may live in any slot of it. Writers lock only their
+bucket (a thread lock plus an fcntl byte-range lock on the bucket's bytes,
+so other processes are excluded too). Readers take no lock: each slot
+carries a sequence number that a writer makes odd while it writes, and a
+read is retried when the number was odd or changed during the copy.
+
+The file name carries the layout (``<path>.v1-2048x16384``), so workers
+configured with other slot counts map a separate file. An existing file is
+never reformatted: other processes may have it mapped, and shrinking a live
+mapping crashes them with SIGBUS.
+"""
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+from config import Config
+from utils.logger import setup_logger
+from utils.metrics import Counter
+
+logger = setup_logger(__name__)
+
+SHARED_CACHE_LOOKUPS = Counter('tarot_shared_cache_total', "Shared-memory cache lookups by result.", ['result'])
+
+MAGIC = b'TAROTSHM'
+LAYOUT_VERSION = 1
+# magic, layout version, slots, slot size
+FILE_HEADER = struct.Struct('<8sIII')
+HEADER_SIZE = 64
+# sequence number, value length, key hash (0 = empty), expiry (epoch seconds), key length
+SLOT_HEADER = struct.Struct('<IIQdI4x')
+SEQ = struct.Struct('<I')
+BUCKET_SLOTS = 4
+READ_RETRIES = 16
+THREAD_LOCK_STRIPES = 64
+
+
+def key_hash(key: bytes) -> int:
+    """Non-zero 64-bit hash of a key, stable across processes."""
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little') or 1
+
+
+class SharedMemoryCache:
+    """Byte-string cache in a memory-mapped file shared across processes."""
+    
+    def __init__(self, path: Optional[str] = None, slots: Optional[int] = None,
+                 slot_size: Optional[int] = None):
+        self.path = path or Config.SHARED_CACHE_PATH
+        self.slots = max(BUCKET_SLOTS, (slots or Config.SHARED_CACHE_SLOTS) // BUCKET_SLOTS * BUCKET_SLOTS)
+        self.slot_size = max(SLOT_HEADER.size + 64, slot_size or Config.SHARED_CACHE_SLOT_SIZE)
+        self.capacity = self.slot_size - SLOT_HEADER.size
+        self._buckets = self.slots // BUCKET_SLOTS
+        self.file_path = f'{self.path}.v{LAYOUT_VERSION}-{self.slots}x{self.slot_size}'
+        self._map: Optional[mmap.mmap] = None
+        self._fd: Optional[int] = None
+        self._pid: Optional[int] = None
+        self._open_lock = threading.Lock()
+        self._thread_locks = [threading.Lock() for _ in range(THREAD_LOCK_STRIPES)]
+        self._failed = False
+    
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Return the value stored for the key, or None when it is missing or expired.
+        
+        Never blocks on writers.
+        """
+        mapping = self._mapping()
+        if mapping is None:
+            return None
+        encoded = key.encode('utf-8')
+        hashed = key_hash(encoded)
+        now = time.time()
+        for offset in self._bucket_offsets(hashed):
+            entry = self._read_slot(mapping, offset, hashed)
+            if entry is not None and entry[0] == encoded and entry[2] > now:
+                SHARED_CACHE_LOOKUPS.inc(result='hit')
+                return entry[1]
+        SHARED_CACHE_LOOKUPS.inc(result='miss')
+        return None
+    
+    def set(self, key: str, value: bytes, ttl: float) -> bool:
+        """
+        Store a value for ttl seconds, evicting the entry closest to expiry when the bucket is full.
+        
+        Returns:
+            False when the key and value do not fit in a slot or the cache is unavailable
+        """
+        encoded = key.encode('utf-8')
+        if len(encoded) + len(value) > self.capacity:
+            return False
+        mapping = self._mapping()
+        if mapping is None:
+            return False
+        hashed = key_hash(encoded)
+        offsets = self._bucket_offsets(hashed)
+        now = time.time()
+        with self._bucket_lock(offsets[0]):
+            target, target_expiry = offsets[0], float('inf')
+            for offset in offsets:
+                _, _, slot_hash, expires_at, key_length = SLOT_HEADER.unpack_from(mapping, offset)
+                start = offset + SLOT_HEADER.size
+                if slot_hash == hashed and mapping[start:start + key_length] == encoded:
+                    target = offset
+                    break
+                # Empty and expired slots count as expiring first
+                expiry = expires_at if slot_hash and expires_at > now else 0.0
+                if expiry < target_expiry:
+                    target, target_expiry = offset, expiry
+            self._write_slot(mapping, target, hashed, now + ttl, encoded, value)
+        return True
+    
+    def delete(self, key: str) -> None:
+        """Remove the key if it is stored."""
+        mapping = self._mapping()
+        if mapping is None:
+            return
+        encoded = key.encode('utf-8')
+        hashed = key_hash(encoded)
+        offsets = self._bucket_offsets(hashed)
+        with self._bucket_lock(offsets[0]):
+            for offset in offsets:
+                _, _, slot_hash, _, key_length = SLOT_HEADER.unpack_from(mapping, offset)
+                start = offset + SLOT_HEADER.size
+                if slot_hash == hashed and mapping[start:start + key_length] == encoded:
+                    self._write_slot(mapping, offset, 0, 0.0, b'', b'')
+    
+    def get_json(self, key: str) -> Any:
+        """Return the decoded JSON value stored for the key, or None."""
+        value = self.get(key)
+        return json.loads(value) if value is not None else None
+    
+    def set_json(self, key: str, value: Any, ttl: float) -> bool:
+        """Store a JSON-serializable value for ttl seconds."""
+        return self.set(key, json.dumps(value, separators=(',', ':')).encode('utf-8'), ttl)
+    
+    def close(self) -> None:
+        """Unmap the file in this process."""
+        with self._open_lock:
+            if self._map is not None and self._pid == os.getpid():
+                self._map.close()
+                os.close(self._fd)
+            self._map, self._fd, self._pid = None, None, None
+    
+    def _bucket_offsets(self, hashed: int) -> Tuple[int, ...]:
+        first = (hashed % self._buckets) * BUCKET_SLOTS
+        return tuple(HEADER_SIZE + (first + index) * self.slot_size for index in range(BUCKET_SLOTS))
+    
+    def _read_slot(self, mapping: mmap.mmap, offset: int, hashed: int) -> Optional[Tuple[bytes, bytes, float]]:
+        """Consistent (key, value, expiry) of a slot holding the hash, or None."""
+        for _ in range(READ_RETRIES):
+            sequence, length, slot_hash, expires_at, key_length = SLOT_HEADER.unpack_from(mapping, offset)
+            if sequence & 1:
+                # A writer is in the middle of this slot
+                time.sleep(0)
+                continue
+            if slot_hash != hashed or key_length + length > self.capacity:
+                return None
+            start = offset + SLOT_HEADER.size
+            data = mapping[start:start + key_length + length]
+            if SEQ.unpack_from(mapping, offset)[0] == sequence:
+                return data[:key_length], data[key_length:], expires_at
+        return None
+    
+    @staticmethod
+    def _write_slot(mapping: mmap.mmap, offset: int, hashed: int, expires_at: float,
+                    key: bytes, value: bytes) -> None:
+        """Rewrite a slot; the caller holds the bucket lock."""
+        sequence = SEQ.unpack_from(mapping, offset)[0]
+        SEQ.pack_into(mapping, offset, (sequence + 1) & 0xFFFFFFFF)
+        start = offset + SLOT_HEADER.size
+        mapping[start:start + len(key) + len(value)] = key + value
+        SLOT_HEADER.pack_into(mapping, offset, (sequence + 1) & 0xFFFFFFFF, len(value), hashed, expires_at, len(key))
+        SEQ.pack_into(mapping, offset, (sequence + 2) & 0xFFFFFFFF)
+    
+    @contextmanager
+    def _bucket_lock(self, offset: int) -> Iterator[None]:
+        """Exclude other threads and processes from one bucket."""
+        bucket = (offset - HEADER_SIZE) // (self.slot_size * BUCKET_SLOTS)
+        length = self.slot_size * BUCKET_SLOTS
+        with self._thread_locks[bucket % THREAD_LOCK_STRIPES]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, offset)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, offset)
+    
+    def _mapping(self) -> Optional[mmap.mmap]:
+        """Return this process's mapping, opening (and if new, formatting) the file after a fork."""
+        if self._map is not None and self._pid == os.getpid():
+            return self._map
+        if self._failed:
+            return None
+        with self._open_lock:
+            if self._map is not None and self._pid == os.getpid():
+                return self._map
+            try:
+                self._fd, self._map = self._open()
+            except OSError as e:
+                logger.warning("Shared cache unavailable at %s: %s", self.file_path, e)
+                self._failed = True
+                return None
+            self._pid = os.getpid()
+            # Locks held by other threads at fork time are never released in the child
+            self._thread_locks = [threading.Lock() for _ in range(THREAD_LOCK_STRIPES)]
+            return self._map
+    
+    def _open(self) -> Tuple[int, mmap.mmap]:
+        directory = os.path.dirname(self.file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        size = HEADER_SIZE + self.slots * self.slot_size
+        fd = os.open(self.file_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX, HEADER_SIZE, 0)
+            try:
+                expected = FILE_HEADER.pack(MAGIC, LAYOUT_VERSION, self.slots, self.slot_size)
+                if os.fstat(fd).st_size == 0:
+                    # Only this process can have an empty file mapped, so it is safe to size it
+                    os.ftruncate(fd, size)
+                    os.pwrite(fd, expected, 0)
+                elif os.pread(fd, FILE_HEADER.size, 0) != expected or os.fstat(fd).st_size != size:
+                    raise OSError(f"{self.file_path} has an unexpected layout; not reformatting a file "
+                                  f"other processes may have mapped")
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, HEADER_SIZE, 0)
+            return fd, mmap.mmap(fd, size)
+        except OSError:
+            os.close(fd)
+            raise
+
+_caches: Dict[str, SharedMemoryCache] = {}
+_caches_lock = threading.Lock()
+
+
+def shared_cache() -> Optional[SharedMemoryCache]:
+    """The shared cache at SHARED_CACHE_PATH, or None when SHARED_CACHE_ENABLED is off."""
+    if not Config.SHARED_CACHE_ENABLED:
+        return None
+    with _caches_lock:
+        cache = _caches.get(Config.SHARED_CACHE_PATH)
+        if cache is None:
+            cache = _caches[Config.SHARED_CACHE_PATH] = SharedMemoryCache()
+        return cache
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into a single execution.
+    
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is still running wait for and share its result or
+    exception. Nothing is remembered once the call completes.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._async_calls: Dict[str, _AsyncCall] = {}
+    
+    def do(self, key: str, fn: Callable[[], T], timeout: Optional[float] = None) -> T:
+        """
+        Run fn for the key, or wait for the in-flight call with the same key.
+        
+        Args:
+            key: Coalescing key
+            fn: Function producing the result
+            timeout: Longest a follower waits for the leader; unbounded if omitted
+        
+        Returns:
+            The result of the shared call
+        
+        Raises:
+            TimeoutError: When a follower's timeout passes first
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._calls[key] = future
+        
+        if not is_leader:
+            return future.result(timeout)
+        
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+    
+    async def ado(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Async counterpart of do for callers on the same event loop.
+        
+        The shared call runs in its own task, so a cancelled caller (the
+        leader included) does not cancel it for the others; it is cancelled
+        only once every caller waiting on it is gone.
+        
+        Args:
+            key: Coalescing key
+            fn: Coroutine function producing the result
+        
+        Returns:
+            The result of the shared call
+        """
+        call = self._async_calls.get(key)
+        if call is None or call.task.done():
+            call = _AsyncCall(asyncio.ensure_future(fn()))
+            self._async_calls[key] = call
+            call.task.add_done_callback(lambda task: self._forget(key, call))
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1:
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+    
+    def _forget(self, key: str, call: '_AsyncCall') -> None:
+        if self._async_calls.get(key) is call:
+            del self._async_calls[key]
+    
+    @property
+    def in_flight(self) -> int:
+        """Number of keys currently being computed."""
+        return len(self._calls) + len(self._async_calls)
+
+
+class _AsyncCall:
+    """A shared async call and the number of callers awaiting it."""
+    
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
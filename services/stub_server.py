@@ -0,0 +1,170 @@
+"""
+Local stand-in for an OpenAI-compatible chat completion server.
+
+Usage:
+    python -m services.stub_server [--port 8081] [--latency 0.5] [--jitter 0.2]
+                                   [--distribution uniform] [--error-rate 0.0]
+
+Point the app at it with AI_BACKENDS="stub=http://127.0.0.1:8081/v1".
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+STUB_PROPHECY = (
+    "A quiet alliance will shift the balance of power before the year ends. "
+    "Leaders who wait too long will find the road already taken. "
+    "New voices will rise where old certainties crumble."
+)
+
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'normal', 'lognormal', 'exponential')
+
+
+class StubSettings:
+    """
+    Behaviour of the stub server.
+    
+    ``latency`` is the mean response time. ``jitter`` spreads it according
+    to ``distribution``: the half-width for ``uniform``, the standard
+    deviation for ``normal`` and ``lognormal`` (which has a long right tail
+    like real model servers). ``exponential`` only uses the mean.
+    """
+    
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 prophecy: str = STUB_PROPHECY, chunk_delay: float = 0.0, distribution: str = 'uniform'):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{distribution}'")
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.prophecy = prophecy
+        self.chunk_delay = chunk_delay
+        self.distribution = distribution
+    
+    def sample_latency(self) -> float:
+        """Latency to simulate for one request."""
+        if self.latency <= 0 or self.distribution == 'fixed':
+            return max(0.0, self.latency)
+        if self.distribution == 'normal':
+            return max(0.0, random.gauss(self.latency, self.jitter))
+        if self.distribution == 'lognormal':
+            # Parameters of the underlying normal giving this mean and standard deviation
+            sigma2 = math.log(1 + (self.jitter / self.latency) ** 2)
+            return random.lognormvariate(math.log(self.latency) - sigma2 / 2, math.sqrt(sigma2))
+        if self.distribution == 'exponential':
+            return random.expovariate(1 / self.latency)
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """Handle ``POST /v1/chat/completions`` with canned prophecies."""
+    
+    settings = StubSettings()
+    protocol_version = 'HTTP/1.1'
+    
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': {'message': 'invalid JSON'}})
+            return
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': f'unknown path {self.path}'}})
+            return
+        
+        time.sleep(self.settings.sample_latency())
+        if random.random() < self.settings.error_rate:
+            self._send_json(503, {'error': {'message': 'stub backend failure'}})
+            return
+        
+        if payload.get('stream'):
+            self._send_stream(payload.get('model', 'stub'))
+        else:
+            self._send_json(200, {
+                'id': 'stub-completion',
+                'object': 'chat.completion',
+                'model': payload.get('model', 'stub'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': self.settings.prophecy},
+                    'finish_reason': 'stop',
+                }],
+            })
+    
+    def _send_json(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def _send_stream(self, model: str) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        for word in self.settings.prophecy.split(' '):
+            chunk = {'model': model, 'choices': [{'index': 0, 'delta': {'content': word + ' '}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+            if self.settings.chunk_delay:
+                time.sleep(self.settings.chunk_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+    
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def make_server(host: str = '127.0.0.1', port: int = 0,
+                settings: Optional[StubSettings] = None) -> ThreadingHTTPServer:
+    """Create a stub server; port 0 picks a free port (see ``server.server_address``)."""
+    handler = type('ConfiguredStubHandler', (StubRequestHandler,), {'settings': settings or StubSettings()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_background(settings: Optional[StubSettings] = None) -> ThreadingHTTPServer:
+    """Start a stub server on a free local port in a daemon thread."""
+    server = make_server(settings=settings)
+    threading.Thread(target=server.serve_forever, name='stub-server', daemon=True).start()
+    return server
+
+
+def main(argv=None) -> None:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible stub prophecy server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.5, help="mean response latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.2, help="latency spread in seconds")
+    parser.add_argument('--distribution', choices=LATENCY_DISTRIBUTIONS, default='uniform',
+                        help="shape of the latency distribution")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args(argv)
+    
+    settings = StubSettings(args.latency, args.jitter, args.error_rate, distribution=args.distribution)
+    server = make_server(args.host, args.port, settings)
+    logger.info(f"Stub prophecy server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -7,6 +7,44 @@ from flask import Flask
 from app import create_app
 
 
+@pytest.fixture(autouse=True)
+def isolated_prophecy_cache(tmp_path):
+    """Keep the persistent prophecy cache out of the working tree."""
+    with patch('config.Config.PROPHECY_CACHE_PATH', str(tmp_path / 'prophecy_cache.sqlite3')):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def isolated_reading_jobs(tmp_path):
+    """Keep the SQLite reading job store out of the working tree, and jobs in memory unless a test opts in."""
+    with patch('config.Config.JOBS_DB_PATH', str(tmp_path / 'reading_jobs.sqlite3')), \
+            patch('config.Config.JOBS_BACKEND', 'memory'):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def isolated_shared_cache(tmp_path):
+    """Keep the shared-memory cache off unless a test enables it, and out of /dev/shm."""
+    with patch('config.Config.SHARED_CACHE_ENABLED', False), \
+            patch('config.Config.SHARED_CACHE_PATH', str(tmp_path / 'shared_cache.mmap')), \
+            patch('config.Config.SHARED_CACHE_SLOTS', 64):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def isolated_asset_build(tmp_path):
+    """Ignore image assets built in the working tree."""
+    with patch('config.Config.ASSET_BUILD_FOLDER', str(tmp_path / 'build')):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def no_retry_backoff():
+    """Retry failed AI calls without sleeping between attempts."""
+    with patch('config.Config.AI_RETRY_BASE_DELAY', 0.0):
+        yield
+
+
 @pytest.fixture
 def app():
     """Create and configure a new app instance for each test."""
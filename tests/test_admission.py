@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import pytest
+from services.admission import AdmissionGate, RateLimiter
+from exceptions import OverloadedError
+
+
+class TestAdmissionGate:
+    """Test cases for AdmissionGate."""
+    
+    def test_limits_concurrency(self):
+        """Test that callers beyond the limit wait for a free slot."""
+        gate = AdmissionGate(limit=1, queue_size=1, max_wait=5)
+        gate.acquire()
+        admitted = threading.Event()
+        
+        def waiter():
+            with gate.slot():
+                admitted.set()
+        
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        assert not admitted.wait(0.05)
+        assert gate.waiting == 1
+        
+        gate.release()
+        thread.join(5)
+        assert admitted.is_set()
+        assert gate.active == 0
+        assert gate.waiting == 0
+    
+    def test_rejects_when_queue_full(self):
+        """Test that callers are shed at once when the wait queue is full."""
+        gate = AdmissionGate(limit=1, queue_size=0, max_wait=5)
+        gate.acquire()
+        
+        with pytest.raises(OverloadedError, match="queue is full"):
+            gate.acquire()
+    
+    def test_wait_times_out(self):
+        """Test that a queued caller gives up after the shorter of max_wait and its timeout."""
+        gate = AdmissionGate(limit=1, queue_size=1, max_wait=5)
+        gate.acquire()
+        
+        with pytest.raises(OverloadedError):
+            gate.acquire(timeout=0.01)
+        assert gate.waiting == 0
+    
+    def test_try_acquire_never_waits(self):
+        """Test that try_acquire takes a free slot and refuses at once when none is free."""
+        gate = AdmissionGate(limit=1, queue_size=1, max_wait=5)
+        
+        assert gate.try_acquire()
+        assert not gate.try_acquire()
+        gate.release()
+        assert gate.active == 0
+        assert AdmissionGate(limit=0, queue_size=0, max_wait=0).try_acquire()
+    
+    def test_cancelled_async_waiter_returns_slot(self):
+        """Test that a slot taken for a cancelled async waiter is released."""
+        gate = AdmissionGate(limit=1, queue_size=2, max_wait=5)
+        gate.acquire()
+        
+        async def cancel_waiter():
+            waiter = asyncio.ensure_future(gate.aacquire())
+            await asyncio.sleep(0.05)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            gate.release()
+            # The worker thread takes the freed slot, then hands it back
+            while gate.waiting:
+                await asyncio.sleep(0.01)
+            await asyncio.to_thread(gate.acquire, 1)
+        
+        asyncio.run(cancel_waiter())
+        assert gate.active == 1
+        assert gate.waiting == 0
+    
+    def test_disabled(self):
+        """Test that a limit of 0 admits everything."""
+        gate = AdmissionGate(limit=0, queue_size=0, max_wait=0)
+        for _ in range(3):
+            gate.acquire()
+        assert gate.active == 0
+
+
+class TestRateLimiter:
+    """Test cases for RateLimiter."""
+    
+    def test_token_bucket(self):
+        """Test that a client gets its burst, then tokens at the configured rate."""
+        now = [0.0]
+        limiter = RateLimiter(rate=1.0, burst=2, clock=lambda: now[0])
+        
+        assert limiter.check('a') == 0
+        assert limiter.check('a') == 0
+        assert limiter.check('a') == pytest.approx(1.0)
+        # Other clients have their own bucket
+        assert limiter.check('b') == 0
+        
+        now[0] = 1.5
+        assert limiter.check('a') == 0
+        assert limiter.check('a') == pytest.approx(0.5)
+    
+    def test_forgets_least_recent_clients(self):
+        """Test that only max_clients buckets are kept."""
+        limiter = RateLimiter(rate=0.001, burst=1, max_clients=2, clock=lambda: 0.0)
+        limiter.check('a')
+        limiter.check('b')
+        limiter.check('c')
+        
+        # 'a' was dropped and starts again with a full bucket
+        assert limiter.check('a') == 0
+        assert limiter.check('c') > 0
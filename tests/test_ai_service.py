@@ -1,18 +1,31 @@
+import asyncio
+import threading
+import time
 import pytest
-from unittest.mock import patch, Mock
+from unittest.mock import AsyncMock, patch, Mock
 from services.ai_service import AIProphecyService
-from exceptions import AIProphecyError
+from exceptions import AIProphecyError, CircuitOpenError, DeadlineExceededError, OverloadedError
+from utils.deadline import Deadline
+
+
+def make_response(content):
+    """Build a chat completion response mock."""
+    response = Mock()
+    response.choices = [Mock()]
+    response.choices[0].message = {"content": content}
+    return response
 
 
 class TestAIProphecyService:
     """Test cases for AIProphecyService."""
     
     @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.AI_CLIENT_TIMEOUT', 60.0)
     def test_ai_service_initialization(self):
         """Test AIProphecyService initialization."""
-        with patch('services.ai_service.InferenceClient') as mock_client:
+        with patch('services.prophecy_backends.InferenceClient') as mock_client:
             service = AIProphecyService()
-            mock_client.assert_called_once_with("HuggingFaceH4/zephyr-7b-alpha", token='test_token')
+            mock_client.assert_called_once_with("HuggingFaceH4/zephyr-7b-alpha", token='test_token', timeout=60.0)
     
     @patch('config.Config.HF_TOKEN', 'test_token')
     def test_generate_prophecy_success(self):
@@ -23,7 +36,7 @@ class TestAIProphecyService:
         mock_response.choices[0].message = {"content": "Test prophecy content"}
         mock_client.chat_completion.return_value = mock_response
         
-        with patch('services.ai_service.InferenceClient', return_value=mock_client):
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
             service = AIProphecyService()
             
             card_infos = [
@@ -54,7 +67,7 @@ class TestAIProphecyService:
         mock_client = Mock()
         mock_client.chat_completion.side_effect = Exception("API Error")
         
-        with patch('services.ai_service.InferenceClient', return_value=mock_client):
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
             service = AIProphecyService()
             
             card_infos = ["The Magician: Test meaning"]
@@ -67,7 +80,7 @@ class TestAIProphecyService:
         """Test prompt building functionality."""
         mock_client = Mock()
         
-        with patch('services.ai_service.InferenceClient', return_value=mock_client):
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
             service = AIProphecyService()
             
             card_infos = [
@@ -95,7 +108,7 @@ class TestAIProphecyService:
         mock_response.choices[0].message = {"content": "Empty prophecy"}
         mock_client.chat_completion.return_value = mock_response
         
-        with patch('services.ai_service.InferenceClient', return_value=mock_client):
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
             service = AIProphecyService()
             
             result = service.generate_prophecy([])
@@ -118,7 +131,7 @@ class TestAIProphecyService:
         mock_response.choices[0].message = {"content": "Single card prophecy"}
         mock_client.chat_completion.return_value = mock_response
         
-        with patch('services.ai_service.InferenceClient', return_value=mock_client):
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
             service = AIProphecyService()
             
             card_infos = ["The Magician: Creator, leader, initiative, fulfillment of hopes, great potential."]
@@ -131,4 +144,403 @@ class TestAIProphecyService:
             # Check that the prompt contains the single card
             call_args = mock_client.chat_completion.call_args
             messages = call_args[1]['messages']
-            assert "The Magician: Creator, leader, initiative, fulfillment of hopes, great potential." in messages[0]['content'] 
\ No newline at end of file
+            assert "The Magician: Creator, leader, initiative, fulfillment of hopes, great potential." in messages[0]['content'] 
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.PROPHECY_CACHE_VARIANTS', 1)
+    def test_generate_prophecy_uses_cache(self):
+        """Test that a cached combination skips the inference call."""
+        mock_client = Mock()
+        mock_response = Mock()
+        mock_response.choices = [Mock()]
+        mock_response.choices[0].message = {"content": "Cached prophecy"}
+        mock_client.chat_completion.return_value = mock_response
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
+            service = AIProphecyService()
+            
+            first = service.generate_prophecy(["The Sun: Joy"], cache_key="the_sun")
+            second = service.generate_prophecy(["The Sun: Joy"], cache_key="the_sun")
+            
+            assert first == second == "Cached prophecy"
+            mock_client.chat_completion.assert_called_once()
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.PROPHECY_CACHE_ENABLED', False)
+    def test_generate_prophecy_cache_disabled(self):
+        """Test that the cache can be disabled."""
+        mock_client = Mock()
+        mock_response = Mock()
+        mock_response.choices = [Mock()]
+        mock_response.choices[0].message = {"content": "Fresh prophecy"}
+        mock_client.chat_completion.return_value = mock_response
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
+            service = AIProphecyService()
+            
+            service.generate_prophecy(["The Sun: Joy"], cache_key="the_sun")
+            service.generate_prophecy(["The Sun: Joy"], cache_key="the_sun")
+            
+            assert service.cache is None
+            assert mock_client.chat_completion.call_count == 2
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    def test_stream_prophecy_yields_chunks(self):
+        """Test streaming prophecy chunks and caching the full text."""
+        chunks = []
+        for text in ["The ", "stars ", None, "align."]:
+            chunk = Mock()
+            chunk.choices = [Mock()]
+            chunk.choices[0].delta.content = text
+            chunks.append(chunk)
+        mock_client = Mock()
+        mock_client.chat_completion.return_value = iter(chunks)
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client), \
+                patch('config.Config.PROPHECY_CACHE_VARIANTS', 1):
+            service = AIProphecyService()
+            
+            streamed = list(service.stream_prophecy(["The Star: Hope"], cache_key="the_star"))
+            
+            assert streamed == ["The ", "stars ", "align."]
+            assert mock_client.chat_completion.call_args[1]['stream'] is True
+            assert list(service.stream_prophecy(["The Star: Hope"], cache_key="the_star")) == ["The stars align."]
+            mock_client.chat_completion.assert_called_once()
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    def test_stream_prophecy_error(self):
+        """Test that streaming failures raise AIProphecyError."""
+        mock_client = Mock()
+        mock_client.chat_completion.side_effect = Exception("Stream Error")
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
+            service = AIProphecyService()
+            
+            with pytest.raises(AIProphecyError, match="Failed to generate prophecy: Stream Error"):
+                list(service.stream_prophecy(["The Star: Hope"]))
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.AI_MAX_RETRIES', 2)
+    def test_generate_prophecy_retries_transient_errors(self):
+        """Test that failed calls are retried within the retry limit."""
+        mock_client = Mock()
+        mock_client.chat_completion.side_effect = [Exception("Blip"), make_response("Recovered prophecy")]
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
+            service = AIProphecyService()
+            
+            assert service.generate_prophecy(["The Sun: Joy"]) == "Recovered prophecy"
+            assert mock_client.chat_completion.call_count == 2
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.AI_MAX_RETRIES', 2)
+    def test_generate_prophecy_retry_limit(self):
+        """Test that retries stop after the configured limit."""
+        mock_client = Mock()
+        mock_client.chat_completion.side_effect = Exception("API Error")
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
+            service = AIProphecyService()
+            
+            with pytest.raises(AIProphecyError):
+                service.generate_prophecy(["The Sun: Joy"])
+            assert mock_client.chat_completion.call_count == 3
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    def test_generate_prophecy_deadline_exceeded(self):
+        """Test that a slow backend is abandoned when the budget runs out."""
+        release = threading.Event()
+        mock_client = Mock()
+        mock_client.chat_completion.side_effect = lambda **kwargs: release.wait(5) and make_response("Too late")
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
+            service = AIProphecyService()
+            
+            started = time.monotonic()
+            with pytest.raises(DeadlineExceededError):
+                service.generate_prophecy(["The Sun: Joy"], deadline=Deadline(0.05))
+            release.set()
+            
+            assert time.monotonic() - started < 1.0
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.ADMISSION_MAX_CONCURRENCY', 1)
+    @patch('config.Config.ADMISSION_QUEUE_SIZE', 8)
+    def test_abandoned_calls_keep_admission_slot(self):
+        """Test that calls left running past the deadline still count against the admission limit."""
+        lock = threading.Lock()
+        running = [0, 0]
+        
+        def slow_completion(**kwargs):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.3)
+            with lock:
+                running[0] -= 1
+            return make_response("Too late")
+        
+        mock_client = Mock()
+        mock_client.chat_completion.side_effect = slow_completion
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
+            service = AIProphecyService()
+            for _ in range(4):
+                with pytest.raises(AIProphecyError):
+                    service.generate_prophecy(["The Sun: Joy"], deadline=Deadline(0.05))
+            
+            deadline = time.monotonic() + 2
+            while service.admission.active and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert running[1] == 1
+            assert service.admission.active == 0
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.AI_HEDGE_ENABLED', True)
+    @patch('config.Config.AI_HEDGE_MIN_SAMPLES', 1)
+    def test_generate_prophecy_hedges_slow_request(self):
+        """Test that a hedged request wins when the first one stalls."""
+        release = threading.Event()
+        responses = iter([lambda: release.wait(5) and make_response("Slow"), lambda: make_response("Hedged")])
+        mock_client = Mock()
+        mock_client.chat_completion.side_effect = lambda **kwargs: next(responses)()
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
+            service = AIProphecyService()
+            service.latency.record(0.01)
+            
+            result = service.generate_prophecy(["The Sun: Joy"], deadline=Deadline(2.0))
+            release.set()
+            
+            assert result == "Hedged"
+            assert mock_client.chat_completion.call_count == 2
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.AI_HEDGE_ENABLED', True)
+    @patch('config.Config.AI_HEDGE_MIN_SAMPLES', 1)
+    @patch('config.Config.ADMISSION_MAX_CONCURRENCY', 1)
+    def test_no_hedge_without_spare_slot(self):
+        """Test that a hedge is skipped when the admission gate has no free slot for it."""
+        release = threading.Event()
+        mock_client = Mock()
+        mock_client.chat_completion.side_effect = lambda **kwargs: release.wait(5) and make_response("Slow")
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
+            service = AIProphecyService()
+            service.latency.record(0.01)
+            
+            with pytest.raises(DeadlineExceededError):
+                service.generate_prophecy(["The Sun: Joy"], deadline=Deadline(0.1))
+            release.set()
+            
+            assert mock_client.chat_completion.call_count == 1
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.AI_HEDGE_ENABLED', True)
+    @patch('config.Config.AI_HEDGE_MIN_SAMPLES', 1)
+    @patch('config.Config.ADMISSION_MAX_CONCURRENCY', 2)
+    def test_hedge_holds_slot_past_deadline(self):
+        """Test that a hedge still running after the deadline keeps its admission slot until it finishes."""
+        release = threading.Event()
+        mock_client = Mock()
+        mock_client.chat_completion.side_effect = lambda **kwargs: release.wait(5) and make_response("Slow")
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
+            service = AIProphecyService()
+            service.latency.record(0.01)
+            
+            with pytest.raises(DeadlineExceededError):
+                service.generate_prophecy(["The Sun: Joy"], deadline=Deadline(0.1))
+            assert mock_client.chat_completion.call_count == 2
+            assert service.admission.active == 2
+            
+            release.set()
+            deadline = time.monotonic() + 2
+            while service.admission.active and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert service.admission.active == 0
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.AI_HEDGE_ENABLED', True)
+    def test_no_hedging_without_latency_history(self):
+        """Test that hedging waits for enough latency samples."""
+        mock_client = Mock()
+        mock_client.chat_completion.return_value = make_response("Single")
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
+            service = AIProphecyService()
+            
+            assert service.generate_prophecy(["The Sun: Joy"], deadline=Deadline(2.0)) == "Single"
+            mock_client.chat_completion.assert_called_once()    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.PROPHECY_CACHE_VARIANTS', 3)
+    def test_shed_request_served_from_cache(self):
+        """Test that a shed request gets any cached prophecy, then degrades without one."""
+        mock_client = Mock()
+        mock_client.chat_completion.return_value = make_response("Only variant")
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
+            service = AIProphecyService()
+            assert service.generate_prophecy(["The Sun: Joy"], cache_key="the_sun") == "Only variant"
+            
+            with patch.object(service.admission, 'acquire', side_effect=OverloadedError("full")):
+                # One variant is not a cache hit, but it beats no answer under load
+                assert service.generate_prophecy(["The Sun: Joy"], cache_key="the_sun") == "Only variant"
+                assert list(service.stream_prophecy(["The Sun: Joy"], cache_key="the_sun")) == ["Only variant"]
+                with pytest.raises(OverloadedError):
+                    service.generate_prophecy(["The Moon: Illusion"], cache_key="the_moon")
+            assert mock_client.chat_completion.call_count == 1
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.ADMISSION_MAX_CONCURRENCY', 1)
+    @patch('config.Config.ADMISSION_QUEUE_SIZE', 0)
+    def test_admission_limits_model_calls(self):
+        """Test that model calls beyond the admission limit are shed instead of queued."""
+        release = threading.Event()
+        mock_client = Mock()
+        mock_client.chat_completion.side_effect = lambda **kwargs: release.wait(5) and make_response("Slow")
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
+            service = AIProphecyService()
+            first = threading.Thread(target=service.generate_prophecy, args=(["The Sun: Joy"],))
+            first.start()
+            while service.admission.active == 0:
+                time.sleep(0.01)
+            
+            with pytest.raises(OverloadedError):
+                service.generate_prophecy(["The Moon: Illusion"])
+            release.set()
+            first.join(5)
+            assert mock_client.chat_completion.call_count == 1
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.ADMISSION_MAX_CONCURRENCY', 1)
+    @patch('config.Config.ADMISSION_QUEUE_SIZE', 0)
+    def test_refresh_without_admission(self):
+        """Test that an offline refresh is neither shed by the gate nor stopped by an open breaker."""
+        mock_client = Mock()
+        mock_client.chat_completion.return_value = make_response("Batch")
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
+            service = AIProphecyService()
+            service.admission.acquire()
+            with patch.object(service.circuit_breaker, 'allow_request', return_value=False):
+                assert service.refresh_prophecy(["The Sun: Joy"], "the_sun", admit=False) == "Batch"
+                with pytest.raises(CircuitOpenError):
+                    service.refresh_prophecy(["The Sun: Joy"], "the_sun")
+            assert service.admission.active == 1
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.ADMISSION_MAX_CONCURRENCY', 1)
+    @patch('config.Config.ADMISSION_QUEUE_SIZE', 4)
+    @patch('config.Config.ADMISSION_MAX_WAIT', 2.0)
+    def test_open_circuit_skips_admission_queue(self):
+        """Test that an open circuit fails fast instead of queueing for an admission slot."""
+        with patch('services.prophecy_backends.InferenceClient', return_value=Mock()):
+            service = AIProphecyService()
+            service.admission.acquire()
+            started = time.monotonic()
+            with patch.object(service.circuit_breaker, 'allow_request', return_value=False):
+                with pytest.raises(CircuitOpenError):
+                    service.generate_prophecy(["The Sun: Joy"])
+                with pytest.raises(CircuitOpenError):
+                    asyncio.run(service.agenerate_prophecy(["The Sun: Joy"]))
+            
+            assert time.monotonic() - started < 1.0
+            assert service.admission.waiting == 0
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.PROPHECY_CACHE_VARIANTS', 2)
+    @patch('config.Config.PROPHECY_SWR_DEADLINE', 0.05)
+    def test_stale_served_while_revalidating(self):
+        """Test that a late model call is answered with the cached prophecy and refreshes the cache."""
+        release = threading.Event()
+        mock_client = Mock()
+        mock_client.chat_completion.side_effect = lambda **kwargs: release.wait(5) and make_response("Fresh")
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
+            service = AIProphecyService()
+            service.cache.put("the_sun", "Stale")
+            
+            started = time.monotonic()
+            first = service.generate_prophecy(["The Sun: Joy"], cache_key="the_sun")
+            second = service.generate_prophecy(["The Sun: Joy"], cache_key="the_sun")
+            assert time.monotonic() - started < 1.0
+            assert first == second == "Stale"
+            
+            release.set()
+            deadline = time.monotonic() + 5
+            while service.cache.count("the_sun") < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            
+            # Both requests shared one background call
+            assert mock_client.chat_completion.call_count == 1
+            assert service.cache.count("the_sun") == 2
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.PROPHECY_CACHE_VARIANTS', 3)
+    @patch('config.Config.AI_MAX_RETRIES', 0)
+    def test_stale_served_on_error(self):
+        """Test that a prompt answer is served fresh and a failed call falls back to the cached prophecy."""
+        mock_client = Mock()
+        mock_client.chat_completion.side_effect = [make_response("Fresh"), Exception("API Error")]
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
+            service = AIProphecyService()
+            service.cache.put("the_sun", "Stale")
+            
+            assert service.generate_prophecy(["The Sun: Joy"], cache_key="the_sun") == "Fresh"
+            assert service.generate_prophecy(["The Sun: Joy"], cache_key="the_sun") in ("Stale", "Fresh")
+            assert mock_client.chat_completion.call_count == 2
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.PROPHECY_CACHE_VARIANTS', 2)
+    @patch('config.Config.PROPHECY_SWR_DEADLINE', 0.05)
+    def test_agenerate_revalidates_with_async_client(self):
+        """Test that concurrent async requests for a stale combination share one async refresh."""
+        async def slow_completion(**kwargs):
+            await asyncio.sleep(0.3)
+            return make_response("Fresh")
+        
+        mock_client = Mock()
+        mock_async_client = Mock()
+        mock_async_client.chat_completion = AsyncMock(side_effect=slow_completion)
+        
+        async def readings(service):
+            started = time.monotonic()
+            results = await asyncio.gather(*(
+                service.agenerate_prophecy(["The Sun: Joy"], cache_key="the_sun") for _ in range(20)
+            ))
+            elapsed = time.monotonic() - started
+            while service.cache.count("the_sun") < 2 and time.monotonic() - started < 5:
+                await asyncio.sleep(0.01)
+            return results, elapsed
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client), \
+                patch('services.prophecy_backends.AsyncInferenceClient', return_value=mock_async_client):
+            service = AIProphecyService()
+            service.cache.put("the_sun", "Stale")
+            
+            results, elapsed = asyncio.run(readings(service))
+        
+        assert results == ["Stale"] * 20
+        assert elapsed < 0.25
+        assert mock_async_client.chat_completion.await_count == 1
+        mock_client.chat_completion.assert_not_called()
+        assert service.cache.count("the_sun") == 2
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.PROPHECY_CACHE_VARIANTS', 2)
+    @patch('config.Config.AI_MAX_RETRIES', 0)
+    def test_agenerate_serves_stale(self):
+        """Test that the async path answers with the cached prophecy when the refresh fails."""
+        mock_async_client = Mock()
+        mock_async_client.chat_completion = AsyncMock(side_effect=Exception("API Error"))
+        
+        with patch('services.prophecy_backends.InferenceClient'), \
+                patch('services.prophecy_backends.AsyncInferenceClient', return_value=mock_async_client):
+            service = AIProphecyService()
+            service.cache.put("the_sun", "Stale")
+            
+            assert asyncio.run(service.agenerate_prophecy(["The Sun: Joy"], cache_key="the_sun")) == "Stale"
+            mock_async_client.chat_completion.assert_awaited_once()
@@ -1,4 +1,5 @@
 import pytest
+import threading
 from unittest.mock import patch, Mock
 from app import create_app, main
 
@@ -83,6 +84,8 @@ class TestApp:
             rules = [rule.rule for rule in app.url_map.iter_rules()]
             assert '/' in rules
             assert '/draw_cards' in rules
+            assert '/draw_cards/stream' in rules
+            assert '/readings/batch' in rules
     
     @patch('app.Config.validate')
     def test_app_error_handling(self, mock_validate):
@@ -105,4 +108,112 @@ class TestApp:
             # Just test that the route exists and doesn't crash
             response = client.get('/draw_cards')
             # We don't care about the actual response, just that it doesn't crash
-            assert response is not None 
\ No newline at end of file
+            assert response is not None 
+    
+    @patch('app.Config.validate')
+    def test_draw_cards_stream_route(self, mock_validate):
+        """Test that the streaming route returns an event stream."""
+        with patch.dict('os.environ', {'HF_TOKEN': 'test_token'}):
+            app = create_app()
+            client = app.test_client()
+            
+            with patch('controllers.tarot_controller.TarotController.stream_reading',
+                       return_value=iter(['event: done\ndata: {}\n\n'])):
+                response = client.get('/draw_cards/stream')
+            
+            assert response.status_code == 200
+            assert response.mimetype == 'text/event-stream'
+            assert response.headers['Cache-Control'] == 'no-cache'
+            assert response.get_data(as_text=True) == 'event: done\ndata: {}\n\n'
+    
+    @patch('app.Config.validate')
+    def test_readings_batch_route(self, mock_validate):
+        """Test that the batch route streams NDJSON and rejects invalid bodies."""
+        with patch.dict('os.environ', {'HF_TOKEN': 'test_token'}):
+            app = create_app()
+            client = app.test_client()
+            
+            with patch('controllers.tarot_controller.TarotController.stream_batch',
+                       return_value=iter(['{"index": 0}\n'])) as mock_stream:
+                response = client.post('/readings/batch', json={'count': 1})
+                
+                assert response.status_code == 200
+                assert response.mimetype == 'application/x-ndjson'
+                assert response.get_data(as_text=True) == '{"index": 0}\n'
+                mock_stream.assert_called_once_with(1, 3)
+            
+            response = client.post('/readings/batch', json={'count': -1})
+            assert response.status_code == 400
+            assert 'error' in response.get_json()
+    
+    @patch('app.Config.validate')
+    @patch('app.Config.RATE_LIMIT_PER_MINUTE', 0.6)
+    @patch('app.Config.RATE_LIMIT_BURST', 2)
+    def test_draw_cards_rate_limited(self, mock_validate):
+        """Test that a client over its token bucket gets 429 with Retry-After."""
+        with patch.dict('os.environ', {'HF_TOKEN': 'test_token'}):
+            app = create_app()
+            client = app.test_client()
+            
+            with patch('controllers.tarot_controller.TarotController.draw_cards_json', return_value=(b'{}', 200)):
+                statuses = [client.get('/draw_cards').status_code for _ in range(3)]
+                other_client = client.get('/draw_cards', environ_base={'REMOTE_ADDR': '10.0.0.2'})
+            limited = client.get('/draw_cards/stream')
+            
+            assert statuses == [200, 200, 429]
+            assert other_client.status_code == 200
+            assert limited.status_code == 429
+            assert int(limited.headers['Retry-After']) > 0
+            assert client.get('/').status_code == 200
+    
+    @patch('app.Config.validate')
+    @patch('app.Config.RATE_LIMIT_PER_MINUTE', 0.6)
+    @patch('app.Config.RATE_LIMIT_BURST', 1)
+    @patch('app.Config.RATE_LIMIT_TRUST_PROXY', True)
+    def test_rate_limit_ignores_forged_forwarded_for(self, mock_validate):
+        """Test that behind a proxy clients are keyed by the hop the proxy appended."""
+        with patch.dict('os.environ', {'HF_TOKEN': 'test_token'}):
+            app = create_app()
+            client = app.test_client()
+            
+            with patch('controllers.tarot_controller.TarotController.draw_cards_json', return_value=(b'{}', 200)):
+                statuses = [
+                    client.get('/draw_cards', headers={'X-Forwarded-For': f'10.0.0.{index}, 203.0.113.7'}).status_code
+                    for index in range(2)
+                ]
+                other_client = client.get('/draw_cards', headers={'X-Forwarded-For': '203.0.113.8'})
+            
+            assert statuses == [200, 429]
+            assert other_client.status_code == 200
+    
+    @patch('app.Config.validate')
+    def test_http_caching_headers(self, mock_validate):
+        """Test that the page is revalidated with ETags while readings are never cached."""
+        with patch.dict('os.environ', {'HF_TOKEN': 'test_token'}):
+            app = create_app()
+            client = app.test_client()
+            
+            page = client.get('/', headers={'Accept-Encoding': 'gzip'})
+            assert page.headers['Content-Encoding'] == 'gzip'
+            assert client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': page.headers['ETag']}).status_code == 304
+            
+            with patch('controllers.tarot_controller.TarotController.draw_cards_json', return_value=(b'{"cards":[]}', 200)):
+                response = client.get('/draw_cards')
+            assert response.headers['Cache-Control'] == 'no-store'
+            assert 'ETag' not in response.headers
+    
+    @patch('app.Config.validate')
+    def test_lazy_startup_and_report(self, mock_validate):
+        """Test that lazy startup warms up in the background and /startup reports the milestones."""
+        with patch.dict('os.environ', {'HF_TOKEN': 'test_token'}), \
+                patch('config.Config.STARTUP_MODE', 'lazy'), patch('config.Config.STARTUP_REPORT', True), \
+                patch('services.prophecy_backends.InferenceClient') as mock_client:
+            app = create_app()
+            for thread in threading.enumerate():
+                if thread.name == 'warm-up':
+                    thread.join()
+            
+            mock_client.assert_called_once()
+            report = app.test_client().get('/startup').get_json()
+            assert {'app_imported', 'app_created', 'warmed_up', 'first_request'} <= set(report['milestones'])
+            assert 'warm_up' in report['phases']
@@ -0,0 +1,156 @@
+import asyncio
+import json
+from unittest.mock import patch, Mock, AsyncMock
+from asgi import TarotASGIApp, create_asgi_app
+from services.admission import RateLimiter
+from controllers.tarot_controller import TarotController
+from services.ai_service import AIProphecyService
+from models import TarotCard
+from exceptions import AIProphecyError
+
+
+def call_asgi(app, path, method='GET'):
+    """Run a single HTTP request through an ASGI app and collect the response."""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+        'root_path': '', 'headers': [(b'host', b'testserver')], 'server': ('testserver', 80),
+        'client': ('127.0.0.1', 12345),
+    }
+    messages = []
+    
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+    
+    async def send(message):
+        messages.append(message)
+    
+    asyncio.run(app(scope, receive, send))
+    start = next(m for m in messages if m['type'] == 'http.response.start')
+    body = b''.join(m.get('body', b'') for m in messages if m['type'] == 'http.response.body')
+    return start['status'], dict(start['headers']), body
+
+
+class TestTarotASGIApp:
+    """Test cases for the ASGI serving path."""
+    
+    def make_controller(self):
+        """Create a controller with mocked services."""
+        controller = Mock()
+        controller.adraw_cards = AsyncMock(return_value=({'cards': [], 'prophecy': 'Async prophecy'}, 200))
+        controller.ai_service.aclose = AsyncMock()
+        return controller
+    
+    def test_draw_cards_served_natively(self):
+        """Test that /draw_cards is answered by the async controller."""
+        controller = self.make_controller()
+        wsgi_app = Mock()
+        app = TarotASGIApp(controller, wsgi_app)
+        
+        status, headers, body = call_asgi(app, '/draw_cards')
+        
+        assert status == 200
+        assert headers[b'content-type'] == b'application/json'
+        assert json.loads(body) == {'cards': [], 'prophecy': 'Async prophecy'}
+        controller.adraw_cards.assert_awaited_once()
+        wsgi_app.assert_not_called()
+    
+    def test_draw_cards_headers_and_rate_limit(self):
+        """Test that the native route sends the request ID and no-store, and enforces the rate limit."""
+        controller = self.make_controller()
+        app = TarotASGIApp(controller, Mock(), RateLimiter(rate=0.01, burst=1))
+        
+        status, headers, _ = call_asgi(app, '/draw_cards')
+        assert status == 200
+        assert headers[b'cache-control'] == b'no-store'
+        assert headers[b'x-request-id']
+        
+        status, headers, body = call_asgi(app, '/draw_cards')
+        assert status == 429
+        assert int(headers[b'retry-after']) > 0
+        assert 'error' in json.loads(body)
+        controller.adraw_cards.assert_awaited_once()
+    
+    @patch('app.Config.validate')
+    @patch('asgi.Config.validate')
+    def test_other_routes_delegate_to_flask(self, mock_asgi_validate, mock_validate):
+        """Test that non-async routes are served by the Flask app."""
+        with patch('asgi.TarotController', return_value=self.make_controller()):
+            app = create_asgi_app()
+        
+        status, _, body = call_asgi(app, '/')
+        
+        assert status == 200
+        assert b'Mystical Tarot Predictions' in body
+        assert call_asgi(app, '/draw_cards', method='POST')[0] == 405
+    
+    def test_lifespan_closes_async_client(self):
+        """Test that shutdown closes the async inference client."""
+        controller = self.make_controller()
+        app = TarotASGIApp(controller, Mock())
+        events = iter([{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+        sent = []
+        
+        async def receive():
+            return next(events)
+        
+        async def send(message):
+            sent.append(message['type'])
+        
+        asyncio.run(app({'type': 'lifespan'}, receive, send))
+        
+        assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+        controller.ai_service.aclose.assert_awaited_once()
+
+
+class TestAsyncControllerPath:
+    """Test cases for the async controller and service methods."""
+    
+    @patch('controllers.tarot_controller.AIProphecyService')
+    @patch('controllers.tarot_controller.CardService')
+    def test_adraw_cards_success(self, mock_card_service_class, mock_ai_service_class):
+        """Test the async draw returns cards and prophecy."""
+        cards = [TarotCard(image_path="/static/cards/the_sun.jpg", name="The Sun", meaning="Joy", key="the_sun")]
+        mock_card_service_class.return_value.draw_cards.return_value = cards
+        mock_ai_service_class.return_value.agenerate_prophecy = AsyncMock(return_value="Async prophecy")
+        
+        response_data, status_code = asyncio.run(TarotController().adraw_cards())
+        
+        assert status_code == 200
+        assert response_data['prophecy'] == "Async prophecy"
+        assert response_data['cards'][0]['name'] == "The Sun"
+    
+    @patch('controllers.tarot_controller.AIProphecyService')
+    @patch('controllers.tarot_controller.CardService')
+    def test_adraw_cards_fallback_keeps_cards(self, mock_card_service_class, mock_ai_service_class):
+        """Test the async fallback reuses the drawn cards."""
+        mock_card_service = mock_card_service_class.return_value
+        mock_card_service.draw_cards.return_value = []
+        mock_ai_service_class.return_value.agenerate_prophecy = AsyncMock(side_effect=AIProphecyError("down"))
+        
+        with patch('controllers.tarot_controller.Config.PROPHECY_FALLBACK', 'static'):
+            response_data, status_code = asyncio.run(TarotController().adraw_cards())
+        
+        assert status_code == 200
+        assert response_data['prophecy'] == "The oracle is silent... (AI error)"
+        mock_card_service.draw_cards.assert_called_once_with(3)
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.PROPHECY_CACHE_VARIANTS', 1)
+    def test_agenerate_prophecy_uses_async_client_and_cache(self):
+        """Test async generation awaits the async client and fills the cache."""
+        mock_response = Mock()
+        mock_response.choices = [Mock()]
+        mock_response.choices[0].message = {"content": " Async prophecy "}
+        mock_async_client = Mock()
+        mock_async_client.chat_completion = AsyncMock(return_value=mock_response)
+        
+        with patch('services.prophecy_backends.InferenceClient'), \
+                patch('services.prophecy_backends.AsyncInferenceClient', return_value=mock_async_client):
+            service = AIProphecyService()
+            
+            first = asyncio.run(service.agenerate_prophecy(["The Sun: Joy"], cache_key="the_sun"))
+            second = asyncio.run(service.agenerate_prophecy(["The Sun: Joy"], cache_key="the_sun"))
+            
+            assert first == second == "Async prophecy"
+            mock_async_client.chat_completion.assert_awaited_once()
\ No newline at end of file
@@ -0,0 +1,174 @@
+import json
+import os
+import pytest
+from unittest.mock import Mock, patch
+from services import asset_pipeline
+from services.asset_pipeline import build_assets, build_sprite, content_hash, load_manifest, load_sprite
+
+Image = pytest.importorskip('PIL.Image')
+
+
+@pytest.fixture
+def source_dir(tmp_path):
+    """Folder with two small card images."""
+    cards_dir = tmp_path / 'cards'
+    cards_dir.mkdir()
+    for name, color in (('the_sun.jpg', 'yellow'), ('the_moon.jpg', 'navy')):
+        Image.new('RGB', (300, 500), color).save(cards_dir / name, 'JPEG')
+    (cards_dir / 'notes.txt').write_text('not a card')
+    return str(cards_dir)
+
+
+class TestAssetPipeline:
+    """Test cases for the image asset pipeline."""
+    
+    def test_build_assets(self, source_dir, tmp_path):
+        """Test that hashed originals and resized variants are built and listed in the manifest."""
+        output_dir = str(tmp_path / 'build')
+        manifest = build_assets(source_dir, output_dir, widths=[150, 600], formats=['webp'])
+        
+        assert set(manifest) == {'the_sun.jpg', 'the_moon.jpg'}
+        digest = content_hash(os.path.join(source_dir, 'the_sun.jpg'))
+        entry = manifest['the_sun.jpg']
+        assert entry['src'] == f'/assets/cards/the_sun.{digest}.jpg'
+        assert entry['sources'] == [{
+            'type': 'image/webp',
+            'srcset': f'/assets/cards/the_sun.{digest}.150w.webp 150w, /assets/cards/the_sun.{digest}.300w.webp 300w',
+        }]
+        with Image.open(os.path.join(output_dir, 'cards', f'the_sun.{digest}.150w.webp')) as image:
+            assert image.size == (150, 250)
+        assert load_manifest(output_dir) == manifest
+    
+    def test_build_assets_skips_existing_files(self, source_dir, tmp_path):
+        """Test that a second build reuses files whose hashed names already exist."""
+        output_dir = str(tmp_path / 'build')
+        build_assets(source_dir, output_dir, widths=[150], formats=['webp'])
+        built = os.path.join(output_dir, 'cards')
+        mtimes = {name: os.stat(os.path.join(built, name)).st_mtime_ns for name in os.listdir(built)}
+        
+        with patch.object(asset_pipeline.shutil, 'copyfile') as mock_copy:
+            build_assets(source_dir, output_dir, widths=[150], formats=['webp'])
+        
+        mock_copy.assert_not_called()
+        assert {name: os.stat(os.path.join(built, name)).st_mtime_ns for name in os.listdir(built)} == mtimes
+    
+    def test_interrupted_build_leaves_no_partial_file(self, source_dir, tmp_path):
+        """Test that a variant interrupted mid-write is never left under its final name."""
+        output_dir = str(tmp_path / 'build')
+        
+        def partial_save(image, path, *args, **kwargs):
+            with open(path, 'wb') as f:
+                f.write(b'RIFF')
+            raise KeyboardInterrupt
+        
+        with patch.object(Image.Image, 'save', partial_save), pytest.raises(KeyboardInterrupt):
+            build_assets(source_dir, output_dir, widths=[150], formats=['webp'])
+        
+        built = os.listdir(os.path.join(output_dir, 'cards'))
+        assert built and all(name.endswith('.jpg') for name in built)
+        manifest = build_assets(source_dir, output_dir, widths=[150], formats=['webp'])
+        url = manifest['the_moon.jpg']['sources'][0]['srcset'].split()[0]
+        with Image.open(os.path.join(output_dir, url[len('/assets/'):])) as image:
+            assert image.size == (150, 250)
+    
+    def test_build_assets_without_pillow(self, source_dir, tmp_path):
+        """Test that only hashed originals are built when Pillow is missing."""
+        output_dir = str(tmp_path / 'build')
+        with patch.object(asset_pipeline, 'Image', None):
+            manifest = build_assets(source_dir, output_dir, widths=[150], formats=['webp'])
+        
+        assert manifest['the_moon.jpg']['sources'] == []
+        assert all(name.endswith('.jpg') for name in os.listdir(os.path.join(output_dir, 'cards')))
+    
+    def test_load_manifest_missing_or_invalid(self, tmp_path):
+        """Test that a missing or corrupt manifest is treated as empty."""
+        assert load_manifest(str(tmp_path)) == {}
+        
+        (tmp_path / 'manifest.json').write_text('{not json')
+        assert load_manifest(str(tmp_path)) == {}
+    
+    def test_card_service_uses_manifest(self, source_dir, tmp_path):
+        """Test that cards get hashed URLs and srcset data once assets are built."""
+        from services.card_service import CardService
+        
+        output_dir = str(tmp_path / 'build')
+        manifest = build_assets(source_dir, output_dir, widths=[150], formats=['avif', 'webp'])
+        
+        with patch('config.Config.CARDS_FOLDER', source_dir), \
+             patch('config.Config.ASSET_BUILD_FOLDER', output_dir):
+            card = next(card for card in CardService().get_deck() if card.key == 'the_sun')
+        
+        assert card.image_path == manifest['the_sun.jpg']['src']
+        assert [mime_type for mime_type, _ in card.sources] == ['image/avif', 'image/webp']
+    
+    def test_build_sprite(self, source_dir, tmp_path):
+        """Test that all cards are packed into one hashed sheet with their offsets."""
+        output_dir = str(tmp_path / 'build')
+        sprite = build_sprite(source_dir, output_dir, tile_width=60, fmt='webp')
+        
+        assert sprite['tile_width'] == 60 and sprite['tile_height'] == 100
+        assert (sprite['width'], sprite['height']) == (120, 100)
+        assert sprite['cards'] == {'the_moon.jpg': {'x': 0, 'y': 0}, 'the_sun.jpg': {'x': 60, 'y': 0}}
+        assert sprite['type'] == 'image/webp'
+        assert sprite['url'].startswith('/assets/sprite.') and sprite['url'].endswith('.webp')
+        with Image.open(os.path.join(output_dir, sprite['url'].rsplit('/', 1)[1])) as sheet:
+            assert sheet.size == (120, 100)
+            assert sheet.convert('RGB').getpixel((90, 50))[2] < 100  # yellow sun tile on the right
+        assert load_sprite(output_dir) == sprite
+    
+    def test_build_sprite_without_pillow(self, source_dir, tmp_path):
+        """Test that no sprite sheet is built when Pillow is missing."""
+        with patch.object(asset_pipeline, 'Image', None):
+            assert build_sprite(source_dir, str(tmp_path / 'build')) is None
+        assert load_sprite(str(tmp_path / 'build')) is None
+    
+    def test_card_service_sprite_delivery(self, source_dir, tmp_path):
+        """Test that cards carry sprite offsets only in sprite delivery mode."""
+        from services.card_service import CardService
+        
+        output_dir = str(tmp_path / 'build')
+        build_sprite(source_dir, output_dir, tile_width=60)
+        
+        with patch('config.Config.CARDS_FOLDER', source_dir), \
+             patch('config.Config.ASSET_BUILD_FOLDER', output_dir):
+            assert all(card.sprite is None for card in CardService().get_deck())
+            with patch('config.Config.CARD_DELIVERY', 'sprite'):
+                service = CardService()
+        
+        assert service.sprite['tile_width'] == 60
+        assert {card.key: card.sprite for card in service.get_deck()} == {'the_moon': (0, 0), 'the_sun': (60, 0)}
+    
+    def test_index_preloads_sprite(self, source_dir, tmp_path):
+        """Test that the page preloads the sprite sheet in sprite delivery mode."""
+        from app import create_app
+        
+        controller = Mock()
+        controller.card_service.sprite = build_sprite(source_dir, str(tmp_path / 'build'), tile_width=60)
+        with patch('app.Config.validate'):
+            client = create_app(controller).test_client()
+        
+        assert 'rel="preload"' not in client.get('/').get_data(as_text=True)
+        with patch('app.Config.CARD_DELIVERY', 'sprite'):
+            page = client.get('/').get_data(as_text=True)
+        assert f'<link rel="preload" as="image" href="{controller.card_service.sprite["url"]}"' in page
+        assert '"tile_width": 60' in page
+    
+    def test_assets_route_is_immutable(self, app, client, tmp_path):
+        """Test that built assets are served with an immutable cache policy."""
+        os.makedirs(tmp_path / 'build' / 'cards')
+        (tmp_path / 'build' / 'cards' / 'the_sun.abc.jpg').write_bytes(b'image')
+        
+        response = client.get('/assets/cards/the_sun.abc.jpg')
+        
+        assert response.status_code == 200
+        assert response.data == b'image'
+        assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+        assert client.get('/assets/cards/missing.jpg').status_code == 404
+    
+    def test_main(self, source_dir, tmp_path):
+        """Test the command line entry point."""
+        output_dir = tmp_path / 'build'
+        asset_pipeline.main(['--source', source_dir, '--output', str(output_dir)])
+        
+        manifest = json.loads((output_dir / 'manifest.json').read_text())
+        assert set(manifest) == {'the_sun.jpg', 'the_moon.jpg'}
\ No newline at end of file
@@ -0,0 +1,141 @@
+import json
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from benchmarks.load import LoadRecorder, percentile, run_load
+from benchmarks.run import SCENARIOS, compare, gunicorn_command, gunicorn_env
+from controllers.tarot_controller import FALLBACK_PROPHECY
+from services.stub_server import StubSettings
+
+
+class ReadingHandler(BaseHTTPRequestHandler):
+    """Answers every GET with a reading, alternating real and fallback prophecies."""
+    
+    counter = 0
+    lock = threading.Lock()
+    
+    def do_GET(self):
+        with self.lock:
+            ReadingHandler.counter += 1
+            fallback = ReadingHandler.counter % 2 == 0
+        body = json.dumps({'cards': [], 'prophecy': FALLBACK_PROPHECY if fallback else "A prophecy"}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def reading_server():
+    """Local HTTP server standing in for the app."""
+    ReadingHandler.counter = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ReadingHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/draw_cards'
+    server.shutdown()
+    server.server_close()
+
+
+class TestLoad:
+    """Test cases for the load driver."""
+    
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = [float(i) for i in range(1, 101)]
+        
+        assert percentile(values, 50) == 50.0
+        assert percentile(values, 99) == 99.0
+        assert percentile(values, 100) == 100.0
+        assert percentile([3.0], 95) == 3.0
+        assert percentile([], 50) is None
+    
+    def test_recorder_summary(self):
+        """Test that only successful requests count towards latency percentiles."""
+        recorder = LoadRecorder()
+        recorder.record(0.1, '200')
+        recorder.record(0.3, '200', fallback=True)
+        recorder.record(5.0, '500')
+        
+        summary = recorder.summary(elapsed=2.0)
+        
+        assert summary['requests'] == 3
+        assert summary['errors'] == 1
+        assert summary['fallbacks'] == 1
+        assert summary['statuses'] == {'200': 2, '500': 1}
+        assert summary['throughput_rps'] == 1.5
+        assert summary['latency_ms']['p50'] == 100.0
+        assert summary['latency_ms']['max'] == 300.0
+    
+    def test_run_load(self, reading_server):
+        """Test closed-loop load with a fixed request count."""
+        summary = run_load(reading_server, concurrency=3, total_requests=10)
+        
+        assert summary['requests'] == 10
+        assert summary['ok'] == 10
+        assert summary['fallbacks'] == 5
+        assert summary['latency_ms']['p99'] is not None
+    
+    def test_run_load_requires_a_limit(self, reading_server):
+        """Test that unbounded runs are rejected."""
+        with pytest.raises(ValueError):
+            run_load(reading_server, concurrency=1)
+
+
+class TestBenchmarkRun:
+    """Test cases for the benchmark runner."""
+    
+    def test_scenarios(self):
+        """Test the built-in scenarios."""
+        assert set(SCENARIOS) == {'cold_cache', 'warm_cache', 'backend_outage'}
+        assert SCENARIOS['warm_cache'].prewarm
+        assert '--error-rate' in SCENARIOS['backend_outage'].stub_args()
+    
+    def test_app_started_with_deployed_config(self):
+        """Test that the app under test uses gunicorn_conf.py and is sized through its environment."""
+        command = gunicorn_command(8000)
+        
+        assert command[command.index('-c') + 1] == 'gunicorn_conf.py'
+        assert '--workers' not in command
+        assert gunicorn_env(2, None) == {'WEB_CONCURRENCY': '2'}
+        assert gunicorn_env(1, 8) == {'WEB_CONCURRENCY': '1', 'GUNICORN_MAX_THREADS': '8'}
+    
+    def test_compare(self):
+        """Test the regression report against a baseline."""
+        def run(throughput, p95):
+            return {'scenarios': {'warm_cache': {
+                'throughput_rps': throughput, 'latency_ms': {'p50': 10.0, 'p95': p95, 'p99': None},
+            }}}
+        
+        lines = compare(run(150.0, 30.0), run(100.0, 20.0))
+        
+        assert lines == ["warm_cache: throughput 100.0 -> 150.0 (+50.0%), p50 10.0 -> 10.0 (+0.0%), "
+                         "p95 20.0 -> 30.0 (+50.0%), p99 None -> None"]
+        assert compare(run(1.0, 1.0), {'scenarios': {}}) == []
+
+
+class TestStubLatencyDistributions:
+    """Test cases for the stub server latency distributions."""
+    
+    @pytest.mark.parametrize('distribution', ['uniform', 'normal', 'lognormal', 'exponential'])
+    def test_mean_latency(self, distribution):
+        """Test that each distribution is centred on the configured mean."""
+        settings = StubSettings(latency=0.5, jitter=0.2, distribution=distribution)
+        samples = [settings.sample_latency() for _ in range(4000)]
+        
+        assert all(sample >= 0 for sample in samples)
+        assert sum(samples) / len(samples) == pytest.approx(0.5, rel=0.1)
+    
+    def test_fixed_and_zero_latency(self):
+        """Test deterministic latencies."""
+        assert StubSettings(latency=0.3, jitter=0.2, distribution='fixed').sample_latency() == 0.3
+        assert StubSettings(latency=0.0, jitter=0.2, distribution='lognormal').sample_latency() == 0.0
+    
+    def test_unknown_distribution(self):
+        """Test that unknown distributions are rejected."""
+        with pytest.raises(ValueError):
+            StubSettings(distribution='pareto')
\ No newline at end of file
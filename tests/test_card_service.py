@@ -1,5 +1,7 @@
+import json
 import pytest
 import os
+import random
 import tempfile
 from unittest.mock import patch, Mock
 from services.card_service import CardService
@@ -51,17 +53,16 @@ class TestCardService:
         mock_listdir.return_value = ['the_magician.jpg', 'the_empress.jpg', 'the_emperor.jpg']
         
         with patch('config.Config.CARDS_FOLDER', '/test/cards'):
-            with patch('random.sample') as mock_sample:
-                mock_sample.return_value = ['the_magician.jpg', 'the_empress.jpg', 'the_emperor.jpg']
-                
-                service = CardService()
-                cards = service.draw_cards(3)
-                
-                assert len(cards) == 3
-                assert all(isinstance(card, TarotCard) for card in cards)
-                assert cards[0].name == "The Magician"
-                assert cards[1].name == "The Empress"
-                assert cards[2].name == "The Emperor"
+            rng = Mock()
+            rng.sample.side_effect = lambda deck, count: list(deck[:count])
+            service = CardService()
+            cards = service.draw_cards(3, rng=rng)
+            
+            assert len(cards) == 3
+            assert all(isinstance(card, TarotCard) for card in cards)
+            assert cards[0].name == "The Magician"
+            assert cards[1].name == "The Empress"
+            assert cards[2].name == "The Emperor"
     
     @patch('os.path.exists')
     @patch('os.listdir')
@@ -132,11 +133,122 @@ class TestCardService:
         mock_listdir.return_value = ['card1.jpg', 'card2.jpg', 'card3.jpg', 'card4.jpg', 'card5.jpg']
         
         with patch('config.Config.CARDS_FOLDER', '/test/cards'):
-            with patch('random.sample') as mock_sample:
-                mock_sample.return_value = ['card1.jpg', 'card2.jpg', 'card3.jpg']
-                
+            with patch('services.card_service.random.Random') as mock_random:
+                mock_sample = mock_random.return_value.sample
+                mock_sample.side_effect = lambda deck, count: list(deck[:count])
                 service = CardService()
                 cards = service.draw_cards()  # Default count
                 
                 assert len(cards) == 3
-                mock_sample.assert_called_once_with(['card1.jpg', 'card2.jpg', 'card3.jpg', 'card4.jpg', 'card5.jpg'], 3) 
\ No newline at end of file
+                mock_sample.assert_called_once_with(service.get_deck(), 3)
+                assert [card.key for card in service.get_deck()] == ['card1', 'card2', 'card3', 'card4', 'card5']
+    
+    @patch('os.path.exists')
+    @patch('os.listdir')
+    def test_draw_cards_uses_deck_index(self, mock_listdir, mock_exists):
+        """Test that drawing cards does not touch the filesystem after startup."""
+        mock_exists.return_value = True
+        mock_listdir.return_value = ['the_magician.jpg', 'the_empress.jpg', 'the_emperor.jpg']
+        
+        with patch('config.Config.CARDS_FOLDER', '/test/cards'):
+            service = CardService()
+            first = service.draw_cards(3)
+            second = service.draw_cards(3)
+            
+            assert mock_listdir.call_count == 1
+            assert mock_exists.call_count == 1
+            assert {card.key for card in first} == {card.key for card in second}
+            assert all(card in service.get_deck() for card in first)
+    
+    def test_deck_cards_are_immutable(self):
+        """Test that indexed cards cannot be modified."""
+        with tempfile.TemporaryDirectory() as cards_dir:
+            open(os.path.join(cards_dir, 'the_magician.jpg'), 'w').close()
+            
+            with patch('config.Config.CARDS_FOLDER', cards_dir):
+                service = CardService()
+                card = service.get_deck()[0]
+                
+                with pytest.raises(AttributeError):
+                    card.name = "Changed"
+    
+    def test_reload_picks_up_new_cards(self):
+        """Test that an explicit reload rebuilds the deck index."""
+        with tempfile.TemporaryDirectory() as cards_dir:
+            open(os.path.join(cards_dir, 'the_magician.jpg'), 'w').close()
+            
+            with patch('config.Config.CARDS_FOLDER', cards_dir):
+                service = CardService()
+                assert service.get_available_cards() == ['the_magician.jpg']
+                
+                open(os.path.join(cards_dir, 'the_empress.jpg'), 'w').close()
+                service.reload()
+                
+                assert sorted(service.get_available_cards()) == ['the_empress.jpg', 'the_magician.jpg']
+    
+    def test_stale_deck_reloaded_on_mtime_change(self):
+        """Test that the deck is rebuilt when the folder mtime changes."""
+        with tempfile.TemporaryDirectory() as cards_dir:
+            open(os.path.join(cards_dir, 'the_magician.jpg'), 'w').close()
+            
+            with patch('config.Config.CARDS_FOLDER', cards_dir), patch('config.Config.DECK_CHECK_INTERVAL', 0.001):
+                service = CardService()
+                open(os.path.join(cards_dir, 'the_empress.jpg'), 'w').close()
+                os.utime(cards_dir, (0, service._deck_mtime + 10))
+                service._last_check -= 1
+                
+                assert len(service.get_deck()) == 2 
+    
+    @patch('os.path.exists')
+    @patch('os.listdir')
+    def test_draw_spreads(self, mock_listdir, mock_exists):
+        """Test drawing several spreads in one pass over the deck index."""
+        mock_exists.return_value = True
+        mock_listdir.return_value = ['the_magician.jpg', 'the_empress.jpg', 'the_emperor.jpg']
+        
+        with patch('config.Config.CARDS_FOLDER', '/test/cards'):
+            service = CardService()
+            spreads = service.draw_spreads(4, 2)
+            
+            assert len(spreads) == 4
+            assert all(len(spread) == 2 and len(set(spread)) == 2 for spread in spreads)
+            assert mock_listdir.call_count == 1
+            
+            with pytest.raises(InsufficientCardsError, match="Need 4, have 3"):
+                service.draw_spreads(2, 4)
+    
+    @patch('os.path.exists')
+    @patch('os.listdir')
+    def test_card_json_is_precomputed(self, mock_listdir, mock_exists):
+        """Test that each card's JSON fragment is serialized once at deck load."""
+        mock_exists.return_value = True
+        mock_listdir.return_value = ['the_magician.jpg']
+        
+        with patch('config.Config.CARDS_FOLDER', '/test/cards'):
+            service = CardService()
+        card = service.get_deck()[0]
+        
+        with patch('utils.json_codec.dumps') as mock_dumps:
+            fragment = service.card_json(card)
+        
+        mock_dumps.assert_not_called()
+        assert json.loads(fragment) == card.to_dict()
+        assert service.card_json(card) is fragment
+    
+    @patch('os.path.exists')
+    @patch('os.listdir')
+    def test_draw_cards_uses_per_request_rng(self, mock_listdir, mock_exists):
+        """Test that draws use their own generator instead of the shared random state."""
+        mock_exists.return_value = True
+        mock_listdir.return_value = ['card1.jpg', 'card2.jpg', 'card3.jpg', 'card4.jpg', 'card5.jpg']
+        
+        with patch('config.Config.CARDS_FOLDER', '/test/cards'):
+            service = CardService()
+            random_state = random.getstate()
+            
+            first = service.draw_cards(3, rng=random.Random(7))
+            second = service.draw_cards(3, rng=random.Random(7))
+            service.draw_spreads(2)
+            
+            assert first == second
+            assert random.getstate() == random_state
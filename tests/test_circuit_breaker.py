@@ -0,0 +1,191 @@
+import pytest
+from unittest.mock import patch, Mock
+from services.circuit_breaker import CircuitBreaker
+from services.ai_service import AIProphecyService
+from exceptions import AIProphecyError, CircuitOpenError
+
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker:
+    """Test cases for CircuitBreaker."""
+    
+    def make_breaker(self, clock, **kwargs):
+        """Create a breaker with small test thresholds."""
+        options = {'failure_threshold': 2, 'latency_slo': 1.0, 'reset_timeout': 10.0}
+        options.update(kwargs)
+        return CircuitBreaker(clock=clock, **options)
+    
+    def test_opens_after_consecutive_failures(self):
+        """Test that the circuit opens at the failure threshold."""
+        breaker = self.make_breaker(FakeClock())
+        
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.record_failure()
+        
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.allow_request() is False
+    
+    def test_success_resets_failure_count(self):
+        """Test that failures must be consecutive."""
+        breaker = self.make_breaker(FakeClock())
+        
+        breaker.record_failure()
+        breaker.record_success(0.1)
+        breaker.record_failure()
+        
+        assert breaker.state == CircuitBreaker.CLOSED
+    
+    def test_slow_calls_count_as_failures(self):
+        """Test that latency SLO violations trip the breaker."""
+        breaker = self.make_breaker(FakeClock())
+        
+        breaker.record_success(2.0)
+        breaker.record_success(3.0)
+        
+        assert breaker.state == CircuitBreaker.OPEN
+    
+    def test_half_open_trial_closes_circuit(self):
+        """Test that a successful trial call closes the circuit."""
+        clock = FakeClock()
+        breaker = self.make_breaker(clock, failure_threshold=1)
+        breaker.record_failure()
+        
+        clock.now = 10.0
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow_request() is True
+        assert breaker.allow_request() is False  # only one trial at a time
+        breaker.record_success(0.1)
+        
+        assert breaker.state == CircuitBreaker.CLOSED
+    
+    def test_half_open_failure_reopens_circuit(self):
+        """Test that a failed trial call reopens the circuit."""
+        clock = FakeClock()
+        breaker = self.make_breaker(clock, failure_threshold=3)
+        for _ in range(3):
+            breaker.record_failure()
+        
+        clock.now = 10.0
+        assert breaker.allow_request() is True
+        breaker.record_failure()
+        
+        assert breaker.state == CircuitBreaker.OPEN
+        clock.now = 15.0
+        assert breaker.allow_request() is False
+    
+    def test_abandoned_trial_reopens_circuit(self):
+        """Test that a trial ending without an outcome counts as failed, but abandoned closed calls do not."""
+        clock = FakeClock()
+        breaker = self.make_breaker(clock, failure_threshold=1)
+        breaker.record_abandoned()
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.record_failure()
+        
+        clock.now = 10.0
+        assert breaker.allow_request() is True
+        breaker.record_abandoned()
+        
+        assert breaker.state == CircuitBreaker.OPEN
+        clock.now = 20.0
+        assert breaker.allow_request() is True
+    
+    def test_abandoned_call_after_close_keeps_circuit_closed(self):
+        """Test that an abandoned call reported after a trial closed the circuit does not reopen it."""
+        clock = FakeClock()
+        breaker = self.make_breaker(clock, failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_failure()
+        
+        clock.now = 10.0
+        assert breaker.allow_request() is True
+        breaker.record_success()
+        breaker.record_abandoned()
+        
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.CLOSED
+    
+    def test_lost_trial_expires(self):
+        """Test that a trial that never reports back frees its slot after the reset timeout."""
+        clock = FakeClock()
+        breaker = self.make_breaker(clock, failure_threshold=1)
+        breaker.record_failure()
+        
+        clock.now = 10.0
+        assert breaker.allow_request() is True
+        clock.now = 15.0
+        assert breaker.allow_request() is False
+        clock.now = 20.0
+        assert breaker.allow_request() is True
+    
+    def test_call_fails_fast_when_open(self):
+        """Test that call raises without invoking the function while open."""
+        breaker = self.make_breaker(FakeClock(), failure_threshold=1)
+        fn = Mock(side_effect=ValueError("down"))
+        
+        with pytest.raises(ValueError):
+            breaker.call(fn)
+        with pytest.raises(CircuitOpenError):
+            breaker.call(fn)
+        
+        fn.assert_called_once()
+    
+    def test_call_returns_result(self):
+        """Test that call passes results through."""
+        breaker = self.make_breaker(FakeClock())
+        
+        assert breaker.call(lambda: "ok") == "ok"
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.CIRCUIT_FAILURE_THRESHOLD', 2)
+    @patch('config.Config.AI_MAX_RETRIES', 0)
+    def test_ai_service_short_circuits_after_failures(self):
+        """Test that the AI service stops calling a failing backend."""
+        mock_client = Mock()
+        mock_client.chat_completion.side_effect = Exception("API Error")
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
+            service = AIProphecyService()
+            
+            for _ in range(2):
+                with pytest.raises(AIProphecyError, match="API Error"):
+                    service.generate_prophecy(["The Sun: Joy"])
+            with pytest.raises(CircuitOpenError):
+                service.generate_prophecy(["The Sun: Joy"])
+            
+            assert mock_client.chat_completion.call_count == 2
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    def test_closed_stream_releases_trial(self):
+        """Test that a stream closed by the client during a half-open trial does not wedge the circuit."""
+        chunk = Mock()
+        chunk.choices = [Mock()]
+        chunk.choices[0].delta.content = "The "
+        mock_client = Mock()
+        mock_client.chat_completion.side_effect = lambda *args, **kwargs: iter([chunk, chunk])
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
+            clock = FakeClock()
+            service = AIProphecyService()
+            service.circuit_breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10.0, clock=clock)
+            service.circuit_breaker.record_failure()
+            
+            clock.now = 10.0
+            stream = service.stream_prophecy(["The Sun: Joy"])
+            assert next(stream) == "The "
+            stream.close()
+            
+            assert service.circuit_breaker.state == CircuitBreaker.OPEN
+            clock.now = 20.0
+            assert list(service.stream_prophecy(["The Sun: Joy"])) == ["The ", "The "]
+            assert service.circuit_breaker.state == CircuitBreaker.CLOSED
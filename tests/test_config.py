@@ -52,6 +52,24 @@ class TestConfig:
             with pytest.raises(ConfigurationError, match="Cards folder 'static/cards' does not exist"):
                 Config.validate()
     
+    @patch('os.path.exists')
+    def test_validate_token_not_required_without_hf_backend(self, mock_exists):
+        """Test that HF_TOKEN is optional when no Hugging Face backend is configured."""
+        mock_exists.return_value = True
+        
+        with patch.object(Config, 'HF_TOKEN', None), \
+                patch.object(Config, 'AI_BACKENDS', 'local=http://localhost:8080/v1'):
+            Config.validate()
+            assert Config.uses_huggingface() is False
+    
+    @patch('os.path.exists')
+    def test_validate_token_not_required_in_local_mode(self, mock_exists):
+        """Test that HF_TOKEN is optional when prophecies are composed locally."""
+        mock_exists.return_value = True
+        
+        with patch.object(Config, 'HF_TOKEN', None), patch.object(Config, 'PROPHECY_MODE', 'local'):
+            Config.validate()
+    
     def test_config_class_attributes(self):
         """Test that all required config attributes exist."""
         required_attrs = ['HF_TOKEN', 'CARDS_FOLDER', 'DEBUG']
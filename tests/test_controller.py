@@ -1,8 +1,11 @@
+import itertools
+import json
 import pytest
 from unittest.mock import patch, Mock
-from controllers.tarot_controller import TarotController
+from controllers.tarot_controller import FALLBACK_PROPHECY, TarotController
 from models import TarotCard
-from exceptions import InsufficientCardsError, AIProphecyError, TarotServiceError
+from exceptions import InsufficientCardsError, AIProphecyError, TarotServiceError, InvalidRequestError
+from utils.deadline import Deadline
 
 
 class TestTarotController:
@@ -73,6 +76,7 @@ class TestTarotController:
         # Verify service calls
         mock_card_service.draw_cards.assert_called_once_with(3)
         mock_ai_service.generate_prophecy.assert_called_once()
+        assert isinstance(mock_ai_service.generate_prophecy.call_args[1]['deadline'], Deadline)
     
     @patch('controllers.tarot_controller.AIProphecyService')
     @patch('controllers.tarot_controller.CardService')
@@ -127,17 +131,24 @@ class TestTarotController:
         mock_ai_service.generate_prophecy.side_effect = AIProphecyError("AI failed")
         
         controller = TarotController()
-        response_data, status_code = controller.draw_cards()
+        with patch.object(controller.local_prophecy, 'generate', return_value="Local prophecy") as mock_local:
+            response_data, status_code = controller.draw_cards()
         
-        # Should return 200 with fallback prophecy
+        # Should return 200 with a prophecy composed locally from the same cards
         assert status_code == 200
         assert 'cards' in response_data
         assert 'prophecy' in response_data
-        assert response_data['prophecy'] == "The oracle is silent... (AI error)"
+        assert response_data['prophecy'] == "Local prophecy"
+        mock_local.assert_called_once_with([
+            "The Magician: Creator, leader, initiative, fulfillment of hopes, great potential.",
+            "The Empress: Mother, protector, birth of the new, joy of life.",
+            "The Emperor: Father, power, responsibility, structure, order.",
+        ])
         assert len(response_data['cards']) == 3
         
-        # Should have called draw_cards twice (once for initial attempt, once for fallback)
-        assert mock_card_service.draw_cards.call_count == 2
+        # Should reuse the original draw instead of drawing again
+        assert mock_card_service.draw_cards.call_count == 1
+        assert [card['name'] for card in response_data['cards']] == ["The Magician", "The Empress", "The Emperor"]
     
     @patch('controllers.tarot_controller.AIProphecyService')
     @patch('controllers.tarot_controller.CardService')
@@ -185,6 +196,41 @@ class TestTarotController:
         assert card_dict['image'] == "/static/cards/test.jpg"
         assert card_dict['name'] == "Test Card"
         assert card_dict['meaning'] == "Test meaning"
+        assert card_dict['sources'] == []
+    
+    def test_card_to_dict_with_sources(self):
+        """Test that built image variants are exposed as srcset data."""
+        controller = TarotController()
+        
+        card = TarotCard(
+            image_path="/assets/cards/test.abc123.jpg",
+            name="Test Card",
+            meaning="Test meaning",
+            key="test_card",
+            sources=(("image/webp", "/assets/cards/test.abc123.160w.webp 160w"),)
+        )
+        
+        card_dict = controller._card_to_dict(card)
+        
+        assert card_dict['image'] == "/assets/cards/test.abc123.jpg"
+        assert card_dict['sources'] == [
+            {'type': 'image/webp', 'srcset': "/assets/cards/test.abc123.160w.webp 160w"}
+        ]
+        assert 'sprite' not in card_dict
+    
+    def test_card_to_dict_with_sprite(self):
+        """Test that sprite offsets are included in sprite delivery mode."""
+        controller = TarotController()
+        
+        card = TarotCard(
+            image_path="/static/cards/test.jpg",
+            name="Test Card",
+            meaning="Test meaning",
+            key="test_card",
+            sprite=(200, 331)
+        )
+        
+        assert controller._card_to_dict(card)['sprite'] == {'x': 200, 'y': 331}
     
     @patch('controllers.tarot_controller.AIProphecyService')
     @patch('controllers.tarot_controller.CardService')
@@ -205,4 +251,186 @@ class TestTarotController:
         assert 'cards' in response_data
         assert 'prophecy' in response_data
         assert len(response_data['cards']) == 0
-        assert response_data['prophecy'] == "Empty prophecy" 
\ No newline at end of file
+        assert response_data['prophecy'] == "Empty prophecy" 
+    
+    @patch('controllers.tarot_controller.AIProphecyService')
+    @patch('controllers.tarot_controller.CardService')
+    def test_stream_reading_success(self, mock_card_service_class, mock_ai_service_class):
+        """Test streaming a reading as Server-Sent Events."""
+        mock_card_service = mock_card_service_class.return_value
+        mock_ai_service = mock_ai_service_class.return_value
+        mock_card_service.draw_cards.return_value = [
+            TarotCard(image_path="/static/cards/the_sun.jpg", name="The Sun", meaning="Joy", key="the_sun")
+        ]
+        mock_ai_service.stream_prophecy.return_value = iter(["Bright ", "days."])
+        
+        controller = TarotController()
+        events = list(controller.stream_reading())
+        
+        assert events[0].startswith("event: cards\n")
+        assert json.loads(events[0].split("data: ", 1)[1])['cards'][0]['name'] == "The Sun"
+        assert events[1] == 'event: token\ndata: "Bright "\n\n'
+        assert events[2] == 'event: token\ndata: "days."\n\n'
+        assert events[3] == 'event: done\ndata: {"prophecy": "Bright days."}\n\n'
+        assert mock_ai_service.stream_prophecy.call_args[1]['cache_key'] == "the_sun"
+    
+    @patch('controllers.tarot_controller.AIProphecyService')
+    @patch('controllers.tarot_controller.CardService')
+    def test_stream_reading_ai_error(self, mock_card_service_class, mock_ai_service_class):
+        """Test that a failing stream ends with the fallback prophecy."""
+        mock_card_service = mock_card_service_class.return_value
+        mock_ai_service = mock_ai_service_class.return_value
+        mock_card_service.draw_cards.return_value = []
+        mock_ai_service.stream_prophecy.side_effect = AIProphecyError("AI failed")
+        
+        controller = TarotController()
+        with patch('controllers.tarot_controller.Config.PROPHECY_FALLBACK', 'static'):
+            events = list(controller.stream_reading())
+        
+        assert events[-1] == 'event: done\ndata: {"prophecy": "The oracle is silent... (AI error)"}\n\n'
+    
+    @patch('controllers.tarot_controller.AIProphecyService')
+    @patch('controllers.tarot_controller.CardService')
+    def test_stream_reading_card_error(self, mock_card_service_class, mock_ai_service_class):
+        """Test that card drawing errors produce a single error event."""
+        mock_card_service_class.return_value.draw_cards.side_effect = InsufficientCardsError("Not enough cards")
+        
+        controller = TarotController()
+        events = list(controller.stream_reading())
+        
+        assert events == ['event: error\ndata: {"error": "Not enough cards"}\n\n']
+    
+    @patch('controllers.tarot_controller.AIProphecyService')
+    @patch('controllers.tarot_controller.CardService')
+    def test_parse_batch_request(self, mock_card_service_class, mock_ai_service_class):
+        """Test validation of batch request bodies."""
+        controller = TarotController()
+        
+        assert controller.parse_batch_request({'count': 5}) == (5, 3)
+        assert controller.parse_batch_request({'count': 2, 'spread_size': 1}) == (2, 1)
+        for payload in (None, [], {}, {'count': 0}, {'count': '3'}, {'count': True}, {'count': 2, 'spread_size': 0}):
+            with pytest.raises(InvalidRequestError):
+                controller.parse_batch_request(payload)
+        with patch('controllers.tarot_controller.Config.BATCH_MAX_COUNT', 10):
+            with pytest.raises(InvalidRequestError, match="must not exceed 10"):
+                controller.parse_batch_request({'count': 11})
+    
+    @patch('controllers.tarot_controller.AIProphecyService')
+    @patch('controllers.tarot_controller.CardService')
+    def test_stream_batch(self, mock_card_service_class, mock_ai_service_class):
+        """Test that a batch yields one NDJSON line per spread with the fallback on AI errors."""
+        sun = TarotCard(image_path="/static/cards/the_sun.jpg", name="The Sun", meaning="Joy", key="the_sun")
+        moon = TarotCard(image_path="/static/cards/the_moon.jpg", name="The Moon", meaning="Dreams", key="the_moon")
+        mock_card_service_class.return_value.draw_spreads.return_value = [[sun], [moon], [sun, moon]]
+        
+        def generate(card_infos, cache_key=None, deadline=None):
+            if cache_key == "the_moon":
+                raise AIProphecyError("AI failed")
+            return f"Prophecy for {cache_key}"
+        mock_ai_service_class.return_value.generate_prophecy.side_effect = generate
+        
+        controller = TarotController()
+        with patch('controllers.tarot_controller.Config.BATCH_CONCURRENCY', 2):
+            lines = list(controller.stream_batch(3, 1))
+        
+        assert all(line.endswith("\n") for line in lines)
+        readings = sorted((json.loads(line) for line in lines), key=lambda reading: reading['index'])
+        assert [reading['index'] for reading in readings] == [0, 1, 2]
+        assert readings[0]['prophecy'] == "Prophecy for the_sun"
+        # The failed spread gets a prophecy composed from its own card
+        assert readings[1]['prophecy'] != FALLBACK_PROPHECY
+        assert "dreams" in readings[1]['prophecy']
+        assert readings[2]['prophecy'] == "Prophecy for the_moon|the_sun"
+        assert [card['name'] for card in readings[2]['cards']] == ["The Sun", "The Moon"]
+        mock_card_service_class.return_value.draw_spreads.assert_called_once_with(3, 1)
+    
+    @patch('controllers.tarot_controller.AIProphecyService')
+    @patch('controllers.tarot_controller.CardService')
+    def test_stream_batch_unexpected_error(self, mock_card_service_class, mock_ai_service_class):
+        """Test that a reading failing with an unexpected error gets an error line and the batch continues."""
+        sun = TarotCard(image_path="/static/cards/the_sun.jpg", name="The Sun", meaning="Joy", key="the_sun")
+        moon = TarotCard(image_path="/static/cards/the_moon.jpg", name="The Moon", meaning="Dreams", key="the_moon")
+        mock_card_service_class.return_value.draw_spreads.return_value = [[sun], [moon], [sun]]
+        
+        def generate(card_infos, cache_key=None, deadline=None):
+            if cache_key == "the_moon":
+                raise KeyError("choices")
+            return f"Prophecy for {cache_key}"
+        mock_ai_service_class.return_value.generate_prophecy.side_effect = generate
+        
+        controller = TarotController()
+        with patch('controllers.tarot_controller.Config.BATCH_CONCURRENCY', 1):
+            readings = [json.loads(line) for line in controller.stream_batch(3, 1)]
+        
+        assert [reading['index'] for reading in readings] == [0, 1, 2]
+        assert readings[1] == {'index': 1, 'error': "Unexpected error: 'choices'"}
+        assert readings[2]['prophecy'] == "Prophecy for the_sun"
+    
+    @patch('controllers.tarot_controller.AIProphecyService')
+    @patch('controllers.tarot_controller.CardService')
+    def test_stream_batch_without_concurrency(self, mock_card_service_class, mock_ai_service_class):
+        """Test that a BATCH_CONCURRENCY below 1 still generates one reading at a time."""
+        sun = TarotCard(image_path="/static/cards/the_sun.jpg", name="The Sun", meaning="Joy", key="the_sun")
+        mock_card_service_class.return_value.draw_spreads.return_value = [[sun], [sun]]
+        mock_ai_service_class.return_value.generate_prophecy.return_value = "Prophecy"
+        
+        controller = TarotController()
+        with patch('controllers.tarot_controller.Config.BATCH_CONCURRENCY', 0):
+            lines = list(itertools.islice(controller.stream_batch(2, 1), 3))
+        
+        assert sorted(json.loads(line)['index'] for line in lines) == [0, 1]
+    
+    @patch('controllers.tarot_controller.AIProphecyService')
+    @patch('controllers.tarot_controller.CardService')
+    def test_stream_batch_card_error(self, mock_card_service_class, mock_ai_service_class):
+        """Test that card drawing errors produce a single error line."""
+        mock_card_service_class.return_value.draw_spreads.side_effect = InsufficientCardsError("Not enough cards")
+        
+        controller = TarotController()
+        
+        assert list(controller.stream_batch(2, 3)) == ['{"error": "Not enough cards"}\n']
+    
+    @patch('controllers.tarot_controller.AIProphecyService')
+    @patch('controllers.tarot_controller.CardService')
+    def test_draw_cards_json(self, mock_card_service_class, mock_ai_service_class):
+        """Test that the serialized response is assembled from precomputed card fragments."""
+        sun = TarotCard(image_path="/static/cards/the_sun.jpg", name="The Sun", meaning="Joy", key="the_sun")
+        mock_card_service = mock_card_service_class.return_value
+        mock_card_service.draw_cards.return_value = [sun, sun]
+        mock_card_service.card_json.return_value = b'{"name":"The Sun"}'
+        mock_ai_service_class.return_value.generate_prophecy.return_value = 'Bright "days"'
+        
+        body, status_code = TarotController().draw_cards_json()
+        
+        assert status_code == 200
+        assert body == b'{"cards":[{"name":"The Sun"},{"name":"The Sun"}],"prophecy":"Bright \\"days\\""}'
+        assert json.loads(body)['prophecy'] == 'Bright "days"'
+    
+    @patch('controllers.tarot_controller.AIProphecyService')
+    @patch('controllers.tarot_controller.CardService')
+    def test_draw_cards_json_errors(self, mock_card_service_class, mock_ai_service_class):
+        """Test that errors are serialized with a 500 status."""
+        mock_card_service_class.return_value.draw_cards.side_effect = InsufficientCardsError("Not enough cards")
+        
+        body, status_code = TarotController().draw_cards_json()
+        
+        assert status_code == 500
+        assert json.loads(body) == {'error': "Not enough cards"}    
+    @patch('controllers.tarot_controller.AIProphecyService')
+    @patch('controllers.tarot_controller.CardService')
+    @patch('controllers.tarot_controller.Config.PROPHECY_MODE', 'local')
+    def test_local_prophecy_mode(self, mock_card_service_class, mock_ai_service_class):
+        """Test that PROPHECY_MODE=local answers without calling the AI service."""
+        sun = TarotCard(image_path="/static/cards/the_sun.jpg", name="The Sun", meaning="Joy", key="the_sun")
+        mock_card_service_class.return_value.draw_cards.return_value = [sun]
+        controller = TarotController()
+        
+        response_data, status_code = controller.draw_cards()
+        events = list(controller.stream_reading())
+        
+        assert status_code == 200
+        assert "joy" in response_data['prophecy']
+        assert events[-1].startswith('event: done\ndata: {"prophecy": "')
+        assert controller._prophecy_or_fallback(["The Sun: Joy"], "the_sun") != FALLBACK_PROPHECY
+        mock_ai_service_class.return_value.generate_prophecy.assert_not_called()
+        mock_ai_service_class.return_value.stream_prophecy.assert_not_called()
@@ -2,6 +2,9 @@ from exceptions import (
     TarotServiceError,
     InsufficientCardsError,
     AIProphecyError,
+    CircuitOpenError,
+    DeadlineExceededError,
+    OverloadedError,
     ConfigurationError
 )
 
@@ -29,6 +32,27 @@ class TestExceptions:
         assert isinstance(error, Exception)
         assert str(error) == "AI failed"
     
+    def test_circuit_open_error_inheritance(self):
+        """Test that CircuitOpenError inherits from AIProphecyError."""
+        error = CircuitOpenError("Circuit open")
+        assert isinstance(error, AIProphecyError)
+        assert isinstance(error, TarotServiceError)
+        assert str(error) == "Circuit open"
+    
+    def test_deadline_exceeded_error_inheritance(self):
+        """Test that DeadlineExceededError inherits from AIProphecyError."""
+        error = DeadlineExceededError("Too slow")
+        assert isinstance(error, AIProphecyError)
+        assert isinstance(error, TarotServiceError)
+        assert str(error) == "Too slow"
+    
+    def test_overloaded_error_inheritance(self):
+        """Test that OverloadedError inherits from AIProphecyError."""
+        error = OverloadedError("Queue full")
+        assert isinstance(error, AIProphecyError)
+        assert isinstance(error, TarotServiceError)
+        assert str(error) == "Queue full"
+    
     def test_configuration_error_inheritance(self):
         """Test that ConfigurationError inherits from TarotServiceError."""
         error = ConfigurationError("Config invalid")
@@ -0,0 +1,83 @@
+import importlib
+from unittest.mock import patch
+import gunicorn_conf
+from config import Config
+from gunicorn_conf import size_workers
+
+
+def sized(**overrides):
+    """Sizing with defaults for a 2-CPU box and a 5 s model."""
+    settings = dict(cpu_count=2, worker_class='gthread', upstream_latency=5.0, cpu_per_request=0.02,
+                    max_workers=4, max_threads=32, max_connections=500)
+    settings.update(overrides)
+    return size_workers(**settings)
+
+
+class TestGunicornConf:
+    """Test cases for gunicorn worker sizing."""
+    
+    def test_gthread_threads_follow_latency(self):
+        """Test that threads grow with upstream latency up to the cap."""
+        assert sized(upstream_latency=0.1)['threads'] == 6
+        assert sized(upstream_latency=5.0)['threads'] == 32
+        assert sized()['workers'] == 2
+    
+    def test_workers_capped_and_overridable(self):
+        """Test that workers follow the CPU count within the cap, unless set explicitly."""
+        assert sized(cpu_count=16)['workers'] == 4
+        assert sized(cpu_count=16, workers=6)['workers'] == 6
+    
+    def test_gevent_connections(self):
+        """Test that gevent workers get a connection limit instead of threads."""
+        settings = sized(worker_class='gevent')
+        
+        assert settings['threads'] == 1
+        assert settings['worker_connections'] == 251
+    
+    def test_module_settings(self):
+        """Test that the module exposes the settings gunicorn reads."""
+        assert gunicorn_conf.workers >= 1
+        assert gunicorn_conf.worker_class == 'gthread'
+        assert gunicorn_conf.threads >= 2
+        assert gunicorn_conf.bind.startswith('0.0.0.0:')
+    
+    def test_preload_freezes_heap(self):
+        """Test that preloading is configurable and the pre_fork hook collects, then freezes the heap."""
+        assert gunicorn_conf.preload_app is Config.GUNICORN_PRELOAD
+        calls = []
+        with patch.object(gunicorn_conf, 'preload_app', True), \
+                patch('gunicorn_conf.gc.collect', side_effect=lambda: calls.append('collect')), \
+                patch('gunicorn_conf.gc.freeze', side_effect=lambda: calls.append('freeze')):
+            gunicorn_conf.pre_fork(None, None)
+        assert calls == ['collect', 'freeze']
+    
+    def test_multiple_workers_share_job_store(self):
+        """Test that more than one worker switches reading jobs to the SQLite store unless configured."""
+        with patch('config.Config.JOBS_BACKEND', 'memory'), patch('config.Config.AI_MAX_WORKERS', 16), \
+                patch('config.Config.METRICS_DIR', None):
+            try:
+                with patch.dict('os.environ', {'WEB_CONCURRENCY': '2'}):
+                    importlib.reload(gunicorn_conf)
+                    assert Config.JOBS_BACKEND == 'sqlite'
+                Config.JOBS_BACKEND = 'memory'
+                with patch.dict('os.environ', {'WEB_CONCURRENCY': '2', 'JOBS_BACKEND': 'memory'}):
+                    importlib.reload(gunicorn_conf)
+                    assert Config.JOBS_BACKEND == 'memory'
+            finally:
+                importlib.reload(gunicorn_conf)
+    
+    def test_multiple_workers_aggregate_metrics(self, tmp_path):
+        """Test that more than one worker gets a metrics directory that is cleared on start."""
+        with patch('config.Config.METRICS_DIR', None), patch('config.Config.JOBS_BACKEND', 'memory'), \
+                patch('config.Config.AI_MAX_WORKERS', 16):
+            try:
+                with patch.dict('os.environ', {'WEB_CONCURRENCY': '2'}):
+                    importlib.reload(gunicorn_conf)
+                assert Config.METRICS_DIR
+                
+                Config.METRICS_DIR = str(tmp_path)
+                (tmp_path / 'metrics-1.json').write_text('{}')
+                gunicorn_conf.on_starting(None)
+                assert list(tmp_path.iterdir()) == []
+            finally:
+                importlib.reload(gunicorn_conf)
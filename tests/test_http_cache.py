@@ -0,0 +1,146 @@
+import gzip
+import json
+import os
+import pytest
+from unittest.mock import patch
+from flask import Flask, Response, jsonify, render_template_string
+from utils import http_cache
+from utils.http_cache import HttpCache
+
+STYLE = "body { color: #222; }\n" * 200
+
+
+@pytest.fixture
+def cached_app(tmp_path):
+    """Small Flask app with a static folder and the HTTP cache installed."""
+    static_dir = tmp_path / 'static'
+    static_dir.mkdir()
+    (static_dir / 'style.css').write_text(STYLE)
+    (static_dir / 'card.jpg').write_bytes(b'\xff\xd8 not really a jpeg')
+    app = Flask(__name__, static_folder=str(static_dir))
+    
+    @app.route('/page')
+    def page():
+        return render_template_string("<p>{{ text }}</p>", text="oracle " * 300)
+    
+    @app.route('/small')
+    def small():
+        return jsonify({'ok': True})
+    
+    @app.route('/reading')
+    def reading():
+        return jsonify({'prophecy': "x" * 4000}), 200, {'Cache-Control': 'no-store'}
+    
+    @app.route('/stream')
+    def stream():
+        return Response(iter(["a" * 4000]), mimetype='text/plain')
+    
+    HttpCache(app, min_size=1024)
+    return app
+
+
+class TestHttpCache:
+    """Test cases for ETags, conditional GET and compression."""
+    
+    def test_static_precompressed(self, cached_app):
+        """Test that text static files are served precompressed from memory with strong ETags."""
+        client = cached_app.test_client()
+        
+        plain = client.get('/static/style.css', headers={'Accept-Encoding': 'identity'})
+        gzipped = client.get('/static/style.css', headers={'Accept-Encoding': 'gzip'})
+        
+        assert plain.data.decode() == STYLE
+        assert plain.headers['Cache-Control'] == 'no-cache'
+        assert plain.headers['Vary'] == 'Accept-Encoding'
+        assert gzipped.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(gzipped.data).decode() == STYLE
+        assert gzipped.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+        assert not plain.headers['ETag'].startswith('W/')
+    
+    def test_static_brotli(self, cached_app):
+        """Test that brotli is preferred when installed and accepted."""
+        brotli = pytest.importorskip('brotli')
+        client = cached_app.test_client()
+        
+        response = client.get('/static/style.css', headers={'Accept-Encoding': 'gzip, br'})
+        
+        assert response.headers['Content-Encoding'] == 'br'
+        assert brotli.decompress(response.data).decode() == STYLE
+    
+    def test_static_not_modified(self, cached_app):
+        """Test that a matching If-None-Match is answered with an empty 304."""
+        client = cached_app.test_client()
+        etag = client.get('/static/style.css', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+        
+        response = client.get('/static/style.css', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        
+        assert response.status_code == 304
+        assert response.data == b''
+        assert client.get('/static/style.css', headers={'If-None-Match': etag}).status_code == 200
+    
+    def test_static_reloaded_when_changed(self, cached_app):
+        """Test that a static file edited after startup is recompressed."""
+        client = cached_app.test_client()
+        path = os.path.join(cached_app.static_folder, 'style.css')
+        first = client.get('/static/style.css').headers['ETag']
+        
+        with open(path, 'w') as f:
+            f.write("p { margin: 0; }")
+        os.utime(path, (0, os.stat(path).st_mtime + 10))
+        response = client.get('/static/style.css')
+        
+        assert response.data == b"p { margin: 0; }"
+        assert response.headers['ETag'] != first
+    
+    def test_binary_static_files_use_default_handler(self, cached_app):
+        """Test that images are left to Flask's static handler."""
+        response = cached_app.test_client().get('/static/card.jpg', headers={'Accept-Encoding': 'gzip'})
+        
+        assert response.status_code == 200
+        assert 'Content-Encoding' not in response.headers
+        response.close()
+    
+    def test_rendered_page_etag_and_compression(self, cached_app):
+        """Test that rendered HTML gets a strong ETag, compression and 304 revalidation."""
+        client = cached_app.test_client()
+        
+        response = client.get('/page', headers={'Accept-Encoding': 'gzip'})
+        
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(response.data).decode().startswith("<p>oracle")
+        assert response.headers['Cache-Control'] == 'no-cache'
+        revalidated = client.get('/page', headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+        assert revalidated.status_code == 304
+        assert revalidated.data == b''
+    
+    def test_small_json_not_compressed(self, cached_app):
+        """Test that bodies under the threshold are sent as is."""
+        response = cached_app.test_client().get('/small', headers={'Accept-Encoding': 'gzip'})
+        
+        assert 'Content-Encoding' not in response.headers
+        assert response.get_json() == {'ok': True}
+        assert 'ETag' in response.headers
+    
+    def test_no_store_json_compressed_without_etag(self, cached_app):
+        """Test that no-store responses are compressed but not validated."""
+        response = cached_app.test_client().get('/reading', headers={'Accept-Encoding': 'gzip'})
+        
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(response.data))['prophecy'] == "x" * 4000
+        assert 'ETag' not in response.headers
+        assert response.headers['Cache-Control'] == 'no-store'
+    
+    def test_streamed_responses_untouched(self, cached_app):
+        """Test that streamed responses are neither buffered nor compressed."""
+        response = cached_app.test_client().get('/stream', headers={'Accept-Encoding': 'gzip'})
+        
+        assert 'Content-Encoding' not in response.headers
+        assert 'ETag' not in response.headers
+        assert response.data == b"a" * 4000
+    
+    def test_gzip_only_without_brotli(self, tmp_path):
+        """Test that only gzip is offered when brotli is not installed."""
+        with patch.object(http_cache, 'brotli', None):
+            cache = HttpCache()
+        
+        assert cache.encodings == ('gzip',)
\ No newline at end of file
@@ -0,0 +1,40 @@
+import random
+from meanings import CARD_MEANINGS
+from services.local_prophecy import DEFAULT_THEMES, LocalProphecyGenerator, card_themes
+
+
+class TestLocalProphecy:
+    """Test cases for the local prophecy generator."""
+    
+    def test_card_themes(self):
+        """Test that meanings are split into lower-case themes."""
+        assert card_themes("The Tower: Liberation, sudden change, breaking free.") == (
+            'liberation', 'sudden change', 'breaking free'
+        )
+        assert card_themes("Two Of Cups: Unknown meaning") == DEFAULT_THEMES
+        assert card_themes("No meaning") == DEFAULT_THEMES
+    
+    def test_generate(self):
+        """Test that a prophecy has an opening, one sentence per card and a closing."""
+        card_infos = ["The Sun: Joy", "The Moon: Fear", "The Star: Hope"]
+        
+        prophecy = LocalProphecyGenerator().generate(card_infos, rng=random.Random(7))
+        
+        assert prophecy.count('. ') == 4 and prophecy.endswith('.')
+        assert all(theme in prophecy for theme in ('joy', 'fear', 'hope'))
+        assert "{" not in prophecy
+    
+    def test_generate_is_seedable(self):
+        """Test that the same random generator state gives the same prophecy."""
+        generator = LocalProphecyGenerator()
+        card_infos = [f"{key}: {meaning}" for key, meaning in CARD_MEANINGS.items()]
+        
+        assert generator.generate(card_infos, rng=random.Random(1)) == generator.generate(card_infos, rng=random.Random(1))
+    
+    def test_figures_and_empty_spreads(self):
+        """Test that person themes get their own templates and an empty spread still gets a prophecy."""
+        generator = LocalProphecyGenerator()
+        
+        prophecy = generator.generate(["The Emperor: Father"], rng=random.Random(3))
+        assert "a father" in prophecy or "new father" in prophecy
+        assert generator.generate([], rng=random.Random(3))
@@ -0,0 +1,148 @@
+import json
+import threading
+import pytest
+from unittest.mock import Mock, patch
+from services.ai_service import AIProphecyService
+from utils.metrics import (
+    CACHE_LOOKUPS, REQUESTS_IN_FLIGHT, Counter, Gauge, Histogram, MetricsRegistry, clear_snapshots
+)
+
+DEAD_PID = 2 ** 22 + 1
+
+
+class TestMetricsRegistry:
+    """Test cases for metric recording, merging and rendering."""
+    
+    def test_render_text_format(self):
+        """Test that counters and histograms are rendered in the Prometheus text format."""
+        registry = MetricsRegistry()
+        requests = Counter('test_requests_total', "Requests.", ['status'], registry=registry)
+        latency = Histogram('test_latency_seconds', "Latency.", buckets=(0.1, 1.0), registry=registry)
+        
+        requests.inc(status='200')
+        requests.inc(2, status='200')
+        latency.observe(0.05)
+        latency.observe(0.5)
+        latency.observe(3)
+        text = registry.render()
+        
+        assert '# TYPE test_requests_total counter' in text
+        assert 'test_requests_total{status="200"} 3' in text
+        assert 'test_latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'test_latency_seconds_bucket{le="1"} 2' in text
+        assert 'test_latency_seconds_bucket{le="+Inf"} 3' in text
+        assert 'test_latency_seconds_sum 3.55' in text
+        assert 'test_latency_seconds_count 3' in text
+    
+    def test_rejects_wrong_labels(self):
+        """Test that recording with unexpected label names fails."""
+        registry = MetricsRegistry()
+        counter = Counter('test_total', "Test.", ['result'], registry=registry)
+        
+        try:
+            counter.inc(status='hit')
+        except ValueError as e:
+            assert 'expects labels' in str(e)
+        else:
+            raise AssertionError("Expected ValueError")
+    
+    def test_merges_worker_snapshots(self, tmp_path):
+        """Test that counters from exited workers are kept while their gauges are dropped."""
+        registry = MetricsRegistry(directory=str(tmp_path))
+        counter = Counter('test_total', "Test.", registry=registry)
+        gauge = Gauge('test_in_flight', "Test.", registry=registry)
+        counter.inc(2)
+        gauge.inc()
+        (tmp_path / f'metrics-{DEAD_PID}.json').write_text(json.dumps({
+            'pid': DEAD_PID,
+            'metrics': {
+                'test_total': {'samples': [[[], 5]]},
+                'test_in_flight': {'samples': [[[], 4]]},
+            },
+        }))
+        
+        with patch('utils.metrics._pid_alive', return_value=False):
+            text = registry.render()
+        
+        assert 'test_total 7' in text
+        assert 'test_in_flight 1' in text
+    
+    def test_max_gauge_not_summed(self, tmp_path):
+        """Test that a gauge of shared state reports the largest live value instead of the sum."""
+        registry = MetricsRegistry(directory=str(tmp_path))
+        gauge = Gauge('test_pending', "Test.", registry=registry, multiprocess_mode='max')
+        gauge.inc(3)
+        for pid, value in ((DEAD_PID, 4), (DEAD_PID + 1, 5), (DEAD_PID + 2, 9)):
+            (tmp_path / f'metrics-{pid}.json').write_text(json.dumps({
+                'pid': pid,
+                'metrics': {'test_pending': {'samples': [[[], value]]}},
+            }))
+        
+        with patch('utils.metrics._pid_alive', side_effect=lambda pid: pid != DEAD_PID + 2):
+            text = registry.render()
+        
+        assert 'test_pending 5' in text
+        with pytest.raises(ValueError):
+            Gauge('test_other', "Test.", registry=registry, multiprocess_mode='average')
+    
+    def test_concurrent_flushes_and_clear(self, tmp_path):
+        """Test that flushes from several threads never clash and old snapshots can be cleared."""
+        registry = MetricsRegistry(directory=str(tmp_path))
+        Counter('test_total', "Test.", registry=registry).inc()
+        with patch('utils.metrics.logger.warning') as warning:
+            threads = [threading.Thread(target=lambda: [registry.flush() for _ in range(50)]) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        
+        warning.assert_not_called()
+        assert [path.name for path in tmp_path.iterdir()] == [f'metrics-{registry.snapshot()["pid"]}.json']
+        clear_snapshots(str(tmp_path))
+        assert list(tmp_path.iterdir()) == []
+    
+    def test_function_gauge(self):
+        """Test that a function gauge reports the function's value and survives reset."""
+        registry = MetricsRegistry()
+        gauge = Gauge('test_pending', "Test.", registry=registry)
+        gauge.set_function(lambda: 3)
+        
+        registry.reset()
+        
+        assert 'test_pending 3' in registry.render()
+
+
+class TestInstrumentation:
+    """Test cases for the metrics recorded on the request path."""
+    
+    def test_cache_lookups_counted(self):
+        """Test that prophecy cache hits and misses are counted."""
+        service = AIProphecyService(router=Mock())
+        service.cache = Mock()
+        service.cache.get.side_effect = [None, "Cached prophecy"]
+        service.refresh_prophecy = Mock(return_value="Fresh prophecy")
+        before = CACHE_LOOKUPS.collect()
+        
+        service.generate_prophecy(["Card"], cache_key='a|b|c')
+        service.generate_prophecy(["Card"], cache_key='a|b|c')
+        after = CACHE_LOOKUPS.collect()
+        
+        assert after[('miss',)] - before.get(('miss',), 0) == 1
+        assert after[('hit',)] - before.get(('hit',), 0) == 1
+    
+    def test_metrics_endpoint(self, client):
+        """Test that /metrics reports per-stage and per-endpoint metrics."""
+        with patch('services.ai_service.AIProphecyService.generate_prophecy', return_value="Prophecy"):
+            client.get('/draw_cards').close()
+        # Responses other tests left unclosed still count as in flight
+        in_flight = REQUESTS_IN_FLIGHT.collect().get((), 0)
+        
+        response = client.get('/metrics')
+        text = response.get_data(as_text=True)
+        
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain; version=0.0.4')
+        assert 'tarot_stage_duration_seconds_count{stage="draw_cards"}' in text
+        assert 'tarot_stage_duration_seconds_count{stage="serialize"}' in text
+        assert 'tarot_requests_total{endpoint="/draw_cards",status="200"}' in text
+        assert f'tarot_requests_in_flight {in_flight + 1:g}' in text
@@ -32,6 +32,23 @@ class TestTarotCard:
         assert hasattr(card, 'name')
         assert hasattr(card, 'meaning')
         assert hasattr(card, 'key')
+    
+    def test_tarot_card_to_dict(self):
+        """Test the API representation of a card."""
+        card = TarotCard(
+            image_path="test.jpg",
+            name="Test Card",
+            meaning="Test meaning",
+            key="test_card",
+            sources=(("image/webp", "test.160w.webp 160w"),)
+        )
+        
+        assert card.to_dict() == {
+            'image': "test.jpg",
+            'name': "Test Card",
+            'meaning': "Test meaning",
+            'sources': [{'type': "image/webp", 'srcset': "test.160w.webp 160w"}]
+        }
 
 
 class TestCardReading:
@@ -0,0 +1,105 @@
+import pytest
+from unittest.mock import patch, Mock
+from models import TarotCard
+from services.prewarm import prewarm, plan_prewarm, main
+from services.prophecy_cache import ProphecyCache
+from exceptions import AIProphecyError, ConfigurationError
+
+
+def make_deck(*keys):
+    """Build a small deck of test cards."""
+    return tuple(
+        TarotCard(image_path=f"/static/cards/{key}.jpg", name=key.title(), meaning=f"{key} meaning", key=key)
+        for key in keys
+    )
+
+
+@pytest.fixture
+def ai_service(tmp_path):
+    """AI service mock backed by a real cache."""
+    service = Mock()
+    service.cache = ProphecyCache(path=str(tmp_path / 'cache.db'), variants=2, ttl=3600, max_entries=1000)
+    
+    def refresh(card_infos, cache_key=None, admit=True):
+        prophecy = f"prophecy for {cache_key}"
+        service.cache.put(cache_key, prophecy)
+        return prophecy
+    
+    service.refresh_prophecy.side_effect = refresh
+    return service
+
+
+@pytest.fixture
+def card_service():
+    """Card service mock with a four card deck."""
+    service = Mock()
+    service.get_deck.return_value = make_deck('a', 'b', 'c', 'd')
+    return service
+
+
+class TestPrewarm:
+    """Test cases for the prewarm command."""
+    
+    def test_plan_covers_every_combination(self, ai_service):
+        """Test that every unordered combination is planned."""
+        jobs = plan_prewarm(make_deck('d', 'c', 'b', 'a'), ai_service, spread_size=3, variants=1)
+        
+        assert [key for key, _ in jobs] == ['a|b|c', 'a|b|d', 'a|c|d', 'b|c|d']
+        assert jobs[0][1] == ["A: a meaning", "B: b meaning", "C: c meaning"]
+    
+    def test_prewarm_fills_cache(self, ai_service, card_service):
+        """Test that prewarming generates all variants."""
+        stats = prewarm(ai_service, card_service, spread_size=3, variants=2, concurrency=2)
+        
+        assert stats == {'planned': 8, 'generated': 8, 'failed': 0}
+        assert ai_service.cache.count('a|b|c') == 2
+        assert all(call.kwargs['admit'] is False for call in ai_service.refresh_prophecy.call_args_list)
+    
+    def test_prewarm_resumes(self, ai_service, card_service):
+        """Test that already cached combinations are skipped."""
+        ai_service.cache.put('a|b|c', 'existing one')
+        ai_service.cache.put('a|b|c', 'existing two')
+        ai_service.cache.put('a|b|d', 'existing')
+        
+        stats = prewarm(ai_service, card_service, spread_size=3, variants=2, concurrency=2)
+        
+        assert stats['planned'] == 5
+    
+    def test_prewarm_refresh_regenerates(self, ai_service, card_service):
+        """Test that refresh mode regenerates cached combinations."""
+        prewarm(ai_service, card_service, spread_size=3, variants=2)
+        stats = prewarm(ai_service, card_service, spread_size=3, variants=2, refresh=True)
+        
+        assert stats['planned'] == 8
+    
+    def test_prewarm_variants_capped_by_cache(self, ai_service, card_service):
+        """Test that more variants than the cache holds are not requested."""
+        stats = prewarm(ai_service, card_service, spread_size=3, variants=10)
+        
+        assert stats['planned'] == 8
+    
+    def test_prewarm_counts_failures(self, ai_service, card_service):
+        """Test that failed generations are counted, not raised."""
+        ai_service.refresh_prophecy.side_effect = AIProphecyError("down")
+        
+        stats = prewarm(ai_service, card_service, spread_size=3, variants=1)
+        
+        assert stats == {'planned': 4, 'generated': 0, 'failed': 4}
+    
+    def test_prewarm_requires_cache(self, card_service):
+        """Test that prewarming fails clearly when the cache is disabled."""
+        service = Mock()
+        service.cache = None
+        
+        with pytest.raises(ConfigurationError, match="Prophecy cache is disabled"):
+            prewarm(service, card_service)
+    
+    @patch('services.prewarm.Config.validate')
+    @patch('services.prewarm.prewarm')
+    def test_main(self, mock_prewarm, mock_validate):
+        """Test the command line entry point."""
+        mock_prewarm.return_value = {'planned': 1, 'generated': 1, 'failed': 0}
+        
+        assert main(['--variants', '3', '--concurrency', '8']) == 0
+        mock_validate.assert_called_once()
+        mock_prewarm.assert_called_once_with(spread_size=3, variants=3, concurrency=8, refresh=False)
\ No newline at end of file
@@ -0,0 +1,120 @@
+import json
+import os
+import sys
+import time
+import pytest
+from flask import Flask
+from utils.metrics import STAGE_SECONDS
+from utils.profiling import PROFILE_HEADER, RequestProfiler, StackSampler
+
+
+def profiled_app(directory, **kwargs):
+    """Small Flask app with request profiling installed."""
+    app = Flask(__name__)
+    
+    @app.route('/slow')
+    def slow():
+        with STAGE_SECONDS.time(stage='draw_cards'):
+            time.sleep(0.02)
+        return 'done'
+    
+    RequestProfiler(app, directory=str(directory), **kwargs)
+    return app
+
+
+def summaries(directory):
+    return [json.loads(path.read_text()) for path in sorted(directory.glob('*.json'))]
+
+
+class TestRequestProfiler:
+    """Test cases for on-demand request profiling."""
+    
+    def test_header_triggers_profile(self, tmp_path):
+        """Test that a request with the admin token is profiled with its stage timings."""
+        client = profiled_app(tmp_path, token='secret', sample_rate=0.0, interval=0.001).test_client()
+        
+        client.get('/slow')
+        assert summaries(tmp_path) == []
+        
+        client.get('/slow', headers={PROFILE_HEADER: 'secret'})
+        [summary] = summaries(tmp_path)
+        
+        assert summary['path'] == '/slow'
+        assert summary['status'] == 200
+        assert summary['trigger'] == 'header'
+        assert summary['total'] >= summary['stages']['draw_cards'] >= 0.02
+        folded = (tmp_path / summary['file']).read_text()
+        assert any(line.rsplit(' ', 1)[0].endswith('test_profiling:slow') for line in folded.splitlines())
+    
+    def test_wrong_token_not_profiled(self, tmp_path):
+        """Test that an invalid admin token does not trigger profiling."""
+        client = profiled_app(tmp_path, token='secret', sample_rate=0.0).test_client()
+        
+        client.get('/slow', headers={PROFILE_HEADER: 'guess'})
+        
+        assert summaries(tmp_path) == []
+    
+    def test_sampled_cprofile(self, tmp_path):
+        """Test that sampled requests are profiled deterministically in cprofile mode."""
+        client = profiled_app(tmp_path, sample_rate=1.0, mode='cprofile').test_client()
+        
+        client.get('/slow')
+        [summary] = summaries(tmp_path)
+        
+        assert summary['trigger'] == 'sampled'
+        assert summary['file'].endswith('.prof')
+        assert os.path.getsize(tmp_path / summary['file']) > 0
+    
+    def test_keeps_recent_profiles(self, tmp_path):
+        """Test that only the newest profiles are kept."""
+        client = profiled_app(tmp_path, sample_rate=1.0, keep=2).test_client()
+        
+        for _ in range(3):
+            client.get('/slow')
+        
+        assert len(summaries(tmp_path)) == 2
+        assert len(list(tmp_path.glob('*.folded'))) == 2
+    
+    def test_index_requires_token(self, tmp_path):
+        """Test that the profile index lists profiles and is protected by the admin token."""
+        client = profiled_app(tmp_path, token='secret', sample_rate=1.0).test_client()
+        client.get('/slow')
+        [summary] = summaries(tmp_path)
+        
+        assert client.get('/_profiles').status_code == 403
+        assert client.get('/_profiles?token=secret').status_code == 403
+        index = client.get('/_profiles', headers={PROFILE_HEADER: 'secret'})
+        assert index.status_code == 200
+        assert summary['file'] in index.get_data(as_text=True)
+        assert client.get(f"/_profiles/{summary['file']}", headers={PROFILE_HEADER: 'secret'}).status_code == 200
+    
+    def test_index_not_served_without_token(self, tmp_path):
+        """Test that the profile routes are not registered when no admin token is configured."""
+        app = profiled_app(tmp_path, token='', sample_rate=1.0)
+        app.test_client().get('/slow')
+        
+        assert len(summaries(tmp_path)) == 1
+        assert 'profile_index' not in app.view_functions
+        assert app.test_client().get('/_profiles').status_code == 404
+    
+    def test_unknown_mode(self, tmp_path):
+        """Test that an unknown profiling mode is rejected."""
+        with pytest.raises(ValueError):
+            RequestProfiler(directory=str(tmp_path), mode='perf')
+    
+    def test_disabled_by_default(self, app):
+        """Test that the app installs no profiling hooks unless enabled."""
+        assert 'profile_index' not in app.view_functions
+
+
+class TestStackSampler:
+    """Test cases for the stack sampler."""
+    
+    def test_collapse_root_first(self):
+        """Test that stacks are collapsed from the outermost frame."""
+        def inner():
+            return StackSampler._collapse(sys._getframe())
+        
+        stack = inner()
+        
+        assert stack.endswith('tests.test_profiling:test_collapse_root_first;tests.test_profiling:inner')
@@ -0,0 +1,193 @@
+import asyncio
+import pytest
+import requests
+from unittest.mock import patch, Mock
+from services.ai_service import AIProphecyService
+from services.prophecy_backends import (
+    BackendRouter,
+    HuggingFaceBackend,
+    OpenAICompatibleBackend,
+    build_backends
+)
+from services.stub_server import StubSettings, start_in_background
+from exceptions import AIProphecyError, ConfigurationError
+
+
+@pytest.fixture
+def stub_server():
+    """A running stub server with no latency."""
+    server = start_in_background(StubSettings(prophecy="Stub prophecy text"))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def stub_url(server):
+    """Base URL of a stub server."""
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/v1"
+
+
+def named_backend(name):
+    """A mocked backend with a name."""
+    backend = Mock()
+    backend.name = name
+    return backend
+
+
+class TestBuildBackends:
+    """Test cases for backend configuration parsing."""
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    def test_build_hf_and_openai_backends(self):
+        """Test building a mixed backend list."""
+        with patch('services.prophecy_backends.InferenceClient'):
+            backends = build_backends("hf, hf:other/model, local=http://localhost:8080/v1")
+        
+        assert [backend.name for backend in backends] == [
+            'hf:HuggingFaceH4/zephyr-7b-alpha', 'hf:other/model', 'local'
+        ]
+        assert isinstance(backends[0], HuggingFaceBackend)
+        assert isinstance(backends[2], OpenAICompatibleBackend)
+        assert backends[2].url == "http://localhost:8080/v1/chat/completions"
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    def test_lazy_hf_backend(self):
+        """Test that a lazy backend builds its client on warm-up instead of at construction."""
+        with patch('services.prophecy_backends.InferenceClient') as mock_client:
+            backend = HuggingFaceBackend('test/model', token='test_token', lazy=True)
+            mock_client.assert_not_called()
+            
+            BackendRouter([backend]).warm_up()
+            backend.client
+        
+        mock_client.assert_called_once_with('test/model', token='test_token', timeout=None)
+    
+    def test_invalid_entry(self):
+        """Test that malformed entries are rejected."""
+        with pytest.raises(ConfigurationError, match="Invalid AI backend entry"):
+            build_backends("nonsense")
+    
+    def test_duplicate_names(self):
+        """Test that two backends with the same name are rejected."""
+        with pytest.raises(ConfigurationError, match="'a' is configured more than once"):
+            build_backends("a=http://x,a=http://y")
+        with pytest.raises(ConfigurationError, match="more than once"):
+            build_backends("hf,hf")
+        with pytest.raises(ConfigurationError, match="more than once"):
+            BackendRouter([named_backend('a'), named_backend('a')])
+    
+    def test_empty_spec(self):
+        """Test that at least one backend is required."""
+        with pytest.raises(ConfigurationError, match="At least one AI backend"):
+            build_backends(" , ")
+
+
+class TestBackendRouter:
+    """Test cases for latency-aware routing."""
+    
+    def test_prefers_faster_backend(self):
+        """Test that the backend with the lowest latency is chosen."""
+        fast, slow = named_backend('fast'), named_backend('slow')
+        router = BackendRouter([slow, fast], explore_rate=0.0)
+        router.record(slow, 2.0, ok=True)
+        router.record(fast, 0.2, ok=True)
+        
+        assert router.choose() is fast
+    
+    def test_avoids_failing_backend(self):
+        """Test that errors push traffic to another backend."""
+        flaky, steady = named_backend('flaky'), named_backend('steady')
+        router = BackendRouter([flaky, steady], explore_rate=0.0)
+        router.record(flaky, 0.1, ok=True)
+        router.record(steady, 0.5, ok=True)
+        for _ in range(5):
+            router.record(flaky, 0.1, ok=False)
+        
+        assert router.choose() is steady
+        assert router.snapshot()['flaky']['errors'] == 5
+    
+    def test_prefers_slow_backend_over_failing_one(self):
+        """Test that a backend that has only failed loses to a slow healthy one."""
+        broken, slow = named_backend('broken'), named_backend('slow')
+        router = BackendRouter([broken, slow], explore_rate=0.0, failure_latency=60.0)
+        router.record(slow, 2.0, ok=True)
+        router.record(broken, 0.01, ok=False)
+        
+        assert router.choose() is slow
+    
+    def test_untried_backend_sampled_first(self):
+        """Test that a backend without statistics gets traffic."""
+        known, fresh = named_backend('known'), named_backend('fresh')
+        router = BackendRouter([known, fresh], explore_rate=0.0)
+        router.record(known, 0.1, ok=True)
+        
+        assert router.choose() is fresh
+    
+    def test_requires_backends(self):
+        """Test that a router needs at least one backend."""
+        with pytest.raises(ConfigurationError):
+            BackendRouter([])
+
+
+class TestOpenAICompatibleBackend:
+    """Test cases for the OpenAI-compatible backend against the stub server."""
+    
+    def test_complete(self, stub_server):
+        """Test a full completion."""
+        backend = OpenAICompatibleBackend('stub', stub_url(stub_server), 'stub-model', timeout=5)
+        
+        assert backend.complete([{"role": "user", "content": "hi"}], 0.7) == "Stub prophecy text"
+    
+    def test_stream(self, stub_server):
+        """Test a streamed completion."""
+        backend = OpenAICompatibleBackend('stub', stub_url(stub_server), 'stub-model', timeout=5)
+        
+        chunks = list(backend.stream([{"role": "user", "content": "hi"}], 0.7))
+        
+        assert "".join(chunks).strip() == "Stub prophecy text"
+        assert len(chunks) == 3
+    
+    def test_acomplete(self, stub_server):
+        """Test an async completion."""
+        backend = OpenAICompatibleBackend('stub', stub_url(stub_server), 'stub-model', timeout=5)
+        
+        async def run():
+            try:
+                return await backend.acomplete([{"role": "user", "content": "hi"}], 0.7)
+            finally:
+                await backend.aclose()
+        
+        assert asyncio.run(run()) == "Stub prophecy text"
+    
+    def test_server_errors_raise(self):
+        """Test that injected stub failures surface as HTTP errors."""
+        server = start_in_background(StubSettings(error_rate=1.0))
+        try:
+            backend = OpenAICompatibleBackend('stub', stub_url(server), 'stub-model', timeout=5)
+            with pytest.raises(requests.HTTPError):
+                backend.complete([{"role": "user", "content": "hi"}], 0.7)
+        finally:
+            server.shutdown()
+            server.server_close()
+    
+    @patch('config.Config.AI_MAX_RETRIES', 0)
+    def test_ai_service_with_stub_backend(self, stub_server):
+        """Test generating a prophecy end to end through a routed stub backend."""
+        router = BackendRouter([OpenAICompatibleBackend('stub', stub_url(stub_server), 'stub-model', timeout=5)])
+        service = AIProphecyService(router=router)
+        
+        assert service.generate_prophecy(["The Sun: Joy"]) == "Stub prophecy text"
+        assert router.snapshot()['stub']['requests'] == 1
+    
+    @patch('config.Config.AI_MAX_RETRIES', 0)
+    def test_ai_service_records_backend_failures(self):
+        """Test that backend failures are recorded by the router."""
+        backend = named_backend('broken')
+        backend.complete.side_effect = Exception("down")
+        router = BackendRouter([backend])
+        service = AIProphecyService(router=router)
+        
+        with pytest.raises(AIProphecyError, match="down"):
+            service.generate_prophecy(["The Sun: Joy"])
+        assert router.snapshot()['broken']['errors'] == 1
\ No newline at end of file
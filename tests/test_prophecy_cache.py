@@ -0,0 +1,103 @@
+import sqlite3
+import time
+from unittest.mock import patch
+from services.prophecy_cache import ProphecyCache, combination_key
+
+
+class TestCombinationKey:
+    """Test cases for canonical cache keys."""
+    
+    def test_combination_key_is_order_independent(self):
+        """Test that card order does not change the key."""
+        assert combination_key(['the_sun', 'the_moon', 'the_star']) == combination_key(['the_star', 'the_sun', 'the_moon'])
+    
+    def test_combination_key_format(self):
+        """Test the key format."""
+        assert combination_key(['the_sun', 'the_moon']) == "the_moon|the_sun"
+
+
+class TestProphecyCache:
+    """Test cases for ProphecyCache."""
+    
+    def test_miss_until_variants_filled(self, tmp_path):
+        """Test that a key only hits once all variants are cached."""
+        cache = ProphecyCache(path=str(tmp_path / 'cache.db'), variants=2, ttl=60, max_entries=100)
+        
+        assert cache.get('a|b|c') is None
+        cache.put('a|b|c', 'first')
+        assert cache.get('a|b|c') is None
+        cache.put('a|b|c', 'second')
+        
+        assert cache.get('a|b|c') in ('first', 'second')
+        assert cache.count('a|b|c') == 2
+    
+    def test_variants_capped_per_key(self, tmp_path):
+        """Test that only the newest variants are kept for a key."""
+        cache = ProphecyCache(path=str(tmp_path / 'cache.db'), variants=2, ttl=60, max_entries=100)
+        
+        for text in ('one', 'two', 'three'):
+            cache.put('key', text)
+        
+        assert cache.count('key') == 2
+        assert {cache.get('key') for _ in range(30)} <= {'two', 'three'}
+    
+    def test_expired_entries_are_ignored(self, tmp_path):
+        """Test that entries older than the TTL are treated as misses."""
+        cache = ProphecyCache(path=str(tmp_path / 'cache.db'), variants=1, ttl=10, max_entries=100)
+        cache.put('key', 'old prophecy')
+        
+        with patch('services.prophecy_cache.time.time', return_value=time.time() + 20):
+            assert cache.get('key') is None
+            assert cache.count('key') == 0
+    
+    @patch.object(ProphecyCache, 'LAST_USED_RESOLUTION', 0.0)
+    def test_lru_eviction(self, tmp_path):
+        """Test that least recently used entries are evicted first."""
+        cache = ProphecyCache(path=str(tmp_path / 'cache.db'), variants=1, ttl=60, max_entries=2)
+        cache.put('a', 'prophecy a')
+        cache.put('b', 'prophecy b')
+        assert cache.get('a') == 'prophecy a'
+        
+        cache.put('c', 'prophecy c')
+        
+        assert cache.get('a') == 'prophecy a'
+        assert cache.get('b') is None
+        assert cache.get('c') == 'prophecy c'
+    
+    def test_recent_hits_do_not_write(self, tmp_path):
+        """Test that hits only refresh last_used once it is older than the resolution."""
+        path = str(tmp_path / 'cache.db')
+        cache = ProphecyCache(path=path, variants=1, ttl=60, max_entries=10)
+        cache.put('key', 'value')
+        read_last_used = lambda: sqlite3.connect(path).execute("SELECT last_used FROM prophecies").fetchone()[0]
+        stored = read_last_used()
+        
+        assert cache.get('key') == 'value'
+        assert read_last_used() == stored
+        with patch.object(ProphecyCache, 'LAST_USED_RESOLUTION', 0.0):
+            cache.get('key')
+        assert read_last_used() > stored
+    
+    def test_cache_survives_restart(self, tmp_path):
+        """Test that a new cache instance sees stored prophecies."""
+        path = str(tmp_path / 'nested' / 'cache.db')
+        ProphecyCache(path=path, variants=1, ttl=60, max_entries=10).put('key', 'persisted')
+        
+        assert ProphecyCache(path=path, variants=1, ttl=60, max_entries=10).get('key') == 'persisted'
+    
+    def test_clear(self, tmp_path):
+        """Test clearing the cache."""
+        cache = ProphecyCache(path=str(tmp_path / 'cache.db'), variants=1, ttl=60, max_entries=10)
+        cache.put('key', 'value')
+        cache.clear()
+        
+        assert cache.get('key') is None
+    
+    def test_unusable_store_behaves_as_miss(self, tmp_path):
+        """Test that storage errors do not propagate."""
+        cache = ProphecyCache(path=str(tmp_path / 'cache.db'), variants=1, ttl=60, max_entries=10)
+        
+        with patch.object(cache, '_connection', side_effect=sqlite3.OperationalError("locked")):
+            cache.put('key', 'value')
+            assert cache.get('key') is None
+            assert cache.count('key') == 0
\ No newline at end of file
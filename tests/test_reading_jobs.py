@@ -0,0 +1,208 @@
+import threading
+import pytest
+from unittest.mock import patch, Mock
+from controllers.tarot_controller import FALLBACK_PROPHECY
+from exceptions import AIProphecyError, QueueFullError
+from models import ReadingJob
+from services.reading_jobs import MemoryJobStore, ReadingJobQueue, SQLiteJobStore, build_job_store
+
+
+def make_job(job_id='job-1', created_at=1.0):
+    return ReadingJob(job_id, [{'key': 'the_magician'}], ['The Magician: Creator'], 'the_magician',
+                      created_at=created_at)
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'sqlite':
+        return SQLiteJobStore(str(tmp_path / 'jobs.sqlite3'), poll_interval=0.01)
+    return MemoryJobStore()
+
+
+class TestJobStores:
+    """Test cases for the in-process and SQLite reading job stores."""
+    
+    def test_claim_and_finish(self, store):
+        """Test that a job is claimed once and carries its prophecy when finished."""
+        store.add(make_job())
+        assert store.pending() == 1
+        
+        job = store.claim(timeout=0.1)
+        assert job.id == 'job-1'
+        assert job.card_infos == ['The Magician: Creator']
+        assert store.pending() == 0
+        assert store.claim(timeout=0.01) is None
+        
+        store.finish(job, "A prophecy")
+        finished = store.get('job-1')
+        assert finished.status == 'done'
+        assert finished.prophecy == "A prophecy"
+        assert finished.to_dict() == {
+            'id': 'job-1', 'status': 'done', 'cards': [{'key': 'the_magician'}], 'prophecy': "A prophecy"
+        }
+    
+    def test_claims_oldest_first(self, store):
+        """Test that jobs are claimed in submission order."""
+        store.add(make_job('first', created_at=1.0))
+        store.add(make_job('second', created_at=2.0))
+        
+        assert store.claim(timeout=0.1).id == 'first'
+        assert store.claim(timeout=0.1).id == 'second'
+    
+    def test_wait_returns_when_finished(self, store):
+        """Test that a long-poll wakes up as soon as the job is finished."""
+        store.add(make_job())
+        job = store.claim(timeout=0.1)
+        threading.Timer(0.05, store.finish, args=(job, "Done")).start()
+        
+        assert store.wait('job-1', timeout=5).prophecy == "Done"
+        assert store.wait('missing', timeout=0.01) is None
+    
+    def test_wait_times_out(self, store):
+        """Test that a long-poll returns the unfinished job after the timeout."""
+        store.add(make_job())
+        assert store.wait('job-1', timeout=0.05).status == 'pending'
+    
+    def test_sqlite_shared_and_reclaimed(self, tmp_path):
+        """Test that SQLite jobs are visible to other stores and abandoned claims are reissued."""
+        path = str(tmp_path / 'jobs.sqlite3')
+        first = SQLiteJobStore(path, claim_timeout=0.0)
+        second = SQLiteJobStore(path, claim_timeout=0.0)
+        first.add(make_job())
+        
+        assert first.claim(timeout=0.01).id == 'job-1'
+        # The first claimer never finished, so the job is handed out again
+        job = second.claim(timeout=0.01)
+        assert job.id == 'job-1'
+        second.finish(job, "Recovered")
+        assert first.get('job-1').prophecy == "Recovered"
+    
+    def test_finished_jobs_expire(self, tmp_path):
+        """Test that finished jobs older than the TTL are dropped."""
+        for store in (MemoryJobStore(ttl=0.001), SQLiteJobStore(str(tmp_path / 'jobs.sqlite3'), ttl=0.001)):
+            store.add(make_job('old'))
+            store.finish(store.claim(timeout=0.1), "Old")
+            threading.Event().wait(0.01)
+            store.add(make_job('new'))
+            assert store.get('old') is None
+            assert store.get('new') is not None
+    
+    def test_build_job_store(self):
+        """Test that JOBS_BACKEND selects the store."""
+        assert isinstance(build_job_store('memory'), MemoryJobStore)
+        assert isinstance(build_job_store('sqlite'), SQLiteJobStore)
+
+
+class TestReadingJobQueue:
+    """Test cases for the background reading job queue."""
+    
+    def test_jobs_processed_by_workers(self, store):
+        """Test that submitted jobs are generated in the background."""
+        generate = Mock(return_value="A prophecy")
+        jobs = ReadingJobQueue(generate, store=store, workers=2)
+        
+        job = jobs.submit([{'key': 'the_magician'}], ['The Magician: Creator'], 'the_magician')
+        assert job.status == 'pending'
+        
+        finished = jobs.get(job.id, wait=5)
+        assert finished.status == 'done'
+        assert finished.prophecy == "A prophecy"
+        generate.assert_called_once_with(['The Magician: Creator'], 'the_magician')
+    
+    def test_raising_generator_finishes_job(self, store):
+        """Test that a job whose generation raises is finished with the fallback, or as failed without one."""
+        generate = Mock(side_effect=KeyError("choices"))
+        fallback = Mock(return_value="A fallback prophecy")
+        jobs = ReadingJobQueue(generate, store=store, workers=1, fallback=fallback)
+        
+        job = jobs.get(jobs.submit([], ['The Magician: Creator'], 'the_magician').id, wait=5)
+        assert job.status == 'done'
+        assert job.prophecy == "A fallback prophecy"
+        fallback.assert_called_once_with(['The Magician: Creator'])
+        
+        jobs.fallback = None
+        job = jobs.get(jobs.submit([], ['The Magician: Creator'], 'the_magician').id, wait=5)
+        assert job.status == 'failed'
+        assert job.to_dict() == {'id': job.id, 'status': 'failed', 'cards': []}
+        # A failed job is not claimed again
+        assert store.claim(timeout=0.05) is None
+        assert generate.call_count == 2
+    
+    def test_worker_pool_caps_concurrency(self):
+        """Test that no more than the configured number of generations run at once."""
+        active, peak, lock = [0], [0], threading.Lock()
+        release = threading.Event()
+        
+        def generate(card_infos, cache_key):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            release.wait(5)
+            with lock:
+                active[0] -= 1
+            return "Done"
+        
+        jobs = ReadingJobQueue(generate, store=MemoryJobStore(), workers=2)
+        submitted = [jobs.submit([], [], str(index)) for index in range(6)]
+        threading.Event().wait(0.1)
+        release.set()
+        
+        assert all(jobs.get(job.id, wait=5).status == 'done' for job in submitted)
+        assert peak[0] == 2
+    
+    def test_queue_full(self):
+        """Test that submissions are rejected once too many jobs are waiting."""
+        release = threading.Event()
+        jobs = ReadingJobQueue(lambda card_infos, cache_key: release.wait(5) and "Done",
+                               store=MemoryJobStore(), workers=1, max_pending=1)
+        jobs.submit([], [], 'a')
+        threading.Event().wait(0.05)
+        jobs.submit([], [], 'b')
+        
+        with pytest.raises(QueueFullError):
+            jobs.submit([], [], 'c')
+        release.set()
+
+
+class TestReadingRoutes:
+    """Test cases for the asynchronous reading endpoints."""
+    
+    def test_submit_and_poll(self, client):
+        """Test that POST /readings returns an ID and GET returns the prophecy."""
+        with patch('services.ai_service.AIProphecyService.generate_prophecy', return_value="Queued prophecy"):
+            response = client.post('/readings')
+            assert response.status_code == 202
+            data = response.get_json()
+            assert data['status'] == 'pending'
+            assert len(data['cards']) == 3
+            assert response.headers['Location'].endswith(f"/readings/{data['id']}")
+            
+            response = client.get(f"/readings/{data['id']}?wait=5")
+        
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'] == 'no-store'
+        assert response.get_json()['status'] == 'done'
+        assert response.get_json()['prophecy'] == "Queued prophecy"
+    
+    def test_fallback_prophecy(self, client):
+        """Test that AI errors finish the job with the fallback prophecy."""
+        with patch('services.ai_service.AIProphecyService.generate_prophecy', side_effect=AIProphecyError("down")), \
+                patch('config.Config.PROPHECY_FALLBACK', 'static'):
+            reading_id = client.post('/readings').get_json()['id']
+            response = client.get(f"/readings/{reading_id}?wait=5")
+        
+        assert response.get_json()['prophecy'] == FALLBACK_PROPHECY
+    
+    def test_unknown_reading(self, client):
+        """Test that an unknown reading ID is a 404."""
+        response = client.get('/readings/missing')
+        assert response.status_code == 404
+        assert 'error' in response.get_json()
+    
+    def test_queue_full_returns_503(self, client):
+        """Test that a full queue is reported as 503 with Retry-After."""
+        with patch('services.reading_jobs.ReadingJobQueue.submit', side_effect=QueueFullError("full")):
+            response = client.post('/readings')
+        
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
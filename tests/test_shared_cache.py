@@ -0,0 +1,162 @@
+import os
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from services.prophecy_cache import ProphecyCache
+from services.shared_cache import BUCKET_SLOTS, SharedMemoryCache, shared_cache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SharedMemoryCache(path=str(tmp_path / 'shared.mmap'), slots=16, slot_size=256)
+    yield cache
+    cache.close()
+
+
+class TestSharedMemoryCache:
+    """Test cases for the memory-mapped cache shared across processes."""
+    
+    def test_set_get_delete(self, cache):
+        """Test that values round-trip and can be removed."""
+        assert cache.get('missing') is None
+        assert cache.set('key', b'value', ttl=60)
+        assert cache.get('key') == b'value'
+        
+        assert cache.set('key', b'replaced', ttl=60)
+        assert cache.get('key') == b'replaced'
+        
+        cache.delete('key')
+        assert cache.get('key') is None
+    
+    def test_json_values(self, cache):
+        """Test that JSON values round-trip."""
+        cache.set_json('variants', ['one', 'two'], ttl=60)
+        assert cache.get_json('variants') == ['one', 'two']
+        assert cache.get_json('missing') is None
+    
+    def test_entries_expire(self, cache):
+        """Test that expired entries are misses."""
+        cache.set('key', b'value', ttl=0.01)
+        time.sleep(0.02)
+        assert cache.get('key') is None
+    
+    def test_value_too_large(self, cache):
+        """Test that values larger than a slot are refused."""
+        assert not cache.set('key', b'x' * cache.capacity, ttl=60)
+        assert cache.get('key') is None
+    
+    def test_full_bucket_evicts_soonest_expiry(self, tmp_path):
+        """Test that a full bucket replaces the entry closest to expiry."""
+        cache = SharedMemoryCache(path=str(tmp_path / 'shared.mmap'), slots=BUCKET_SLOTS, slot_size=256)
+        for index in range(BUCKET_SLOTS):
+            cache.set(f'key-{index}', b'value', ttl=60 + index)
+        
+        cache.set('newcomer', b'value', ttl=60)
+        
+        assert cache.get('newcomer') == b'value'
+        assert cache.get('key-0') is None
+        assert all(cache.get(f'key-{index}') == b'value' for index in range(1, BUCKET_SLOTS))
+    
+    def test_shared_between_instances(self, tmp_path, cache):
+        """Test that another mapping of the same file sees the entries."""
+        cache.set('key', b'value', ttl=60)
+        other = SharedMemoryCache(path=cache.path, slots=16, slot_size=256)
+        
+        assert other.get('key') == b'value'
+    
+    def test_layout_change_uses_separate_file(self, tmp_path, cache):
+        """Test that another slot layout maps its own file instead of reformatting a live one."""
+        cache.set('key', b'value', ttl=60)
+        other = SharedMemoryCache(path=cache.path, slots=32, slot_size=256)
+        
+        assert other.file_path != cache.file_path
+        assert other.get('key') is None
+        assert other.set('key', b'other', ttl=60)
+        assert cache.get('key') == b'value'
+        other.close()
+    
+    def test_mismatched_file_is_not_reformatted(self, tmp_path, cache):
+        """Test that a file with an unexpected header is left alone and the cache degrades to misses."""
+        cache.set('key', b'value', ttl=60)
+        with open(cache.file_path, 'r+b') as f:
+            f.write(b'NOTTAROT')
+        size = os.path.getsize(cache.file_path)
+        other = SharedMemoryCache(path=cache.path, slots=16, slot_size=256)
+        
+        assert not other.set('key', b'other', ttl=60)
+        assert other.get('key') is None
+        assert os.path.getsize(cache.file_path) == size
+        assert cache.get('key') == b'value'
+    
+    @pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs fork")
+    def test_shared_across_fork(self, cache):
+        """Test that a forked worker reads and writes the same entries."""
+        cache.set('parent', b'from parent', ttl=60)
+        pid = os.fork()
+        if pid == 0:
+            ok = cache.get('parent') == b'from parent' and cache.set('child', b'from child', ttl=60)
+            os._exit(0 if ok else 1)
+        _, status = os.waitpid(pid, 0)
+        
+        assert os.WEXITSTATUS(status) == 0
+        assert cache.get('child') == b'from child'
+    
+    def test_concurrent_writers(self, cache):
+        """Test that readers never see a torn value while writers race on one key."""
+        values = [bytes([index]) * 200 for index in range(4)]
+        stop = threading.Event()
+        
+        def write(value):
+            while not stop.is_set():
+                cache.set('key', value, ttl=60)
+        
+        writers = [threading.Thread(target=write, args=(value,)) for value in values]
+        for writer in writers:
+            writer.start()
+        try:
+            deadline = time.monotonic() + 0.2
+            while time.monotonic() < deadline:
+                assert cache.get('key') in values + [None]
+        finally:
+            stop.set()
+            for writer in writers:
+                writer.join()
+    
+    def test_unavailable_path_is_a_miss(self, tmp_path):
+        """Test that a cache whose file cannot be created degrades to misses."""
+        (tmp_path / 'file').write_text('')
+        cache = SharedMemoryCache(path=str(tmp_path / 'file' / 'shared.mmap'), slots=16, slot_size=256)
+        
+        assert not cache.set('key', b'value', ttl=60)
+        assert cache.get('key') is None
+    
+    def test_shared_cache_follows_config(self):
+        """Test that the process-wide cache exists only when enabled."""
+        assert shared_cache() is None
+        with patch('config.Config.SHARED_CACHE_ENABLED', True):
+            assert shared_cache() is shared_cache()
+
+
+class TestSharedTiers:
+    """Test cases for the services that publish to the shared cache."""
+    
+    def test_prophecy_cache_hits_shared_tier(self, tmp_path, cache):
+        """Test that SQLite hits are published and later served from shared memory."""
+        first = ProphecyCache(path=str(tmp_path / 'cache.db'), variants=1, ttl=60, max_entries=100, shared=cache)
+        first.put('a|b|c', 'cached')
+        assert first.get('a|b|c') == 'cached'
+        
+        second = ProphecyCache(path=str(tmp_path / 'cache.db'), variants=1, ttl=60, max_entries=100, shared=cache)
+        with patch.object(ProphecyCache, '_connection', side_effect=AssertionError("SQLite was queried")):
+            assert second.get('a|b|c') == 'cached'
+    
+    def test_prophecy_put_invalidates_shared_tier(self, tmp_path, cache):
+        """Test that storing a new variant drops the published variants."""
+        prophecies = ProphecyCache(path=str(tmp_path / 'cache.db'), variants=1, ttl=60, max_entries=100,
+                                   shared=cache)
+        prophecies.put('a|b|c', 'old')
+        prophecies.get('a|b|c')
+        prophecies.put('a|b|c', 'new')
+        
+        assert prophecies.get('a|b|c') == 'new'
@@ -0,0 +1,177 @@
+import asyncio
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, Mock
+from services.single_flight import SingleFlight
+from services.ai_service import AIProphecyService
+
+
+class TestSingleFlight:
+    """Test cases for SingleFlight."""
+    
+    def test_concurrent_calls_share_one_execution(self):
+        """Test that concurrent callers with the same key share a result."""
+        flight = SingleFlight()
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+        
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "shared"
+        
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            leader = pool.submit(flight.do, "key", slow)
+            started.wait(5)
+            followers = [pool.submit(flight.do, "key", slow) for _ in range(4)]
+            while flight.in_flight != 1 or not all(f.running() for f in followers):
+                time.sleep(0.001)
+            time.sleep(0.05)
+            release.set()
+            results = [leader.result()] + [f.result() for f in followers]
+        
+        assert results == ["shared"] * 5
+        assert len(calls) == 1
+        assert flight.in_flight == 0
+    
+    def test_different_keys_run_independently(self):
+        """Test that different keys are not coalesced."""
+        flight = SingleFlight()
+        
+        assert flight.do("a", lambda: 1) == 1
+        assert flight.do("b", lambda: 2) == 2
+    
+    def test_exception_shared_and_forgotten(self):
+        """Test that errors propagate and the key is released afterwards."""
+        flight = SingleFlight()
+        
+        with pytest.raises(ValueError, match="boom"):
+            flight.do("key", Mock(side_effect=ValueError("boom")))
+        
+        assert flight.do("key", lambda: "recovered") == "recovered"
+    
+    def test_async_calls_share_one_execution(self):
+        """Test coalescing on the event loop."""
+        flight = SingleFlight()
+        calls = []
+        
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "shared"
+        
+        async def run():
+            return await asyncio.gather(*(flight.ado("key", slow) for _ in range(5)))
+        
+        assert asyncio.run(run()) == ["shared"] * 5
+        assert len(calls) == 1
+        assert flight.in_flight == 0
+    
+    def test_async_exception_propagates_to_followers(self):
+        """Test that followers receive the leader's exception."""
+        flight = SingleFlight()
+        
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+        
+        async def run():
+            return await asyncio.gather(*(flight.ado("key", failing) for _ in range(3)), return_exceptions=True)
+        
+        results = asyncio.run(run())
+        
+        assert all(isinstance(result, ValueError) for result in results)
+    
+    def test_follower_wait_is_bounded(self):
+        """Test that a follower gives up after its timeout while the leader keeps running."""
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        
+        def slow():
+            started.set()
+            release.wait(5)
+            return "late"
+        
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            leader = pool.submit(flight.do, "key", slow)
+            started.wait(5)
+            with pytest.raises(TimeoutError):
+                flight.do("key", slow, timeout=0.01)
+            release.set()
+            assert leader.result() == "late"
+    
+    def test_async_leader_cancellation_spares_followers(self):
+        """Test that cancelling the leader does not cancel the followers' shared call."""
+        flight = SingleFlight()
+        calls = []
+        
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "shared"
+        
+        async def run():
+            leader = asyncio.ensure_future(flight.ado("key", slow))
+            await asyncio.sleep(0)
+            followers = [asyncio.ensure_future(flight.ado("key", slow)) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            results = await asyncio.gather(*followers)
+            return leader.cancelled(), results
+        
+        assert asyncio.run(run()) == (True, ["shared", "shared"])
+        assert len(calls) == 1
+        assert flight.in_flight == 0
+    
+    def test_async_call_cancelled_when_all_callers_leave(self):
+        """Test that the shared call is cancelled once no caller waits for it."""
+        flight = SingleFlight()
+        cancelled = []
+        
+        async def slow():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+        
+        async def run():
+            caller = asyncio.ensure_future(flight.ado("key", slow))
+            await asyncio.sleep(0.01)
+            caller.cancel()
+            await asyncio.gather(caller, return_exceptions=True)
+            await asyncio.sleep(0)
+        
+        asyncio.run(run())
+        assert cancelled == [1]
+        assert flight.in_flight == 0
+    
+    @patch('config.Config.HF_TOKEN', 'test_token')
+    @patch('config.Config.PROPHECY_CACHE_ENABLED', False)
+    def test_ai_service_coalesces_same_combination(self):
+        """Test that the AI service shares in-flight calls per combination."""
+        release = threading.Event()
+        mock_response = Mock()
+        mock_response.choices = [Mock()]
+        mock_response.choices[0].message = {"content": "Coalesced prophecy"}
+        mock_client = Mock()
+        mock_client.chat_completion.side_effect = lambda **kwargs: release.wait(5) and mock_response
+        
+        with patch('services.prophecy_backends.InferenceClient', return_value=mock_client):
+            service = AIProphecyService()
+            
+            with ThreadPoolExecutor(max_workers=3) as pool:
+                futures = [pool.submit(service.generate_prophecy, ["The Sun: Joy"], "the_sun") for _ in range(3)]
+                while mock_client.chat_completion.call_count == 0:
+                    time.sleep(0.001)
+                time.sleep(0.05)
+                release.set()
+                results = [future.result() for future in futures]
+        
+        assert results == ["Coalesced prophecy"] * 3
+        mock_client.chat_completion.assert_called_once()
\ No newline at end of file
@@ -1,7 +1,14 @@
 import pytest
+import json
 import logging
+import queue
 from unittest.mock import patch
-from utils.logger import setup_logger
+from utils import json_codec
+from utils.deadline import Deadline
+from utils.latency import LatencyTracker
+from utils import logger as logger_module
+from utils.startup import StartupReport, import_breakdown
+from utils.logger import JsonFormatter, NonBlockingQueueHandler, SamplingFilter, request_id, setup_logger
 
 
 class TestLogger:
@@ -92,4 +99,173 @@ class TestLogger:
         logger.debug("Test debug message")
         
         # All messages should be logged successfully
-        assert True  # If we get here, no exceptions were raised 
\ No newline at end of file
+        assert True  # If we get here, no exceptions were raised 
+    
+    def test_json_format(self):
+        """Test that JSON lines carry the request ID and stage timings."""
+        record = logging.LogRecord('app', logging.INFO, __file__, 1, "GET %s %d", ('/draw_cards', 200), None)
+        record.request_id = 'abc123'
+        record.stages = {'draw_cards': 0.001}
+        
+        entry = json.loads(JsonFormatter().format(record))
+        
+        assert entry['message'] == 'GET /draw_cards 200'
+        assert entry['request_id'] == 'abc123'
+        assert entry['stages'] == {'draw_cards': 0.001}
+        assert entry['level'] == 'INFO'
+    
+    def test_request_id_attached(self, capsys):
+        """Test that records carry the request ID set for the current context."""
+        with patch('config.Config.LOG_FORMAT', 'json'):
+            logger = setup_logger('test_logger_request_id')
+        token = request_id.set('req-1')
+        try:
+            logger.info("Inside a request")
+        finally:
+            request_id.reset(token)
+        
+        entry = json.loads(capsys.readouterr().err.strip().splitlines()[-1])
+        assert entry['request_id'] == 'req-1'
+    
+    def test_sampling_filter(self):
+        """Test that INFO records are sampled while warnings always pass."""
+        sampler = SamplingFilter(0.0)
+        info = logging.LogRecord('app', logging.INFO, __file__, 1, "info", None, None)
+        warning = logging.LogRecord('app', logging.WARNING, __file__, 1, "warning", None, None)
+        
+        assert sampler.filter(info) is False
+        assert sampler.filter(warning) is True
+    
+    def test_sampling_configured_per_logger(self):
+        """Test that LOG_SAMPLING installs a sampler on the named logger only."""
+        with patch('config.Config.LOG_SAMPLING', 'test_logger_sampled=0.25'):
+            sampled = setup_logger('test_logger_sampled')
+            unsampled = setup_logger('test_logger_unsampled')
+        
+        assert [f.rate for f in sampled.filters if isinstance(f, SamplingFilter)] == [0.25]
+        assert not unsampled.filters
+    
+    def test_queue_handler_never_blocks(self):
+        """Test that the queue handler merges arguments eagerly and drops records when full."""
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+        args = ['a']
+        
+        handler.handle(logging.LogRecord('app', logging.INFO, __file__, 1, "cards %s", (args,), None))
+        args.append('b')
+        handler.handle(logging.LogRecord('app', logging.INFO, __file__, 1, "second", None, None))
+        
+        assert handler.queue.get_nowait().getMessage() == "cards ['a']"
+        assert handler.dropped == 1
+    
+    def test_async_mode_writes_in_background(self, capsys):
+        """Test that async loggers share one queue drained by a writer thread."""
+        with patch('config.Config.LOG_ASYNC', True), patch.object(logger_module, '_queue_handler', None), \
+                patch.object(logger_module, '_listener', None), patch('atexit.register'), \
+                patch('os.register_at_fork'):
+            first = setup_logger('test_logger_async_one')
+            second = setup_logger('test_logger_async_two')
+            first.info("from the first logger")
+            second.warning("from the second logger")
+            logger_module.stop_logging()
+        
+        assert first.handlers[0] is second.handlers[0]
+        assert isinstance(first.handlers[0], NonBlockingQueueHandler)
+        err = capsys.readouterr().err
+        assert 'from the first logger' in err
+        assert 'from the second logger' in err
+
+
+class TestDeadline:
+    """Test cases for Deadline."""
+    
+    def test_remaining_counts_down(self):
+        """Test that the remaining budget shrinks over time."""
+        with patch('utils.deadline.time.monotonic', side_effect=[100.0, 101.5, 106.0, 106.0]):
+            deadline = Deadline(5.0)
+            
+            assert deadline.remaining() == 3.5
+            assert deadline.remaining() == 0.0
+            assert deadline.expired is True
+    
+    def test_remaining_of_optional_deadline(self):
+        """Test that a missing deadline means an unbounded wait."""
+        assert Deadline.remaining_of(None) is None
+        assert 0 < Deadline.remaining_of(Deadline(10.0)) <= 10.0
+
+
+class TestLatencyTracker:
+    """Test cases for LatencyTracker."""
+    
+    def test_percentile(self):
+        """Test percentile lookups over the window."""
+        tracker = LatencyTracker()
+        for latency in range(1, 101):
+            tracker.record(float(latency))
+        
+        assert tracker.percentile(50) == 50.0
+        assert tracker.percentile(95) == 95.0
+        assert tracker.percentile(100) == 100.0
+    
+    def test_percentile_requires_min_samples(self):
+        """Test that too few samples give no answer."""
+        tracker = LatencyTracker()
+        tracker.record(1.0)
+        
+        assert tracker.percentile(95, min_samples=2) is None
+        assert LatencyTracker().percentile(95) is None
+    
+    def test_window_is_bounded(self):
+        """Test that only the most recent samples are kept."""
+        tracker = LatencyTracker(window=3)
+        for latency in (10.0, 1.0, 2.0, 3.0):
+            tracker.record(latency)
+        
+        assert len(tracker) == 3
+        assert tracker.percentile(100) == 3.0
+
+
+class TestJsonCodec:
+    """Test cases for the JSON codec."""
+    
+    @pytest.mark.parametrize('fast_backend', [True, False])
+    def test_dumps_is_compact_utf8(self, fast_backend):
+        """Test that both backends produce the same compact UTF-8 bytes."""
+        if fast_backend:
+            pytest.importorskip('orjson')
+            data = json_codec.dumps({'prophecy': "Le soleil — brille", 'n': [1, 2]})
+        else:
+            with patch.object(json_codec, 'orjson', None):
+                data = json_codec.dumps({'prophecy': "Le soleil — brille", 'n': [1, 2]})
+        
+        assert data == '{"prophecy":"Le soleil — brille","n":[1,2]}'.encode('utf-8')
+
+
+class TestStartupReport:
+    """Test cases for startup timing."""
+    
+    def test_milestones_recorded_once(self):
+        """Test that milestones are measured from process start and kept on first mark."""
+        report = StartupReport(started=0.0)
+        
+        assert report.mark('app_created') is True
+        first = report.milestones['app_created']
+        assert report.mark('app_created') is False
+        
+        assert report.milestones['app_created'] == first > 0
+    
+    def test_phase_duration(self):
+        """Test that phases record their duration."""
+        report = StartupReport()
+        
+        with report.phase('warm_up'):
+            pass
+        
+        assert report.as_dict()['phases']['warm_up'] >= 0
+    
+    def test_import_breakdown(self):
+        """Test that imports are grouped by top-level package."""
+        total, packages = import_breakdown('import json, email.mime.text')
+        names = [name for name, _ in packages]
+        
+        assert 'json' in names and 'email' in names
+        assert total == pytest.approx(sum(seconds for _, seconds in packages))
@@ -0,0 +1,24 @@
+import time
+from typing import Optional
+
+
+class Deadline:
+    """A per-request latency budget measured on the monotonic clock."""
+    
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+    
+    def remaining(self) -> float:
+        """Seconds left in the budget (never negative)."""
+        return max(0.0, self.expires_at - time.monotonic())
+    
+    @property
+    def expired(self) -> bool:
+        """Whether the budget has been used up."""
+        return time.monotonic() >= self.expires_at
+    
+    @staticmethod
+    def remaining_of(deadline: Optional['Deadline']) -> Optional[float]:
+        """Seconds left in an optional deadline; None means unbounded."""
+        return None if deadline is None else deadline.remaining()
\ No newline at end of file
@@ -0,0 +1,177 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from typing import Dict, Optional, Tuple
+from flask import Flask, Response, request
+from config import Config
+from utils.logger import setup_logger
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+logger = setup_logger(__name__)
+
+COMPRESSIBLE_MIMETYPES = frozenset({
+    'text/html', 'text/css', 'text/plain', 'application/javascript', 'text/javascript',
+    'application/json', 'image/svg+xml',
+})
+PRECOMPRESSED_EXTENSIONS = ('.css', '.js', '.html', '.svg', '.json', '.txt')
+
+
+def compress(data: bytes, encoding: str, static: bool = False) -> bytes:
+    """
+    Compress a body with the given content coding.
+    
+    Static files are compressed once at startup, so they use the highest
+    levels; dynamic responses use faster settings.
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if static else 5)
+    return gzip.compress(data, compresslevel=9 if static else 6, mtime=0)
+
+
+def strong_etag(data: bytes) -> str:
+    """Strong validator derived from the body bytes."""
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+class StaticVariant:
+    """A static file held in memory with its precompressed encodings."""
+    
+    def __init__(self, path: str, mtime: float, mimetype: str, data: bytes, encodings: Tuple[str, ...]):
+        self.path = path
+        self.mtime = mtime
+        self.mimetype = mimetype
+        self.etag = strong_etag(data)
+        self.bodies: Dict[Optional[str], bytes] = {None: data}
+        for encoding in encodings:
+            compressed = compress(data, encoding, static=True)
+            if len(compressed) < len(data):
+                self.bodies[encoding] = compressed
+
+
+class HttpCache:
+    """
+    Conditional GET and compression for a Flask app.
+    
+    Text files under the static folder are read and precompressed (gzip,
+    plus brotli when installed) at startup and served from memory with
+    strong ETags. Other buffered text responses get a strong ETag of their
+    body, are answered with 304 when ``If-None-Match`` matches, and are
+    compressed above the size threshold. Responses marked ``no-store`` are
+    compressed but get no validator; streamed responses are left alone.
+    """
+    
+    def __init__(self, app: Optional[Flask] = None, min_size: Optional[int] = None):
+        self.min_size = min_size if min_size is not None else Config.HTTP_COMPRESS_MIN_SIZE
+        self.encodings: Tuple[str, ...] = ('br', 'gzip') if brotli is not None else ('gzip',)
+        self._static: Dict[str, StaticVariant] = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app: Flask) -> None:
+        """Precompress the static folder and register the request hooks."""
+        self.static_folder = app.static_folder
+        self._precompress_static()
+        app.before_request(self._serve_static)
+        app.after_request(self._process_response)
+    
+    def _precompress_static(self) -> None:
+        """Load every compressible static file into memory."""
+        if not self.static_folder or not os.path.isdir(self.static_folder):
+            return
+        for root, _, files in os.walk(self.static_folder):
+            for name in files:
+                if name.endswith(PRECOMPRESSED_EXTENSIONS):
+                    filename = os.path.relpath(os.path.join(root, name), self.static_folder).replace(os.sep, '/')
+                    self._load_static(filename)
+        logger.info(f"Precompressed {len(self._static)} static files with {', '.join(self.encodings)}")
+    
+    def _load_static(self, filename: str) -> Optional[StaticVariant]:
+        """Read and compress one static file, replacing any stale copy."""
+        path = os.path.join(self.static_folder, filename)
+        try:
+            mtime = os.stat(path).st_mtime
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        variant = StaticVariant(path, mtime, mimetype, data, self.encodings)
+        with self._lock:
+            self._static[filename] = variant
+        return variant
+    
+    def _static_variant(self, filename: str) -> Optional[StaticVariant]:
+        """Return the in-memory copy of a static file, reloading it when it changed on disk."""
+        variant = self._static.get(filename)
+        if variant is None:
+            return None
+        try:
+            if os.stat(variant.path).st_mtime != variant.mtime:
+                return self._load_static(filename)
+        except OSError:
+            return None
+        return variant
+    
+    def _serve_static(self) -> Optional[Response]:
+        """Answer static requests for precompressed files from memory."""
+        if request.endpoint != 'static' or request.method not in ('GET', 'HEAD'):
+            return None
+        variant = self._static_variant(request.view_args.get('filename', ''))
+        if variant is None:
+            return None
+        
+        encoding = self._negotiate(tuple(key for key in variant.bodies if key))
+        etag = variant.etag if encoding is None else f'{variant.etag}-{encoding}'
+        response = Response(mimetype=variant.mimetype)
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = Config.HTTP_STATIC_CACHE_CONTROL
+        response.set_etag(etag)
+        if request.if_none_match.contains(etag):
+            response.status_code = 304
+            return response
+        response.set_data(variant.bodies[encoding])
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response
+    
+    def _process_response(self, response: Response) -> Response:
+        """Add validators to buffered responses and compress large text bodies."""
+        if (request.endpoint == 'static' or response.is_streamed or response.direct_passthrough
+                or response.status_code != 200 or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        
+        data = response.get_data()
+        cacheable = request.method in ('GET', 'HEAD') and 'no-store' not in response.headers.get('Cache-Control', '')
+        encoding = self._negotiate(self.encodings) if len(data) >= self.min_size else None
+        response.vary.add('Accept-Encoding')
+        
+        if cacheable:
+            base_etag = strong_etag(data)
+            etag = base_etag if encoding is None else f'{base_etag}-{encoding}'
+            response.set_etag(etag)
+            response.headers.setdefault('Cache-Control', 'no-cache')
+            if request.if_none_match.contains(etag):
+                response.status_code = 304
+                response.set_data(b'')
+                response.headers.pop('Content-Length', None)
+                return response
+        
+        if encoding is not None:
+            response.set_data(compress(data, encoding))
+            response.headers['Content-Encoding'] = encoding
+        return response
+    
+    @staticmethod
+    def _negotiate(available: Tuple[str, ...]) -> Optional[str]:
+        """Pick the client's preferred encoding among the available ones, or None for identity."""
+        if not available:
+            return None
+        return request.accept_encodings.best_match(available)
\ No newline at end of file
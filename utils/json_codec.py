@@ -0,0 +1,21 @@
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the standard library encoder is the fallback
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Serialize obj to compact UTF-8 JSON bytes.
+    
+    Uses orjson when it is installed and the standard library otherwise;
+    both produce the same compact, non-ASCII-escaped output.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
\ No newline at end of file
@@ -0,0 +1,37 @@
+import threading
+from collections import deque
+from typing import Optional
+
+
+class LatencyTracker:
+    """Rolling window of recent call latencies with percentile queries."""
+    
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+    
+    def record(self, latency: float) -> None:
+        """Record the latency of a completed call in seconds."""
+        with self._lock:
+            self._samples.append(latency)
+    
+    def percentile(self, percent: float, min_samples: int = 1) -> Optional[float]:
+        """
+        Return the latency at the given percentile of the window.
+        
+        Args:
+            percent: Percentile between 0 and 100
+            min_samples: Minimum window size before an answer is given
+        
+        Returns:
+            Latency in seconds, or None when there are too few samples
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples or len(samples) < min_samples:
+            return None
+        index = min(len(samples) - 1, max(0, int(round(percent / 100.0 * len(samples))) - 1))
+        return samples[index]
+    
+    def __len__(self) -> int:
+        return len(self._samples)
\ No newline at end of file
@@ -1,34 +1,189 @@
+import atexit
+import contextvars
+import copy
+import json
 import logging
-from typing import Optional
+import os
+import queue
+import random
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+from config import Config
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Set for the duration of a web request so every log line can carry it
+request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('request_id', default=None)
+
+_queue: Optional[queue.Queue] = None
+_queue_handler: Optional['NonBlockingQueueHandler'] = None
+_listener: Optional[QueueListener] = None
+_listener_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        for key in ('duration', 'stages'):
+            if hasattr(record, key):
+                entry[key] = getattr(record, key)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request ID to every record."""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of INFO-and-below records; warnings and errors always pass."""
+    
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hand records to the background writer without ever blocking the caller.
+    
+    The message is merged with its arguments on the calling thread, because
+    the arguments may change later, but formatting and I/O happen on the
+    writer thread. Records are dropped, and counted, when the queue is full.
+    """
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _formatter() -> logging.Formatter:
+    return JsonFormatter() if Config.LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT)
+
+
+def _stream_handler() -> logging.Handler:
+    handler = logging.StreamHandler()
+    handler.setLevel(logging.INFO)
+    handler.setFormatter(_formatter())
+    return handler
+
+
+def _start_listener() -> None:
+    """Start the background writer thread on a fresh queue."""
+    global _queue, _listener
+    if _queue_handler is None:
+        return
+    _queue = queue.Queue(maxsize=Config.LOG_QUEUE_SIZE)
+    _queue_handler.queue = _queue
+    _listener = QueueListener(_queue, _stream_handler(), respect_handler_level=True)
+    _listener.start()
+
+
+def _shared_queue_handler() -> 'NonBlockingQueueHandler':
+    """The queue handler shared by every logger in async mode, starting its writer on first use."""
+    global _queue_handler
+    with _listener_lock:
+        if _queue_handler is None:
+            _queue_handler = NonBlockingQueueHandler(queue.Queue())
+            _queue_handler.addFilter(RequestIdFilter())
+            _start_listener()
+            # The writer thread does not survive a fork (e.g. into gunicorn workers)
+            os.register_at_fork(after_in_child=_start_listener)
+            atexit.register(stop_logging)
+    return _queue_handler
+
+
+def flush_logs() -> None:
+    """Block until every queued record has been written (async mode only)."""
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener.start()
+
+
+def stop_logging() -> None:
+    """Write out the queued records and stop the writer thread."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def sampling_rates(spec: str) -> Dict[str, float]:
+    """Parse ``logger=rate`` pairs, e.g. ``services.card_service=0.01,app=0.1``."""
+    rates = {}
+    for entry in spec.split(','):
+        name, sep, rate = entry.partition('=')
+        if sep and name.strip():
+            rates[name.strip()] = float(rate)
+    return rates
 
 
 def setup_logger(name: str, level: Optional[int] = None) -> logging.Logger:
     """
     Set up a logger with consistent formatting.
     
+    With LOG_ASYNC the logger hands records to a queue drained by one
+    background writer thread; LOG_FORMAT=json writes JSON lines carrying the
+    request ID. LOG_SAMPLING keeps only a fraction of a logger's INFO records.
+    
     Args:
         name: Logger name
-        level: Logging level (defaults to INFO)
-        
+        level: Logging level (defaults to LOG_LEVEL, INFO)
+    
     Returns:
         Configured logger instance
     """
     logger = logging.getLogger(name)
     
     if not logger.handlers:  # Avoid adding handlers multiple times
-        logger.setLevel(level or logging.INFO)
-        
-        # Create console handler
-        handler = logging.StreamHandler()
-        handler.setLevel(logging.INFO)
+        logger.setLevel(level or Config.LOG_LEVEL)
         
-        # Create formatter
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        handler.setFormatter(formatter)
+        if Config.LOG_ASYNC:
+            logger.addHandler(_shared_queue_handler())
+        else:
+            handler = _stream_handler()
+            handler.addFilter(RequestIdFilter())
+            logger.addHandler(handler)
         
-        # Add handler to logger
-        logger.addHandler(handler)
+        rate = sampling_rates(Config.LOG_SAMPLING).get(name)
+        if rate is not None and rate < 1:
+            logger.addFilter(SamplingFilter(rate))
     
-    return logger 
\ No newline at end of file
+    return logger
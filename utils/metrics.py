@@ -0,0 +1,401 @@
+"""
+Counters, gauges and histograms rendered in the Prometheus text format.
+
+Every process records into its own in-memory registry. When METRICS_DIR is
+set (required with several gunicorn workers), each process also writes a
+snapshot to ``<METRICS_DIR>/metrics-<pid>.json`` every METRICS_FLUSH_INTERVAL
+seconds and at exit, and ``/metrics`` merges the snapshots of all processes:
+counters and histograms are summed over every file, so they stay monotonic
+when workers restart, while gauges only count processes that are still alive
+(summed, or with multiprocess_mode='max' the largest value, for gauges every
+process reads from the same shared state).
+gunicorn_conf.py points METRICS_DIR at a per-server directory and clears it
+(clear_snapshots) when the server starts.
+"""
+import atexit
+import bisect
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from flask import Flask, Response, g, request
+from config import Config
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 60.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LabelValues = Tuple[str, ...]
+Observation = Tuple[str, LabelValues, float]
+
+# Histogram observations made in the current context, while record_observations() is active
+_observations: contextvars.ContextVar[Optional[List[Observation]]] = contextvars.ContextVar(
+    'metrics_observations', default=None
+)
+
+
+class Metric:
+    """Base class of a named metric with fixed label names."""
+    
+    type = 'untyped'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional['MetricsRegistry'] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self.reset()
+        (registry or REGISTRY).register(self)
+    
+    def reset(self) -> None:
+        """Forget all recorded values."""
+        self._values: Dict[LabelValues, Any] = {}
+    
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def collect(self) -> Dict[LabelValues, Any]:
+        """Current values by label values."""
+        with self._lock:
+            return dict(self._values)
+
+
+class Counter(Metric):
+    """Monotonically increasing count."""
+    
+    type = 'counter'
+    
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    """Value that can go up and down, or be read from a function at collection time."""
+    
+    type = 'gauge'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional['MetricsRegistry'] = None, multiprocess_mode: str = 'sum'):
+        if multiprocess_mode not in ('sum', 'max'):
+            raise ValueError(f"Unknown multiprocess mode for gauge {name}: {multiprocess_mode}")
+        self.multiprocess_mode = multiprocess_mode
+        super().__init__(name, documentation, labelnames, registry)
+    
+    def reset(self) -> None:
+        super().reset()
+        self._function: Optional[Callable[[], float]] = None
+    
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+    
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Report the return value of function instead of recorded values (unlabelled gauges only)."""
+        self._function = function
+    
+    @contextmanager
+    def track_inprogress(self, **labels: str) -> Iterator[None]:
+        """Count the enclosed block as in progress."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+    
+    def collect(self) -> Dict[LabelValues, Any]:
+        if self._function is not None:
+            return {(): float(self._function())}
+        return super().collect()
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets."""
+    
+    type = 'histogram'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional['MetricsRegistry'] = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+    
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, the +Inf overflow, then sum
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+        recorder = _observations.get()
+        if recorder is not None:
+            recorder.append((self.name, key, value))
+    
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the enclosed block in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+    
+    def collect(self) -> Dict[LabelValues, Any]:
+        with self._lock:
+            return {key: list(state) for key, state in self._values.items()}
+
+
+@contextmanager
+def record_observations() -> Iterator[List[Observation]]:
+    """
+    Collect the histogram observations made in the enclosed block.
+    
+    Observations are collected from the current context, including work
+    submitted to executors with a copy of it (contextvars.copy_context()).
+    """
+    observations: List[Observation] = []
+    token = _observations.set(observations)
+    try:
+        yield observations
+    finally:
+        _observations.reset(token)
+
+
+class MetricsRegistry:
+    """Collection of metrics with snapshot, multi-process merge and text rendering."""
+    
+    def __init__(self, directory: Optional[str] = None, flush_interval: Optional[float] = None):
+        self.directory = directory
+        self.flush_interval = flush_interval if flush_interval is not None else Config.METRICS_FLUSH_INTERVAL
+        self._metrics: Dict[str, Metric] = {}
+        self._flusher: Optional[threading.Thread] = None
+        self._flusher_pid: Optional[int] = None
+        self._lock = threading.Lock()
+    
+    def register(self, metric: Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+    
+    def reset(self) -> None:
+        """Forget all recorded values, e.g. in a freshly forked worker."""
+        for metric in self._metrics.values():
+            if not isinstance(metric, Gauge) or metric._function is None:
+                metric.reset()
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable state of every metric in this process."""
+        return {
+            'pid': os.getpid(),
+            'metrics': {
+                name: {'samples': [[list(key), value] for key, value in metric.collect().items()]}
+                for name, metric in self._metrics.items()
+            },
+        }
+    
+    def start_flushing(self) -> None:
+        """Start writing snapshots to the metrics directory from this process (cheap to call repeatedly)."""
+        if not self.directory or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._flusher_pid = os.getpid()
+            self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+            self._flusher.start()
+    
+    def flush(self) -> None:
+        """Write this process's snapshot to the metrics directory."""
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f'metrics-{os.getpid()}.json')
+        # The flusher thread and a scrape can flush at the same time
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write metrics snapshot {path}: {str(e)}")
+    
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+    
+    def _snapshots(self) -> List[Dict[str, Any]]:
+        """Snapshots of every process: this one live, the others from the metrics directory."""
+        snapshots = [self.snapshot()]
+        if not self.directory:
+            return snapshots
+        self.flush()
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if snapshot.get('pid') != os.getpid():
+                snapshots.append(snapshot)
+        return snapshots
+    
+    def render(self) -> str:
+        """Render the metrics of all processes in the Prometheus text format."""
+        merged: Dict[str, Dict[LabelValues, Any]] = {name: {} for name in self._metrics}
+        for snapshot in self._snapshots():
+            alive = snapshot['pid'] == os.getpid() or _pid_alive(snapshot['pid'])
+            for name, data in snapshot.get('metrics', {}).items():
+                metric = self._metrics.get(name)
+                if metric is None or (isinstance(metric, Gauge) and not alive):
+                    continue
+                for key, value in data['samples']:
+                    key = tuple(key)
+                    current = merged[name].get(key)
+                    if current is None:
+                        merged[name][key] = value
+                    elif isinstance(value, list):
+                        merged[name][key] = [a + b for a, b in zip(current, value)]
+                    elif isinstance(metric, Gauge) and metric.multiprocess_mode == 'max':
+                        merged[name][key] = max(current, value)
+                    else:
+                        merged[name][key] = current + value
+        
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for key, value in sorted(merged[name].items()):
+                labels = list(zip(metric.labelnames, key))
+                if isinstance(metric, Histogram):
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (float('inf'),), value[:-1]):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else _format_value(bound)
+                        lines.append(f'{name}_bucket{_format_labels(labels + [("le", le)])} {cumulative}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(value[-1])}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+                else:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def clear_snapshots(directory: str) -> None:
+    """Remove the snapshots left in a metrics directory by processes of an earlier server."""
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json*')):
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"Could not remove metrics snapshot {path}: {str(e)}")
+
+
+class RequestMetrics:
+    """
+    Per-endpoint request counts, durations and in-flight requests for a Flask app.
+    
+    Endpoints are labelled by their URL rule, so the label set stays bounded.
+    Durations run until the response is closed, which includes the time spent
+    streaming SSE and NDJSON bodies.
+    """
+    
+    def __init__(self, app: Optional[Flask] = None, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry or REGISTRY
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app: Flask) -> None:
+        """Register the request hooks."""
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+    
+    def _before_request(self) -> None:
+        self.registry.start_flushing()
+        g.metrics_started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+    
+    def _after_request(self, response: Response) -> Response:
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        status = str(response.status_code)
+        
+        def finish() -> None:
+            REQUESTS_IN_FLIGHT.dec()
+            REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+            REQUESTS.inc(endpoint=endpoint, status=status)
+        
+        response.call_on_close(finish)
+        return response
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _format_labels(labels: List[Tuple[str, str]]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+REGISTRY = MetricsRegistry(directory=Config.METRICS_DIR)
+
+STAGE_SECONDS = Histogram(
+    'tarot_stage_duration_seconds', "Time spent in each stage of a reading.", ['stage']
+)
+REQUEST_SECONDS = Histogram(
+    'tarot_request_duration_seconds', "Total HTTP request time by endpoint.", ['endpoint']
+)
+REQUESTS = Counter('tarot_requests_total', "HTTP requests by endpoint and status.", ['endpoint', 'status'])
+REQUESTS_IN_FLIGHT = Gauge('tarot_requests_in_flight', "HTTP requests currently being served.")
+CACHE_LOOKUPS = Counter('tarot_prophecy_cache_total', "Prophecy cache lookups by result.", ['result'])
+FALLBACKS = Counter('tarot_fallbacks_total', "Readings answered with the fallback prophecy.")
+UPSTREAM_ERRORS = Counter('tarot_upstream_errors_total', "Failed model calls by backend.", ['backend'])
+MODEL_CALLS_IN_FLIGHT = Gauge('tarot_model_calls_in_flight', "Model calls currently waiting on a backend.")
+COALESCED_IN_FLIGHT = Gauge(
+    'tarot_prophecy_generations_in_flight', "Distinct card combinations currently being generated."
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    'tarot_admission_queue_depth', "Prophecy requests waiting for a model call slot."
+)
+SHED = Counter('tarot_shed_total', "Requests shed by load control, by reason and outcome.", ['reason', 'outcome'])
+STALE_SERVED = Counter(
+    'tarot_stale_served_total', "Readings answered with a cached prophecy while it was refreshed.", ['reason']
+)
+# With the SQLite job store every worker counts the same shared queue
+JOBS_PENDING = Gauge('tarot_reading_jobs_pending', "Reading jobs waiting for a worker.", multiprocess_mode='max')
+
+# Counts recorded before a fork belong to the parent
+os.register_at_fork(after_in_child=REGISTRY.reset)
+atexit.register(REGISTRY.flush)
\ No newline at end of file
@@ -0,0 +1,232 @@
+"""
+On-demand request profiling.
+
+When PROFILING_ENABLED is set, requests carrying the ``X-Profile-Token``
+header with the configured PROFILING_TOKEN, plus a PROFILING_SAMPLE_RATE
+fraction of all other requests, run under a profiler. Each profile is written
+to PROFILING_DIR together with a JSON summary of the request's total and
+per-stage timings, and ``/_profiles`` lists the most recent ones to callers
+sending the same header; without a PROFILING_TOKEN the index is not served.
+
+The default ``sampling`` mode samples the request thread's stack every
+PROFILING_INTERVAL seconds and writes collapsed stacks (``.folded``), which
+flamegraph.pl, speedscope and inferno read directly. The ``cprofile`` mode
+runs the deterministic profiler and writes a pstats dump (``.prof``).
+When profiling is disabled nothing is installed, so requests pay nothing.
+"""
+import cProfile
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter as StackCounter
+from contextlib import ExitStack
+from types import FrameType
+from typing import Any, Dict, List, Optional
+from flask import Flask, Response, abort, g, render_template_string, request, send_from_directory
+from config import Config
+from utils.logger import setup_logger
+from utils.metrics import STAGE_SECONDS, record_observations
+
+logger = setup_logger(__name__)
+
+PROFILE_HEADER = 'X-Profile-Token'
+PROFILES_URL = '/_profiles'
+
+INDEX_TEMPLATE = """<!doctype html>
+<title>Request profiles</title>
+<h1>Recent request profiles</h1>
+<table>
+  <tr><th>Time</th><th>Request</th><th>Status</th><th>Total (ms)</th><th>Stages (ms)</th><th>Trigger</th><th>Profile</th></tr>
+  {% for profile in profiles %}
+  <tr>
+    <td>{{ profile.created_at }}</td>
+    <td>{{ profile.method }} {{ profile.path }}</td>
+    <td>{{ profile.status }}</td>
+    <td>{{ '%.1f' % (profile.total * 1000) }}</td>
+    <td>{% for stage, seconds in profile.stages.items() %}{{ stage }}={{ '%.1f' % (seconds * 1000) }} {% endfor %}</td>
+    <td>{{ profile.trigger }}</td>
+    <td><a href="{{ url_for('profile_file', filename=profile.file) }}">{{ profile.file }}</a></td>
+  </tr>
+  {% endfor %}
+</table>
+"""
+
+
+class StackSampler:
+    """Periodically samples one thread's stack into collapsed-stack counts."""
+    
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: StackCounter = StackCounter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+    
+    def start(self) -> None:
+        self._thread.start()
+    
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+    
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[self._collapse(frame)] += 1
+    
+    @staticmethod
+    def _collapse(frame: Optional[FrameType]) -> str:
+        """Render a stack root first as ``module:function;module:function``."""
+        names = []
+        while frame is not None:
+            names.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+    
+    def write(self, path: str) -> None:
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RequestProfiler:
+    """Profile selected requests of a Flask app and serve an index of the results."""
+    
+    def __init__(self, app: Optional[Flask] = None, directory: Optional[str] = None,
+                 sample_rate: Optional[float] = None, token: Optional[str] = None,
+                 mode: Optional[str] = None, interval: Optional[float] = None, keep: Optional[int] = None):
+        self.directory = directory or Config.PROFILING_DIR
+        self.sample_rate = sample_rate if sample_rate is not None else Config.PROFILING_SAMPLE_RATE
+        self.token = token if token is not None else Config.PROFILING_TOKEN
+        self.mode = mode or Config.PROFILING_MODE
+        self.interval = interval if interval is not None else Config.PROFILING_INTERVAL
+        self.keep = keep if keep is not None else Config.PROFILING_KEEP
+        if self.mode not in ('sampling', 'cprofile'):
+            raise ValueError(f"Unknown profiling mode '{self.mode}'")
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app: Flask) -> None:
+        """Register the request hooks and the profile index routes."""
+        os.makedirs(self.directory, exist_ok=True)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        if self.token:
+            app.add_url_rule(PROFILES_URL, 'profile_index', self._index)
+            app.add_url_rule(f'{PROFILES_URL}/<path:filename>', 'profile_file', self._file)
+        else:
+            logger.warning(f"PROFILING_TOKEN is not set; profiles are only written to {self.directory}")
+        logger.info(f"Request profiling enabled ({self.mode}, sample rate {self.sample_rate}) into {self.directory}")
+    
+    def _trigger(self) -> Optional[str]:
+        """Why the current request should be profiled, or None."""
+        if request.path.startswith(PROFILES_URL):
+            return None
+        if self.token and request.headers.get(PROFILE_HEADER) == self.token:
+            return 'header'
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return 'sampled'
+        return None
+    
+    def _start(self) -> None:
+        trigger = self._trigger()
+        if trigger is None:
+            return
+        stack = ExitStack()
+        observations = stack.enter_context(record_observations())
+        if self.mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+            stack.callback(profiler.disable)
+        else:
+            profiler = StackSampler(threading.get_ident(), self.interval)
+            profiler.start()
+            stack.callback(profiler.stop)
+        g.profile = {
+            'trigger': trigger, 'stack': stack, 'profiler': profiler,
+            'observations': observations, 'started': time.perf_counter(),
+        }
+    
+    def _finish(self, response: Response) -> Response:
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+        total = time.perf_counter() - profile['started']
+        profile['stack'].close()
+        try:
+            self._save(profile, total, response.status_code)
+        except OSError as e:
+            logger.warning(f"Could not write request profile: {str(e)}")
+        return response
+    
+    def _save(self, profile: Dict[str, Any], total: float, status: int) -> None:
+        """Write the profile and its summary, then drop the oldest beyond the limit."""
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        if self.mode == 'cprofile':
+            filename = f'{profile_id}.prof'
+            profile['profiler'].dump_stats(os.path.join(self.directory, filename))
+        else:
+            filename = f'{profile_id}.folded'
+            profile['profiler'].write(os.path.join(self.directory, filename))
+        
+        stages: Dict[str, float] = {}
+        for name, labels, seconds in profile['observations']:
+            if name == STAGE_SECONDS.name:
+                stages[labels[0]] = stages.get(labels[0], 0.0) + seconds
+        summary = {
+            'file': filename,
+            'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'status': status,
+            'trigger': profile['trigger'],
+            'total': total,
+            'stages': stages,
+        }
+        with open(os.path.join(self.directory, f'{profile_id}.json'), 'w') as f:
+            json.dump(summary, f)
+        self._prune()
+    
+    def _summaries(self) -> List[Dict[str, Any]]:
+        """Summaries of the stored profiles, newest first."""
+        summaries = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if name.endswith('.json'):
+                try:
+                    with open(os.path.join(self.directory, name)) as f:
+                        summaries.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return summaries
+    
+    def _prune(self) -> None:
+        for summary in self._summaries()[self.keep:]:
+            base = os.path.splitext(summary['file'])[0]
+            for name in (summary['file'], f'{base}.json'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+    
+    def _authorize(self) -> None:
+        """Require the admin token in the header; never in the URL, where access logs would keep it."""
+        supplied = request.headers.get(PROFILE_HEADER, '')
+        if not self.token or not hmac.compare_digest(supplied.encode(), self.token.encode()):
+            abort(403)
+    
+    def _index(self):
+        """List recent profiles with their total and stage timings."""
+        self._authorize()
+        return render_template_string(INDEX_TEMPLATE, profiles=self._summaries())
+    
+    def _file(self, filename: str):
+        """Download one profile."""
+        self._authorize()
+        mimetype = 'text/plain' if filename.endswith('.folded') else 'application/octet-stream'
+        return send_from_directory(os.path.abspath(self.directory), filename, mimetype=mimetype)
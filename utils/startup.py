@@ -0,0 +1,108 @@
+"""
+Cold-start timing.
+
+STARTUP records when each startup milestone was reached, in seconds since
+the process started: ``app_imported``, ``app_created``, ``warmed_up`` and
+``first_request``. With STARTUP_REPORT the milestones are logged once the
+first request has been served and exposed on ``/startup``.
+
+``python -m utils.startup`` prints an import-time breakdown of the app by
+top-level package, measured with ``python -X importtime`` in a fresh
+interpreter, so deploys can track how much each dependency adds.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+def _process_started() -> float:
+    """Wall-clock time the process started (Linux), or now when it cannot be read."""
+    try:
+        with open('/proc/self/stat') as f:
+            # Fields after the parenthesised command name; starttime is field 22
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/stat') as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith('btime'))
+        return boot_time + start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, StopIteration):
+        return time.time()
+
+
+class StartupReport:
+    """Milestones and phase durations of the startup of this process."""
+    
+    def __init__(self, started: Optional[float] = None):
+        self.started = started if started is not None else _process_started()
+        self.milestones: Dict[str, float] = {}
+        self.phases: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def mark(self, name: str) -> bool:
+        """Record that a milestone was reached; returns False if it already was."""
+        with self._lock:
+            if name in self.milestones:
+                return False
+            self.milestones[name] = round(time.time() - self.started, 4)
+            return True
+    
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Record how long the enclosed block takes."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(time.perf_counter() - started, 4)
+    
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {'milestones': dict(self.milestones), 'phases': dict(self.phases)}
+
+
+STARTUP = StartupReport()
+
+
+def import_breakdown(statement: str = 'import app') -> Tuple[float, List[Tuple[str, float]]]:
+    """
+    Measure the imports made by a statement run in a fresh interpreter.
+    
+    Args:
+        statement: Python code to run, e.g. ``import app`` or ``import app; app.create_app()``
+    
+    Returns:
+        Tuple of (total seconds, [(top-level package, seconds)] slowest first)
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement], capture_output=True, text=True, check=True
+    )
+    packages: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0.0) + int(self_us) / 1e6
+    return sum(packages.values()), sorted(packages.items(), key=lambda item: item[1], reverse=True)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Import-time breakdown of the app by top-level package.")
+    parser.add_argument('--create-app', action='store_true',
+                        help="Also count imports made by create_app() (honours STARTUP_MODE)")
+    parser.add_argument('--top', type=int, default=15, help="Number of packages to show")
+    args = parser.parse_args(argv)
+    
+    statement = 'import app; app.create_app()' if args.create_app else 'import app'
+    total, packages = import_breakdown(statement)
+    print(f"{statement}: {total * 1000:.0f} ms of imports")
+    for package, seconds in packages[:args.top]:
+        print(f"  {package:<30} {seconds * 1000:8.1f} ms  {seconds / total:6.1%}")
+
+
+if __name__ == '__main__':
+    main()